@@ -18,6 +18,10 @@
 """
 SchoolTool catalogs.
 """
+import threading
+from collections import OrderedDict
+
+import transaction
 from zope.interface import implementer, implements, implementsOnly
 from zope.intid.interfaces import IIntIds, IIntIdAddedEvent, IIntIdRemovedEvent
 from zope.component import adapter, queryUtility, getUtility
@@ -36,6 +40,9 @@ from schooltool.app.interfaces import ICatalogs
 from schooltool.app.interfaces import IVersionedCatalog
 from schooltool.app.app import ActionBase
 from schooltool.table.catalog import FilterImplementing
+from schooltool.table.catalog import SubstringIndex, substringIndexName
+from schooltool.table.catalog import CollationIndex, collationIndexName
+from schooltool.table.catalog import getCollationLanguages
 
 
 APP_CATALOGS_KEY = 'schooltool.app.catalog:Catalogs'
@@ -48,6 +55,10 @@ class CatalogStartupBase(ActionBase):
 class Catalogs(btree.BTreeContainer):
     implements(ICatalogs)
 
+    # Interfaces of catalogged objects, keyed by catalog key,
+    # see routeCatalogs.
+    _v_interfaces = None
+
 
 @adapter(ISchoolToolApplication)
 @implementer(ICatalogs)
@@ -105,6 +116,8 @@ class CatalogFactory(CatalogStartupBase):
 
     @classmethod
     def get(cls, ignored=None):
+        # Catalogs are usually looked up to be queried.
+        reindex_queue.flush()
         app = getSite()
         catalogs = app[APP_CATALOGS_KEY]
         versioned = catalogs[cls.key()]
@@ -156,18 +169,155 @@ class CatalogImplementing(CatalogFactory):
 
 class AttributeCatalog(CatalogImplementing):
     """Catalog indexing specified attributes of objects implementing
-    the given interface."""
+    the given interface.
+
+    Attributes listed in substring_attributes also get a substring index
+    for searching, attributes listed in collation_attributes get an index
+    of collation keys in configured languages for locale aware sorting.
+    """
 
     attributes = ()
+    substring_attributes = ()
+    collation_attributes = ()
 
     def getVersion(self):
+        version = super(AttributeCatalog, self).getVersion()
+        if self.substring_attributes:
+            version = u'substrings:%s, %s' % (
+                tuple(sorted(self.substring_attributes)), version)
+        if self.collation_attributes:
+            version = u'collations:%s in %s, %s' % (
+                tuple(sorted(self.collation_attributes)),
+                getCollationLanguages(), version)
         return u'attributes:%s, %s' % (
-            tuple(sorted(self.attributes)),
-            super(AttributeCatalog, self).getVersion())
+            tuple(sorted(self.attributes)), version)
 
     def setIndexes(self, catalog):
         for name in self.attributes:
             catalog[name] = catalogindex.ValueIndex(name)
+        for name in self.substring_attributes:
+            catalog[substringIndexName(name)] = SubstringIndex(name)
+        for name in self.collation_attributes:
+            catalog[collationIndexName(name)] = CollationIndex(
+                name, languages=getCollationLanguages())
+
+
+class CatalogCounters(object):
+    """Per catalog counts of indexed, unindexed, skipped and coalesced
+    documents, for all threads."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.indexed = {}
+        self.unindexed = {}
+        self.skipped = {}
+        self.coalesced = {}
+
+    def count(self, counter, key):
+        counter[key] = counter.get(key, 0) + 1
+
+
+catalog_counters = CatalogCounters()
+
+
+def getCatalogInterface(catalog):
+    """Return the interface of objects a catalog contains, if known."""
+    extent = getattr(catalog, 'extent', None)
+    extent_filter = getattr(extent, 'filter', None)
+    if isinstance(extent_filter, FilterImplementing):
+        return extent_filter.interface
+    return None
+
+
+def catalogHoldsDoc(catalog, docid):
+    """Tell whether the extent of the catalog contains the document."""
+    extent = getattr(catalog, 'extent', None)
+    return extent is not None and docid in extent
+
+
+def routeCatalogs(catalogs, obj, docid=None):
+    """Return (key, catalog) of catalogs that may contain the object.
+
+    Catalogs of objects implementing some interface (see
+    CatalogImplementing) only get objects that provide it, or that
+    they already hold under `docid`, so that objects that stop
+    providing the interface get unindexed.  Other catalogs get all
+    objects.
+    """
+    interfaces = catalogs._v_interfaces
+    if interfaces is None:
+        interfaces = catalogs._v_interfaces = {}
+    result = []
+    for key, entry in catalogs.items():
+        catalog = entry.catalog
+        cached = interfaces.get(key)
+        if cached is None or cached[0] is not catalog:
+            cached = interfaces[key] = (catalog, getCatalogInterface(catalog))
+        interface = cached[1]
+        if (interface is None or interface.providedBy(obj) or
+            (docid is not None and catalogHoldsDoc(catalog, docid))):
+            result.append((key, catalog))
+        else:
+            catalog_counters.count(catalog_counters.skipped, key)
+    return result
+
+
+class ReindexQueue(threading.local):
+    """Reindexing of modified documents, deferred to transaction commit.
+
+    A document modified several times in a transaction is reindexed
+    once, before the transaction commits or when a catalog is looked up
+    with CatalogFactory.get.  Code that queries catalogs mid-transaction
+    in other ways should call flush, or set `deferred` to False to
+    reindex immediately in the current thread.  Catalogs that are always
+    read directly are registered with reindexImmediately.
+    """
+
+    deferred = True
+    immediate = set() # keys of catalogs reindexed immediately, all threads
+    transaction = None
+    pending = None # {docid: {catalog key: (catalog, obj, intids)}}
+
+    def _current(self):
+        current = transaction.get()
+        if self.transaction is not current:
+            self.transaction = current
+            self.pending = OrderedDict()
+            current.addBeforeCommitHook(self.flush)
+        return self.pending
+
+    def add(self, key, catalog, docid, obj, util):
+        catalogs = self._current().setdefault(docid, OrderedDict())
+        if key in catalogs:
+            catalog_counters.count(catalog_counters.coalesced, key)
+        catalogs[key] = (catalog, obj, util)
+
+    def discard(self, docid):
+        if self.transaction is transaction.get():
+            self.pending.pop(docid, None)
+
+    def flush(self):
+        if self.transaction is not transaction.get():
+            return
+        pending = self.pending
+        while pending:
+            docid, catalogs = pending.popitem(last=False)
+            for key, (catalog, obj, util) in catalogs.items():
+                if util.queryId(obj) != docid:
+                    # Added and then rolled back to a savepoint.
+                    break
+                catalog_counters.count(catalog_counters.indexed, key)
+                catalog.index_doc(docid, obj)
+
+
+reindex_queue = ReindexQueue()
+
+
+def reindexImmediately(factory):
+    """Never defer reindexing documents in the catalog of the factory."""
+    ReindexQueue.immediate.add(factory.key())
 
 
 @adapter(IIntIdAddedEvent)
@@ -179,8 +329,9 @@ def indexDocSubscriber(event):
     util = getUtility(IIntIds, context=app)
     obj_id = util.getId(obj)
     catalogs = ICatalogs(app)
-    for entry in catalogs.values():
-        entry.catalog.index_doc(obj_id, obj)
+    for key, catalog in routeCatalogs(catalogs, obj):
+        catalog_counters.count(catalog_counters.indexed, key)
+        catalog.index_doc(obj_id, obj)
 
 
 @adapter(IObjectModifiedEvent)
@@ -198,8 +349,12 @@ def reindexDocSubscriber(event):
     catalogs = ICatalogs(app)
     if obj is catalogs:
         return
-    for entry in catalogs.values():
-        entry.catalog.index_doc(obj_id, obj)
+    for key, catalog in routeCatalogs(catalogs, obj, obj_id):
+        if reindex_queue.deferred and key not in reindex_queue.immediate:
+            reindex_queue.add(key, catalog, obj_id, obj, util)
+        else:
+            catalog_counters.count(catalog_counters.indexed, key)
+            catalog.index_doc(obj_id, obj)
 
 
 @adapter(IIntIdRemovedEvent)
@@ -212,9 +367,11 @@ def unindexDocSubscriber(event):
     obj_id = util.queryId(obj)
     if obj_id is None:
         return
+    reindex_queue.discard(obj_id)
     catalogs = ICatalogs(app)
-    for entry in catalogs.values():
-        entry.catalog.unindex_doc(obj_id)
+    for key, catalog in routeCatalogs(catalogs, obj, obj_id):
+        catalog_counters.count(catalog_counters.unindexed, key)
+        catalog.unindex_doc(obj_id)
 
 
 def appendGlobbing(text):
@@ -67,6 +67,9 @@ from schooltool.person.interfaces import IPersonFactory
 from schooltool.app.interfaces import ICookieLanguageSelector
 from schooltool.app.interfaces import CatalogSetUpEvent
 from schooltool.app.interfaces import CatalogStartUpEvent
+from schooltool.table.catalog import setCollationLanguages
+from schooltool.securitypolicy.policy import permission_cache
+from schooltool.app.security import principal_cache
 from schooltool.utility.utility import setUpUtilities
 from schooltool.utility.utility import UtilitySpecification
 
@@ -108,6 +111,9 @@ def setLanguage(lang):
     if lang == 'auto':
         return # language is negotiated at runtime through Accept-Language.
 
+    setCollationLanguages([language.strip()
+                           for language in lang.split(",")])
+
     if len(lang.split(",")) > 1:
 
         class CookiePreferredLanguage(CookieLanguageSelector):
@@ -501,6 +507,10 @@ class SchoolToolMachinery(object):
             options,
             site_zcml=options.config.site_definition)
         setLanguage(options.config.lang)
+        permission_cache.configure(options.config.permission_cache_size,
+                                   options.config.permission_cache_ttl)
+        principal_cache.configure(options.config.principal_cache_size,
+                                  options.config.principal_cache_ttl)
         self.configureReportlab(options.config.reportlab_fontdir)
 
 
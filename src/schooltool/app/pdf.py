@@ -26,6 +26,25 @@ def isEnabled():
     return enabled
 
 
+def renderRML(rml, stream, filename=None):
+    """Render an RML document as PDF directly into a writable stream.
+
+    Unlike z3c.rml.rml2pdf.parseString, the PDF is not collected in an
+    intermediate buffer, so the output can go straight into a blob.
+    """
+    from lxml import etree
+    from z3c.rml import document
+
+    if isinstance(rml, unicode) and rml.startswith('<?xml'):
+        # lxml refuses unicode input with an encoding declaration.
+        rml = rml.split('\n', 1)[-1]
+    root = etree.fromstring(rml)
+    doc = document.Document(root)
+    if filename:
+        doc.filename = filename
+    doc.process(stream)
+
+
 # ------------------
 # Font configuration
 # ------------------
@@ -19,9 +19,15 @@
 SchoolTool security infrastructure
 """
 
+import datetime
+import threading
+import time
 import urllib
+from collections import OrderedDict
 
+from BTrees.Length import Length
 from persistent import Persistent
+from zope.annotation.interfaces import IAnnotations
 from zope.component import getUtility, queryUtility
 from zope.component import getNextUtility
 from zope.container.contained import Contained
@@ -51,6 +57,7 @@ from schooltool.securitypolicy.crowds import Crowd, Description
 from schooltool.securitypolicy.crowds import ManagerGroupCrowd
 # XXX: move ConfigurableCrowd here
 from schooltool.securitypolicy.crowds import ConfigurableCrowd, ParentCrowd
+from schooltool.term.interfaces import IDateManager
 
 from schooltool.common import SchoolToolMessage as _
 
@@ -70,6 +77,96 @@ class Principal(Contained):
             return self._person
 
 
+class PrincipalCache(object):
+    """Process wide LRU cache of group ids of person principals.
+
+    Keys include the membership version stored in the database, which
+    is changed when group memberships change, so outdated entries are
+    never hit and just fall out of the cache.  Entries also expire after
+    ttl seconds.  The cache is disabled when size is 0.
+    """
+
+    def __init__(self, size=0, ttl=300):
+        self.lock = threading.Lock()
+        self.configure(size, ttl)
+
+    def configure(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.invalidate()
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                return None
+            self.entries[key] = entry
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            if not self.enabled:
+                return
+            self.entries.pop(key, None)
+            self.entries[key] = (value, time.time() + self.ttl)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        with self.lock:
+            self.entries = OrderedDict()
+
+
+principal_cache = PrincipalCache()
+
+
+MEMBERSHIP_VERSION_KEY = 'schooltool.app.security.membership_version'
+
+
+def getMembershipVersion(app):
+    """Return the persistent membership version counter of the app."""
+    return IAnnotations(app).get(MEMBERSHIP_VERSION_KEY)
+
+
+def bumpMembershipVersion():
+    """Change the membership version stored in the application.
+
+    All processes read the version in each transaction, so group ids
+    they cached before the change are no longer hit.
+    """
+    app = ISchoolToolApplication(None, None)
+    if app is None:
+        return
+    annotations = IAnnotations(app)
+    version = annotations.get(MEMBERSHIP_VERSION_KEY)
+    if version is None:
+        version = annotations[MEMBERSHIP_VERSION_KEY] = Length()
+    version.change(1)
+
+
+def membershipChangedSubscriber(event):
+    """Bump the membership version when group memberships change."""
+    rel_type = getattr(event, 'rel_type', None)
+    if rel_type is None:
+        rel_type = event.link.rel_type
+    # avoid circular imports
+    from schooltool.app.membership import URIMembership
+    if rel_type == URIMembership:
+        bumpMembershipVersion()
+
+
+def groupMovedSubscriber(group, event):
+    """Bump the membership version when group principal ids change."""
+    bumpMembershipVersion()
+
+
 class PersonContainerAuthenticationPlugin(object):
     implements(ISchoolToolAuthenticationPlugin)
 
@@ -170,9 +267,7 @@ class PersonContainerAuthenticationPlugin(object):
                 person = app['persons'][username]
                 principal = Principal(id, person.title,
                                       person=ProxyFactory(person))
-                for group in person.groups:
-                    group_principal_id = self.group_prefix + group.__name__
-                    principal.groups.append(group_principal_id)
+                principal.groups.extend(self.getGroupIds(person))
                 authenticated = queryUtility(IAuthenticatedGroup)
                 if authenticated:
                     principal.groups.append(authenticated.id)
@@ -182,6 +277,46 @@ class PersonContainerAuthenticationPlugin(object):
                 return principal
         return None
 
+    def getGroupIds(self, person):
+        """Return principal ids of groups the person is a member of today.
+
+        Group ids of persons stored in the database are cached when the
+        principal cache is enabled.
+        """
+        key = None
+        if (principal_cache.enabled and
+            person._p_jar is not None and person._p_oid is not None):
+            key = self.getGroupIdsCacheKey(person)
+        if key is not None:
+            group_ids = principal_cache.get(key)
+            if group_ids is not None:
+                return list(group_ids)
+        group_ids = [self.group_prefix + group.__name__
+                     for group in person.groups]
+        if key is not None:
+            principal_cache.set(key, tuple(group_ids))
+        return group_ids
+
+    def getGroupIdsCacheKey(self, person):
+        app = ISchoolToolApplication(None, None)
+        if app is None:
+            return None
+        version = getMembershipVersion(app)
+        if version is None:
+            version_value = 0
+        elif version._p_jar is None or version._p_changed:
+            # Memberships changed in this transaction, which may still
+            # be aborted.
+            return None
+        else:
+            version_value = version()
+        dateman = queryUtility(IDateManager)
+        if dateman is not None:
+            today = dateman.today
+        else:
+            today = datetime.date.today()
+        return (person._p_jar.db(), person._p_oid, today, version_value)
+
     def setCredentials(self, request, username, password):
         # avoid circular imports
         from schooltool.person.person import hash_password
@@ -303,8 +303,92 @@ def doctest_Calendar():
         >>> cal2.title
         'A person'
 
-    We will trust that `expand` inherited from CalendarMixin has been unit
-    tested.
+    """
+
+
+def doctest_Calendar_expand():
+    r"""Tests for Calendar.expand.
+
+        >>> from pytz import utc
+        >>> from schooltool.app.cal import Calendar, CalendarEvent
+        >>> from schooltool.calendar.recurrent import DailyRecurrenceRule
+        >>> cal = Calendar(None)
+
+        >>> def titles(first, last):
+        ...     return sorted(e.title for e in cal.expand(
+        ...         first.replace(tzinfo=utc), last.replace(tzinfo=utc)))
+
+    Calendars index non-recurring events by their start time.
+
+        >>> cal.addEvent(CalendarEvent(datetime(2005, 2, 1, 10), timedelta(hours=1),
+        ...                            'Monday', unique_id='mon'))
+        >>> cal.addEvent(CalendarEvent(datetime(2005, 2, 8, 10), timedelta(hours=1),
+        ...                            'Next Monday', unique_id='next'))
+        >>> cal.addEvent(CalendarEvent(datetime(2005, 1, 1), timedelta(days=35),
+        ...                            'Holidays', unique_id='holidays'))
+        >>> sorted(key[1] for key in cal._starts)
+        ['holidays', 'mon', 'next']
+
+        >>> titles(datetime(2005, 2, 1), datetime(2005, 2, 2))
+        ['Holidays', 'Monday']
+        >>> titles(datetime(2005, 2, 1, 11), datetime(2005, 2, 8, 10))
+        ['Holidays']
+        >>> titles(datetime(2005, 2, 6), datetime(2005, 2, 9))
+        ['Next Monday']
+
+    Recurring events are expanded one by one.
+
+        >>> daily = CalendarEvent(datetime(2005, 2, 7, 9), timedelta(hours=1),
+        ...                       'Daily', unique_id='daily',
+        ...                       recurrence=DailyRecurrenceRule())
+        >>> cal.addEvent(daily)
+        >>> list(cal._recurring)
+        ['daily']
+        >>> titles(datetime(2005, 2, 6), datetime(2005, 2, 9))
+        ['Daily', 'Daily', 'Next Monday']
+
+    The index follows changes to events.
+
+        >>> monday = cal.find('mon')
+        >>> monday.dtstart = datetime(2005, 2, 7, 12, tzinfo=utc)
+        >>> titles(datetime(2005, 2, 6), datetime(2005, 2, 9))
+        ['Daily', 'Daily', 'Monday', 'Next Monday']
+
+        >>> daily.recurrence = None
+        >>> titles(datetime(2005, 2, 6), datetime(2005, 2, 9))
+        ['Daily', 'Monday', 'Next Monday']
+        >>> list(cal._recurring)
+        []
+
+        >>> cal.removeEvent(monday)
+        >>> titles(datetime(2005, 2, 6), datetime(2005, 2, 9))
+        ['Daily', 'Next Monday']
+
+    Events are looked up as far back as the longest event lasts, which
+    follows changes to event durations.
+
+        >>> long = CalendarEvent(datetime(2004, 1, 1), timedelta(days=400),
+        ...                      'Long', unique_id='long')
+        >>> cal.addEvent(long)
+        >>> cal._durations.maxKey()
+        datetime.timedelta(400)
+        >>> long.duration = timedelta(days=2)
+        >>> cal._durations.maxKey()
+        datetime.timedelta(35)
+        >>> cal.removeEvent(long)
+        >>> list(cal._durations.items())
+        [(datetime.timedelta(0, 3600), 2), (datetime.timedelta(35), 1)]
+
+    Calendars stored before the index was introduced look at every event.
+
+        >>> cal._starts = cal._recurring = cal._durations = None
+        >>> titles(datetime(2005, 2, 1), datetime(2005, 2, 9))
+        ['Daily', 'Holidays', 'Next Monday']
+
+        >>> cal._buildIndex()
+        >>> titles(datetime(2005, 2, 1), datetime(2005, 2, 9))
+        ['Daily', 'Holidays', 'Next Monday']
+
     """
 
 
@@ -673,15 +673,125 @@ def doctest_catalog_subscribers():
         firing IntIdAddedEvent
         CatalogStub('demo') indexed doc 3 (<TestObj 'three'>)
 
+    Modified objects are queued for reindexing.
+
         >>> test_three.name='three and a half'
         >>> notifyModified(test_three)
         firing ObjectModifiedEvent
+
+        >>> notifyModified(test_three)
+        firing ObjectModifiedEvent
+
+    The queue is flushed before the transaction commits, reindexing
+    each object once.
+
+        >>> import transaction
+        >>> from schooltool.app.catalog import reindex_queue
+        >>> [hook for hook, args, kw in
+        ...  transaction.get().getBeforeCommitHooks()]
+        [<bound method ReindexQueue.flush of
+          <schooltool.app.catalog.ReindexQueue object at ...>>]
+
+        >>> reindex_queue.flush()
         CatalogStub('demo') indexed doc 3 (<TestObj 'three and a half'>)
 
+    Code that queries catalogs mid-transaction can flush the queue
+    itself, or turn deferred reindexing off.
+
+        >>> reindex_queue.deferred = False
+        >>> notifyModified(test_three)
+        firing ObjectModifiedEvent
+        CatalogStub('demo') indexed doc 3 (<TestObj 'three and a half'>)
+        >>> reindex_queue.deferred = True
+
+    Removed objects are not reindexed.
+
+        >>> notifyModified(test_three)
+        firing ObjectModifiedEvent
+
         >>> notifyAndRemove(test_three)
         firing IntIdRemovedEvent
         CatalogStub('demo') unindexed doc 3
 
+        >>> reindex_queue.flush()
+
+    Catalogs of objects implementing an interface are routed only the
+    objects that provide it.
+
+        >>> from zc.catalog.extentcatalog import FilterExtent
+        >>> from schooltool.table.catalog import FilterImplementing
+
+        >>> class IFoo(Interface):
+        ...     pass
+        >>> class Foo(TestObj):
+        ...     implements(IFoo)
+
+        >>> foo_catalog = PrintingCatalogStub('foo')
+        >>> foo_catalog.extent = FilterExtent(FilterImplementing(IFoo))
+        >>> catalogs['foo'] = VersionedCatalog(foo_catalog, 'v1')
+
+        >>> from schooltool.app.catalog import catalog_counters
+        >>> catalog_counters.reset()
+
+        >>> test_four = TestObj('four')
+        >>> addAndNotify(test_four, 4)
+        firing IntIdAddedEvent
+        CatalogStub('demo') indexed doc 4 (<TestObj 'four'>)
+
+        >>> test_five = Foo('five')
+        >>> addAndNotify(test_five, 5)
+        firing IntIdAddedEvent
+        CatalogStub('demo') indexed doc 5 (<Foo 'five'>)
+        CatalogStub('foo') indexed doc 5 (<Foo 'five'>)
+
+        >>> notifyModified(test_four)
+        firing ObjectModifiedEvent
+        >>> notifyModified(test_four)
+        firing ObjectModifiedEvent
+        >>> reindex_queue.flush()
+        CatalogStub('demo') indexed doc 4 (<TestObj 'four'>)
+
+        >>> notifyAndRemove(test_five)
+        firing IntIdRemovedEvent
+        CatalogStub('demo') unindexed doc 5
+        CatalogStub('foo') unindexed doc 5
+
+    Counters show how many documents each catalog got, how many were
+    not routed to it and how many reindexing requests were coalesced.
+
+        >>> print sorted(catalog_counters.indexed.items())
+        [(u'demo', 3), (u'foo', 1)]
+        >>> print sorted(catalog_counters.unindexed.items())
+        [(u'demo', 1), (u'foo', 1)]
+        >>> print sorted(catalog_counters.skipped.items())
+        [(u'foo', 3)]
+        >>> print sorted(catalog_counters.coalesced.items())
+        [(u'demo', 1)]
+
+    Objects that stop providing the interface are still routed to the
+    catalogs that hold them, which unindex them.
+
+        >>> from zope.interface import alsoProvides, noLongerProvides
+        >>> test_six = TestObj('six')
+        >>> alsoProvides(test_six, IFoo)
+        >>> addAndNotify(test_six, 6)
+        firing IntIdAddedEvent
+        CatalogStub('demo') indexed doc 6 (<TestObj 'six'>)
+        CatalogStub('foo') indexed doc 6 (<TestObj 'six'>)
+        >>> foo_catalog.extent.add(6, test_six)
+
+        >>> noLongerProvides(test_six, IFoo)
+        >>> notifyModified(test_six)
+        firing ObjectModifiedEvent
+        >>> reindex_queue.flush()
+        CatalogStub('demo') indexed doc 6 (<TestObj 'six'>)
+        CatalogStub('foo') indexed doc 6 (<TestObj 'six'>)
+
+        >>> notifyAndRemove(test_six)
+        firing IntIdRemovedEvent
+        CatalogStub('demo') unindexed doc 6
+        CatalogStub('foo') unindexed doc 6
+
     """
 
 
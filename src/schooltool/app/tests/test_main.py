@@ -109,6 +109,10 @@ def doctest_load_options():
         ['/var/log/schooltool/web-access.log']
         >>> o.config.reportlab_fontdir
         '/fonts/liberation:/fonts/ubuntu'
+        >>> o.config.permission_cache_size, o.config.permission_cache_ttl
+        (0, 300)
+        >>> o.config.principal_cache_size, o.config.principal_cache_ttl
+        (0, 300)
 
     `load_options` can also give you a nice help message and exit with status
     code 0.
@@ -239,11 +243,19 @@ def doctest_setLanguage():
         >>> IUserPreferredLanguages(request).getPreferredLanguages()
         []
 
+    Collation keys are indexed only in configured languages:
+
+        >>> from schooltool.table.catalog import getCollationLanguages
+        >>> getCollationLanguages()
+        ()
+
     Now, if we specify a language, a language adapter should be set up:
 
         >>> setLanguage('lt')
         >>> IUserPreferredLanguages(request).getPreferredLanguages()
         ('lt',)
+        >>> getCollationLanguages()
+        ('lt',)
 
     If the language list contains more than one language, you get a
     cookie language selector:
@@ -260,8 +272,17 @@ def doctest_setLanguage():
         >>> upl.getPreferredLanguages()
         ('en',)
 
+        >>> getCollationLanguages()
+        ('en', 'lt')
+
+        >>> setLanguage('fr,en-ca')
+        >>> getCollationLanguages()
+        ('fr', 'en_CA')
+
     We're done.
 
+        >>> from schooltool.table.catalog import setCollationLanguages
+        >>> setCollationLanguages(())
         >>> setup.placelessTearDown()
 
     """
@@ -296,6 +317,10 @@ def doctest_setup():
         ...     attendance_log_file = ['STDOUT']
         ...     lang = 'lt'
         ...     reportlab_fontdir = ''
+        ...     permission_cache_size = 0
+        ...     permission_cache_ttl = 300
+        ...     principal_cache_size = 0
+        ...     principal_cache_ttl = 300
         ...     devmode = False
         ...     site_definition = ftesting_zcml
         >>> options.config = ConfigStub()
@@ -118,6 +118,34 @@ def doctest_setUpFonts():
     """
 
 
+def doctest_renderRML():
+    r"""Tests for renderRML.
+
+        >>> from StringIO import StringIO
+        >>> from schooltool.app.pdf import renderRML
+
+    The PDF is written straight into the given stream.
+
+        >>> rml = u'''<?xml version="1.0" encoding="utf-8"?>
+        ... <!DOCTYPE document SYSTEM "rml_1_0.dtd">
+        ... <document filename="ignored.pdf">
+        ...   <template><pageTemplate id="main">
+        ...     <frame id="body" x1="0" y1="0" width="100" height="100" />
+        ...   </pageTemplate></template>
+        ...   <story><para>Hello</para></story>
+        ... </document>'''
+
+        >>> stream = StringIO()
+        >>> renderRML(rml, stream, filename='report.pdf')
+        >>> data = stream.getvalue()
+        >>> data.startswith('%PDF')
+        True
+        >>> data.rstrip().endswith('%%EOF')
+        True
+
+    """
+
+
 def tryToSetUpReportLab():
     """Try to set up reportlab.
 
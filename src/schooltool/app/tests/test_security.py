@@ -63,13 +63,150 @@ class TestAuthSetUpSubscriber(unittest.TestCase):
         authSetUpSubscriber(self.app, event)
 
 
+def doctest_PersonContainerAuthenticationPlugin_getGroupIds():
+    """Tests for PersonContainerAuthenticationPlugin.getGroupIds.
+
+        >>> from schooltool.app import security
+        >>> plugin = security.PersonContainerAuthenticationPlugin()
+
+        >>> from zope.annotation.interfaces import IAttributeAnnotatable
+        >>> from zope.component import provideAdapter
+        >>> from zope.interface import implements
+        >>> from schooltool.app.interfaces import ISchoolToolApplication
+        >>> setup.setUpAnnotations()
+        >>> class AppStub(object):
+        ...     implements(IAttributeAnnotatable)
+        >>> app = AppStub()
+        >>> provideAdapter(lambda ignored: app, (None, ),
+        ...                ISchoolToolApplication)
+
+        >>> class GroupStub(object):
+        ...     def __init__(self, name):
+        ...         self.__name__ = name
+        >>> class GroupsStub(list):
+        ...     def __iter__(self):
+        ...         print 'Listing groups'
+        ...         return list.__iter__(self)
+        >>> class ConnectionStub(object):
+        ...     def db(self):
+        ...         return 'db'
+        >>> class PersonStub(object):
+        ...     _p_jar = None
+        ...     _p_oid = None
+        ...     def __init__(self, *groups):
+        ...         self.groups = GroupsStub(map(GroupStub, groups))
+
+    The cache is disabled by default:
+
+        >>> person = PersonStub('teachers')
+        >>> person._p_jar = ConnectionStub()
+        >>> person._p_oid = 'oid'
+        >>> plugin.getGroupIds(person)
+        Listing groups
+        ['sb.group.teachers']
+        >>> plugin.getGroupIds(person)
+        Listing groups
+        ['sb.group.teachers']
+
+    Let's enable it.
+
+        >>> security.principal_cache.configure(1000, 300)
+
+    Group ids of persons that are not stored in the database are not
+    cached:
+
+        >>> unsaved = PersonStub('teachers')
+        >>> plugin.getGroupIds(unsaved)
+        Listing groups
+        ['sb.group.teachers']
+        >>> plugin.getGroupIds(unsaved)
+        Listing groups
+        ['sb.group.teachers']
+
+    Others are looked up once:
+
+        >>> plugin.getGroupIds(person)
+        Listing groups
+        ['sb.group.teachers']
+        >>> plugin.getGroupIds(person)
+        ['sb.group.teachers']
+
+    Until group memberships change.  The membership version is stored in
+    the application, so changes made by other processes are seen too.
+
+        >>> from schooltool.app.membership import URIMembership
+        >>> class EventStub(object):
+        ...     def __init__(self, rel_type):
+        ...         self.rel_type = rel_type
+        >>> security.membershipChangedSubscriber(EventStub('example:Other'))
+        >>> plugin.getGroupIds(person)
+        ['sb.group.teachers']
+
+        >>> person.groups.append(GroupStub('clerks'))
+        >>> security.membershipChangedSubscriber(EventStub(URIMembership))
+        >>> version = security.getMembershipVersion(app)
+        >>> version()
+        1
+
+    Group ids are not cached while the version has uncommitted changes,
+    as the transaction may still be aborted.
+
+        >>> plugin.getGroupIds(person)
+        Listing groups
+        ['sb.group.teachers', 'sb.group.clerks']
+        >>> plugin.getGroupIds(person)
+        Listing groups
+        ['sb.group.teachers', 'sb.group.clerks']
+
+    Once it is committed, they are cached again.
+
+        >>> version._p_jar = ConnectionStub()
+        >>> version._p_changed = False
+        >>> plugin.getGroupIds(person)
+        Listing groups
+        ['sb.group.teachers', 'sb.group.clerks']
+        >>> plugin.getGroupIds(person)
+        ['sb.group.teachers', 'sb.group.clerks']
+
+    Entries expire after the TTL:
+
+        >>> cache = security.PrincipalCache(size=2, ttl=-1)
+        >>> cache.set('a', 1)
+        >>> print cache.get('a')
+        None
+
+    The cache is bounded:
+
+        >>> cache = security.PrincipalCache(size=2)
+        >>> cache.set('a', 1)
+        >>> cache.set('b', 2)
+        >>> cache.get('a')
+        1
+        >>> cache.set('c', 3)
+        >>> cache.get('a'), cache.get('b'), cache.get('c')
+        (1, None, 3)
+
+        >>> security.principal_cache.configure(0, 300)
+
+    """
+
+
+def setUp(test):
+    setup.placelessSetUp()
+
+
+def tearDown(test):
+    setup.placelessTearDown()
+
+
 def test_suite():
     optionflags = (doctest.ELLIPSIS |
                    doctest.NORMALIZE_WHITESPACE | doctest.REPORT_ONLY_FIRST_FAILURE |
                    doctest.REPORT_NDIFF)
     return unittest.TestSuite([
         unittest.makeSuite(TestAuthSetUpSubscriber),
-        doctest.DocTestSuite(optionflags=optionflags),
+        doctest.DocTestSuite(optionflags=optionflags,
+                             setUp=setUp, tearDown=tearDown),
         doctest.DocFileSuite('../security.txt', optionflags=optionflags),
         ])
 
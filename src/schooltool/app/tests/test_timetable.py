@@ -0,0 +1,193 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2016 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.app.timetable.
+"""
+import unittest
+import doctest
+from datetime import date, time, timedelta
+
+import zope.event
+from zope.app.testing import setup
+from zope.component import provideAdapter, provideHandler, provideUtility
+from zope.container.contained import containedEvent
+from zope.intid.interfaces import IIntIds
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
+
+from schooltool.schoolyear.interfaces import ISchoolYear
+from schooltool.term.interfaces import ITermContainer
+from schooltool.term.term import Term, EmergencyDayEvent
+from schooltool.timetable.daytemplates import DayTemplate
+from schooltool.timetable.daytemplates import SchoolDayTemplates
+from schooltool.timetable.daytemplates import TimeSlot
+from schooltool.timetable.daytemplates import getScheduledTemplatesSchedule
+from schooltool.timetable.interfaces import ISchooldays
+from schooltool.timetable.interfaces import ITimetable
+from schooltool.timetable.interfaces import ITimetableContainer
+from schooltool.timetable.schedule import Period
+from schooltool.timetable.timetable import Timetable
+
+
+class IntIdsStub(object):
+
+    def __init__(self):
+        self.objects = []
+
+    def getId(self, obj):
+        if obj not in self.objects:
+            self.objects.append(obj)
+        return self.objects.index(obj)
+
+    def queryObject(self, id, default=None):
+        return self.objects[id]
+
+
+class TermContainerStub(object):
+
+    def __init__(self, term):
+        self.term = term
+
+    def getItemForDate(self, date):
+        if date in self.term:
+            return self.term
+        return None
+
+
+class SchoolYearStub(object):
+
+    def __init__(self, timetables):
+        self.timetables = timetables
+
+
+class SchooldaysStub(object):
+
+    def __init__(self, term):
+        self.term = term
+
+    def __contains__(self, date):
+        return date in self.term and self.term.isSchoolday(date)
+
+    def countDates(self, first, last):
+        return self.term.countSchooldays(first, last)
+
+    @property
+    def version(self):
+        return self.term._schooldays
+
+
+def printMeetings(timetable, first, last):
+    for meeting in timetable.iterMeetings(first, last):
+        print meeting.period.title, 'on', meeting.dtstart.strftime('%Y-%m-%d %H:%M')
+
+
+def addSchoolDayTemplates(timetable, name, days):
+    templates, event = containedEvent(SchoolDayTemplates(), timetable, name)
+    zope.event.notify(event)
+    templates.initTemplates()
+    for n, items in enumerate(days):
+        day = templates.templates['%d' % (n+1)] = DayTemplate('Day %d' % (n+1))
+        for key, item in items:
+            day[key] = item
+    return templates
+
+
+def doctest_EmergencyDayTimetableSubscriber():
+    """Tests for EmergencyDayTimetableSubscriber.
+
+    We have a term with schooldays from Monday to Friday.
+
+        >>> term = Term('Fall', date(2011, 10, 3), date(2011, 10, 16))
+        >>> term.addWeekdays(0, 1, 2, 3, 4)
+
+    The timetable rotates two day templates by schoolday.
+
+        >>> timetable = Timetable(term.first, term.last, timezone='UTC')
+        >>> timetable.periods = addSchoolDayTemplates(timetable, 'periods', [
+        ...     [('1', Period(title='A'))],
+        ...     [('1', Period(title='B'))]])
+        >>> timetable.time_slots = addSchoolDayTemplates(
+        ...     timetable, 'time_slots', [
+        ...     [('1', TimeSlot(time(9, 0), timedelta(0, 2700)))],
+        ...     [('1', TimeSlot(time(9, 0), timedelta(0, 2700)))]])
+
+        >>> schoolyear = SchoolYearStub({'default': timetable})
+        >>> provideAdapter(lambda d: TermContainerStub(term),
+        ...                (date, ), ITermContainer)
+        >>> provideAdapter(lambda t: schoolyear, (Term, ), ISchoolYear)
+        >>> provideAdapter(lambda sy: sy.timetables,
+        ...                (SchoolYearStub, ), ITimetableContainer)
+        >>> provideAdapter(lambda tt: SchooldaysStub(term),
+        ...                (ITimetable, ), ISchooldays)
+        >>> provideAdapter(getScheduledTemplatesSchedule)
+
+        >>> printMeetings(timetable, date(2011, 10, 3), date(2011, 10, 11))
+        A on 2011-10-03 09:00
+        B on 2011-10-04 09:00
+        A on 2011-10-05 09:00
+        B on 2011-10-06 09:00
+        A on 2011-10-07 09:00
+        B on 2011-10-10 09:00
+        A on 2011-10-11 09:00
+
+        >>> def printModified(event):
+        ...     for desc in event.descriptions:
+        ...         print 'Modified', desc.first, '-', desc.last
+        >>> provideHandler(printModified, (IObjectModifiedEvent, ))
+
+    Wednesday is replaced by Saturday.  Meetings of Wednesday move to
+    Saturday, and the extra schoolday shifts the rotation for the rest
+    of the timetable, so all the meetings from Wednesday on are modified.
+
+        >>> from schooltool.app.timetable import EmergencyDayTimetableSubscriber
+        >>> term.add(date(2011, 10, 8))
+        >>> event = EmergencyDayEvent(date(2011, 10, 5), date(2011, 10, 8))
+        >>> EmergencyDayTimetableSubscriber(event)()
+        Modified 2011-10-05 - 2011-10-16
+
+        >>> printMeetings(timetable, date(2011, 10, 3), date(2011, 10, 11))
+        A on 2011-10-03 09:00
+        B on 2011-10-04 09:00
+        B on 2011-10-06 09:00
+        A on 2011-10-07 09:00
+        A on 2011-10-08 09:00
+        A on 2011-10-10 09:00
+        B on 2011-10-11 09:00
+
+    """
+
+
+def setUp(test):
+    setup.placelessSetUp()
+    provideUtility(IntIdsStub(), IIntIds)
+
+
+def tearDown(test):
+    setup.placelessTearDown()
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS | doctest.REPORT_NDIFF |
+                   doctest.NORMALIZE_WHITESPACE)
+    return unittest.TestSuite([
+        doctest.DocTestSuite(optionflags=optionflags,
+                             setUp=setUp, tearDown=tearDown),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
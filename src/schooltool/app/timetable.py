@@ -32,6 +32,7 @@ from schooltool.term.term import getTermForDate, EmergencyDayEvent
 from schooltool.timetable.interfaces import ITimetableContainer
 from schooltool.timetable.interfaces import IScheduleExceptions
 from schooltool.timetable.schedule import MeetingException
+from schooltool.timetable.schedule import MeetingsModified
 
 
 class EmergencyDayTimetableSubscriber(EventAdapterSubscriber):
@@ -68,4 +69,10 @@ class EmergencyDayTimetableSubscriber(EventAdapterSubscriber):
                     timetable.exceptions[new_date] = meeting_exceptions
                     modified = True
                 if modified:
-                    zope.lifecycleevent.modified(timetable)
+                    # The replacement schoolday also shifts day templates
+                    # that rotate by schoolday, so meetings change up to
+                    # the end of the timetable.
+                    zope.lifecycleevent.modified(
+                        timetable,
+                        MeetingsModified(min(old_date, new_date),
+                                         timetable.last))
@@ -164,6 +164,7 @@ class PersonCatalog(AttributeCatalog):
     version = '3 - updated title'
     interface = IBasicPerson
     attributes = ('__name__', 'title', 'first_name', 'last_name')
+    collation_attributes = ('__name__', 'first_name', 'last_name')
 
     def setIndexes(self, catalog):
         super(PersonCatalog, self).setIndexes(catalog)
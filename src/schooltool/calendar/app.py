@@ -19,7 +19,10 @@
 SchoolTool calendaring objects.
 """
 import base64
+import datetime
 
+from pytz import utc
+from BTrees.OOBTree import OOBTree
 from persistent.dict import PersistentDict
 from persistent import Persistent
 from zope.interface import implements, implementer
@@ -65,6 +68,27 @@ class CalendarEvent(SimpleCalendarEvent, Persistent, Contained):
         if interface is ICalendar:
             return self.__parent__
 
+    def __setattr__(self, name, value):
+        if name not in Calendar._indexed_attrs:
+            super(CalendarEvent, self).__setattr__(name, value)
+            return
+        calendars = self._indexingCalendars()
+        for calendar in calendars:
+            calendar._unindexEvent(self)
+        super(CalendarEvent, self).__setattr__(name, value)
+        for calendar in calendars:
+            calendar._indexEvent(self)
+
+    def _indexingCalendars(self):
+        """Return the calendars that index this event by time."""
+        if self.__parent__ is None:
+            return []
+        calendars = [self.__parent__]
+        calendars.extend([ISchoolToolCalendar(resource)
+                          for resource in self.resources])
+        return [calendar for calendar in calendars
+                if isinstance(calendar, Calendar)]
+
     def bookResource(self, resource):
         calendar = ISchoolToolCalendar(resource)
         if resource in self.resources:
@@ -93,17 +117,71 @@ class CalendarEvent(SimpleCalendarEvent, Persistent, Contained):
 class Calendar(Persistent, CalendarMixin):
     """A persistent calendar."""
 
-    # CalendarMixin is only used for the expand() method
-
     implements(ISchoolToolCalendar, IAttributeAnnotatable)
 
     __name__ = 'calendar'
 
     title = property(lambda self: self.__parent__.title)
 
+    # Attributes of events that determine when they happen
+    _indexed_attrs = ('dtstart', 'duration', 'recurrence')
+
+    # Non-recurring events keyed by (dtstart, unique_id), recurring events
+    # keyed by unique_id, and the number of non-recurring events by
+    # duration.  Calendars created before the index was introduced have no
+    # index and expand by looking at every event.
+    _starts = None
+    _recurring = None
+    _durations = None
+
     def __init__(self, owner):
         self.events = PersistentDict()
         self.__parent__ = owner
+        self._buildIndex()
+
+    def _buildIndex(self):
+        self._starts = OOBTree()
+        self._recurring = OOBTree()
+        self._durations = OOBTree()
+        for event in self.events.itervalues():
+            self._indexEvent(event)
+
+    def _indexKey(self, event):
+        dtstart = event.dtstart
+        if dtstart.tzinfo is None:
+            dtstart = dtstart.replace(tzinfo=utc)
+        return dtstart, event.unique_id
+
+    def _indexEvent(self, event):
+        if self._starts is None:
+            return
+        if event.recurrence is not None:
+            self._recurring[event.unique_id] = event
+            return
+        key = self._indexKey(event)
+        if key in self._starts:
+            return
+        self._starts[key] = event
+        duration = event.duration
+        if isinstance(duration, datetime.timedelta):
+            self._durations[duration] = self._durations.get(duration, 0) + 1
+
+    def _unindexEvent(self, event):
+        if self._starts is None:
+            return
+        if event.unique_id in self._recurring:
+            del self._recurring[event.unique_id]
+        key = self._indexKey(event)
+        if key not in self._starts:
+            return
+        del self._starts[key]
+        duration = event.duration
+        if isinstance(duration, datetime.timedelta):
+            count = self._durations.get(duration, 0) - 1
+            if count > 0:
+                self._durations[duration] = count
+            elif duration in self._durations:
+                del self._durations[duration]
 
     def __iter__(self):
         return self.events.itervalues()
@@ -125,12 +203,14 @@ class Calendar(Persistent, CalendarMixin):
         elif self.__parent__ not in event.resources:
             raise ValueError("Event already belongs to a calendar")
         self.events[event.unique_id] = event
+        self._indexEvent(event)
 
     def removeEvent(self, event):
         if self.__parent__ in event.resources:
             event.unbookResource(self.__parent__)
         else:
             del self.events[event.unique_id]
+            self._unindexEvent(event)
             parent_calendar = event.__parent__
             if self is parent_calendar:
                 for resource in event.resources:
@@ -146,6 +226,35 @@ class Calendar(Persistent, CalendarMixin):
     def find(self, unique_id):
         return self.events[unique_id]
 
+    def expand(self, first, last):
+        """Return an iterator over all expanded events in a given time period.
+
+        Non-recurring events are looked up by their start time, only
+        recurring events are asked to expand themselves.
+        """
+        assert first.tzname() is not None
+        assert last.tzname() is not None
+        if self._starts is None:
+            events = self
+        else:
+            events = self._iterEventsBetween(first, last)
+        for event in events:
+            for recurrence in event.expand(first, last):
+                yield recurrence
+
+    def _iterEventsBetween(self, first, last):
+        """Iterate over events that may happen between first and last."""
+        for event in self._recurring.itervalues():
+            yield event
+        if self._durations:
+            max_duration = self._durations.maxKey()
+        else:
+            max_duration = datetime.timedelta(0)
+        earliest = first - max_duration - datetime.timedelta.resolution
+        for event in self._starts.itervalues(min=(earliest, ),
+                                             max=(last, )):
+            yield event
+
 
 def getCalendar(owner):
     """Adapt an ``IAnnotatable`` object to ``ISchoolToolCalendar``."""
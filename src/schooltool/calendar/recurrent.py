@@ -69,6 +69,19 @@ class RecurrenceRule(object):
                                  " datetime.dates (got %r in exceptions)"
                                  % (ex, ))
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_exception_set', None)
+        return state
+
+    def _getExceptionSet(self):
+        """Return the exceptions as a set, built once per rule."""
+        try:
+            return self._exception_set
+        except AttributeError:
+            self._exception_set = frozenset(self._exceptions)
+            return self._exception_set
+
     def replace(self, interval=Unchanged, count=Unchanged, until=Unchanged,
                 exceptions=Unchanged):
         if interval is Unchanged:
@@ -119,13 +132,14 @@ class RecurrenceRule(object):
             startdate = event.dtstart.date()
 
         count, cur = self._scroll(event, startdate)
+        exceptions = self._getExceptionSet()
 
         while True:
             if ((enddate and cur > enddate) or
                 (self.count is not None and count >= self.count) or
                 (self.until and cur > self.until)):
                 break
-            if cur not in self.exceptions and cur >= startdate:
+            if cur not in exceptions and cur >= startdate:
                 yield cur
             count += 1
             cur = self._nextRecurrence(cur)
@@ -212,18 +226,21 @@ class YearlyRecurrenceRule(RecurrenceRule):
 
     def _scroll(self, event, startdate):
         """Given a startdate, finds a nearest event recurrence and its nr"""
-        if startdate >= event.dtstart.date():
-            years = startdate.year - event.dtstart.date().year
+        start = event.dtstart.date()
+        if startdate >= start:
+            steps = (startdate.year - start.year) / self.interval
         else:
-            years = 0
-        count = years / self.interval
-        while True:
-            try:
-                newyear = event.dtstart.date().year + count * self.interval
-                cur = event.dtstart.date().replace(year=newyear)
-                return count, cur
-            except ValueError:
-                count -= self.interval
+            steps = 0
+        if (start.month, start.day) != (2, 29):
+            return steps, start.replace(year=start.year + steps * self.interval)
+        # February 29 only recurs in leap years, other years do not count.
+        count = 0
+        year = start.year
+        for step in range(1, steps + 1):
+            if calendar.isleap(start.year + step * self.interval):
+                count += 1
+                year = start.year + step * self.interval
+        return count, start.replace(year=year)
 
     def _iCalArgs(self, dtstart):
         """Return iCalendar parameters specific to monthly reccurence."""
@@ -286,15 +303,15 @@ class WeeklyRecurrenceRule(RecurrenceRule):
         """Fast-forward to recurrences near startdate"""
         start = event.dtstart.date()
         if startdate >= start:
-            weeks = weekspan(start, startdate)
+            weeks = weekspan(start, startdate) / self.interval
         else:
             weeks = 0
-        perweek = len(self.weekdays) + 1 # nr of recurrences per week
-        count = weeks / self.interval * perweek
-        if count > perweek:
-            count -= perweek # to get entries with weekday < that of start
-        offset = datetime.timedelta(7) * count / perweek * self.interval
-        return count, start + offset
+        # nr of recurrences per week
+        perweek = len(set(self.weekdays + (start.weekday(), )))
+        step = datetime.timedelta(7 * self.interval)
+        if weeks > 1 or (weeks == 1 and start + step > startdate):
+            weeks -= 1 # to get entries with weekday < that of start
+        return weeks * perweek, start + step * weeks
 
     def apply(self, event, startdate=None, enddate=None):
         """Generate dates of recurrences."""
@@ -306,6 +323,7 @@ class WeeklyRecurrenceRule(RecurrenceRule):
         if startdate is None:
             startdate = start
         count, cur = self._scroll(event, startdate)
+        exceptions = self._getExceptionSet()
         weekdays = set(self.weekdays)
         weekdays.add(event.dtstart.weekday())
         while True:
@@ -317,7 +335,7 @@ class WeeklyRecurrenceRule(RecurrenceRule):
             # the desired weekday
             if (weekspan(start, cur) % self.interval == 0 and
                 cur.weekday() in weekdays):
-                if cur not in self.exceptions and cur >= startdate:
+                if cur not in exceptions and cur >= startdate:
                     yield cur
                 count += 1
             cur = self._nextRecurrence(cur)
@@ -387,25 +405,38 @@ class MonthlyRecurrenceRule(RecurrenceRule):
         return (self.__class__.__name__, self.interval, self.count,
                 self.until, self.exceptions, self.monthly)
 
-    def _scroll(self, event, startdate):
-        """Given a startdate, finds a nearest event recurrence and its nr"""
+    def _scrollMonths(self, event, startdate):
+        """Return the number of intervals from the event to startdate."""
         dstart = event.dtstart.date()
-        if startdate > event.dtstart.date():
+        if startdate > dstart:
             months = (12 * (startdate.year - dstart.year) +
                       startdate.month - dstart.month)
         else:
             months = 0
+        return months / self.interval
 
-        count = months / self.interval
-        while True:
-            try:
-                year, month = divmod(dstart.year * 12 + dstart.month +
-                                     count * self.interval - 1, 12)
-                month += 1 # 1..12
-                cur = event.dtstart.date().replace(year=year, month=month)
-                return count, cur
-            except ValueError:
-                count -= 1
+    def _addIntervals(self, date, steps):
+        """Return the year and month a number of intervals after date."""
+        year, month = divmod(date.year * 12 + date.month - 1 +
+                             steps * self.interval, 12)
+        return year, month + 1 # 1..12
+
+    def _scroll(self, event, startdate):
+        """Given a startdate, finds a nearest event recurrence and its nr"""
+        dstart = event.dtstart.date()
+        steps = self._scrollMonths(event, startdate)
+        if dstart.day <= 28:
+            year, month = self._addIntervals(dstart, steps)
+            return steps, dstart.replace(year=year, month=month)
+        # Months that are too short for the day do not count.
+        count = 0
+        cur = dstart
+        for step in range(1, steps + 1):
+            year, month = self._addIntervals(dstart, step)
+            if dstart.day <= calendar.monthrange(year, month)[1]:
+                count += 1
+                cur = dstart.replace(year=year, month=month)
+        return count, cur
 
     def _nextRecurrence(self, date):
         """Add basic step of recurrence to the date."""
@@ -444,9 +475,11 @@ class MonthlyRecurrenceRule(RecurrenceRule):
         if startdate is None:
             startdate = start
 
-        count, cur = self._scroll(event, startdate)
-        year = cur.year
-        month = cur.month
+        # Every month has a recurrence.  Step back one, as it may fall
+        # into the next month.
+        count = max(self._scrollMonths(event, startdate) - 1, 0)
+        year, month = self._addIntervals(start, count)
+        exceptions = self._getExceptionSet()
 
         while True:
             cur = monthindex(year, month, index, weekday)
@@ -454,7 +487,7 @@ class MonthlyRecurrenceRule(RecurrenceRule):
                 (self.count is not None and count >= self.count) or
                 (self.until and cur > self.until)):
                 break
-            if cur not in self.exceptions and cur >= startdate:
+            if cur not in exceptions and cur >= startdate:
                 yield cur
             count += 1
             # Next month, please.
@@ -471,9 +504,11 @@ class MonthlyRecurrenceRule(RecurrenceRule):
         if startdate is None:
             startdate = start
 
-        count, cur = self._scroll(event, startdate)
-        year = cur.year
-        month = cur.month
+        # Every month has a recurrence.  Step back one, as it may fall
+        # into the next month.
+        count = max(self._scrollMonths(event, startdate) - 1, 0)
+        year, month = self._addIntervals(start, count)
+        exceptions = self._getExceptionSet()
 
         while True:
             cur = monthindex(year, month, index, weekday)
@@ -481,7 +516,7 @@ class MonthlyRecurrenceRule(RecurrenceRule):
                 (self.count is not None and count >= self.count) or
                 (self.until and cur > self.until)):
                 break
-            if cur not in self.exceptions and cur >= startdate:
+            if cur not in exceptions and cur >= startdate:
                 yield cur
             count += 1
             # Next month, please.
@@ -90,6 +90,61 @@ class RecurrenceRuleTestBase:
         for attrname in ['interval', 'count', 'until', 'exceptions']:
             self.assertRaises(AttributeError, setattr, r, attrname, 'not-ro')
 
+    def test_pickle(self):
+        # The set of exceptions built by apply() is not pickled.
+        import pickle
+        from schooltool.calendar.simple import SimpleCalendarEvent
+        ev = SimpleCalendarEvent(datetime(2004, 10, 13, 12, 0),
+                                 timedelta(minutes=10), "pickled")
+        rule = self.createRule(exceptions=[date(2004, 10, 14)])
+        list(rule.apply(ev, enddate=date(2005, 1, 1)))
+        copy = pickle.loads(pickle.dumps(rule, 2))
+        self.assertEquals(copy, rule)
+        self.assert_('_exception_set' not in copy.__dict__)
+
+    # Variations of rule specific arguments for test_apply_scrolled
+    variations = [{}]
+
+    def test_apply_scrolled(self):
+        # Recurrences after any start date are the same as the ones of the
+        # whole sequence, also when their number is limited.
+        from schooltool.calendar.simple import SimpleCalendarEvent
+        enddate = date(2008, 1, 1)
+        exceptions = [date(2004, 3, 31), date(2005, 2, 28), date(2006, 10, 13)]
+        for dtstart in [datetime(2004, 1, 31, 12, 0),
+                        datetime(2004, 2, 29, 12, 0),
+                        datetime(2004, 10, 13, 12, 0)]:
+            ev = SimpleCalendarEvent(dtstart, timedelta(minutes=10),
+                                     "reality check", unique_id='uid')
+            for kwargs in self.variations:
+                for rule in [self.createRule(count=7, **kwargs),
+                             self.createRule(interval=3, count=9,
+                                             exceptions=exceptions, **kwargs),
+                             self.createRule(interval=2, **kwargs)]:
+                    everything = list(rule.apply(ev, enddate=enddate))
+                    for days in range(-3, 1400, 31):
+                        startdate = dtstart.date() + timedelta(days)
+                        self.assertEqual(
+                            list(rule.apply(ev, startdate, enddate)),
+                            [d for d in everything if d >= startdate],
+                            (rule, dtstart, startdate))
+
+    def test_apply_old_event(self):
+        # Expanding a week of an event that started years ago does not
+        # step through the years in between.
+        from schooltool.calendar.simple import SimpleCalendarEvent
+        ev = SimpleCalendarEvent(datetime(2000, 9, 4, 9, 0),
+                                 timedelta(minutes=45),
+                                 "five years ago", unique_id='uid')
+        exceptions = [date(2000, 9, 4) + timedelta(d) for d in range(0, 1800, 3)]
+        tick = time.clock()
+        for kwargs in self.variations:
+            rule = self.createRule(exceptions=exceptions, **kwargs)
+            for week in range(100):
+                first = date(2005, 9, 5) + timedelta(7 * week)
+                list(rule.apply(ev, first, first + timedelta(6)))
+        self.assertEquals(int(time.clock() - tick), 0)
+
 
 class TestDailyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
 
@@ -299,14 +354,20 @@ class TestYearlyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
                          (0, date(1996, 2, 29)))
         self.assertEqual(rule._scroll(ev, date(1999, 3, 1)),
                          (0, date(1996, 2, 29)))
+        # years without February 29 do not count
         self.assertEqual(rule._scroll(ev, date(2000, 3, 1)),
-                         (4, date(2000, 2, 29)))
+                         (1, date(2000, 2, 29)))
         self.assertEqual(rule._scroll(ev, date(2004, 3, 1)),
-                         (8, date(2004, 2, 29)))
+                         (2, date(2004, 2, 29)))
 
 
 class TestWeeklyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
 
+    variations = [{'weekdays': ()},
+                  {'weekdays': (0, 3)},
+                  {'weekdays': (1, 2, 5)},
+                  {'weekdays': (0, 1, 2, 3, 4, 5, 6)}]
+
     def createRule(self, *args, **kwargs):
         from schooltool.calendar.recurrent import WeeklyRecurrenceRule
         return WeeklyRecurrenceRule(*args, **kwargs)
@@ -437,6 +498,10 @@ class TestWeeklyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
 
 class TestMonthlyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
 
+    variations = [{'monthly': 'monthday'},
+                  {'monthly': 'weekday'},
+                  {'monthly': 'lastweekday'}]
+
     def createRule(self, *args, **kwargs):
         from schooltool.calendar.recurrent import MonthlyRecurrenceRule
         return MonthlyRecurrenceRule(*args, **kwargs)
@@ -719,7 +784,7 @@ class TestMonthlyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
         self.assertEqual(rule._scroll(ev, date(2005, 3, 14)),
                          (1, date(2005, 1, 13)))
 
-        # If we ask for an illegal dates, we get less events
+        # Illegal dates are skipped and do not count
         rule = self.createRule()
         ev = SimpleCalendarEvent(datetime(2004, 1, 30, 12, 0),
                            timedelta(minutes=10),
@@ -728,9 +793,8 @@ class TestMonthlyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
                          (0, date(2004, 1, 30)))
         self.assertEqual(rule._scroll(ev, date(2004, 2, 28)),
                          (0, date(2004, 1, 30)))
-        # sequence nr 1 is taken by illegal date 2004-02-30
         self.assertEqual(rule._scroll(ev, date(2004, 3, 1)),
-                         (2, date(2004, 3, 30)))
+                         (1, date(2004, 3, 30)))
 
     def test_iCalRepresentation(self):
         # This method deliberately overrides the test in the base class.
@@ -63,6 +63,7 @@ from schooltool.contact.contact import getAppContactStates
 from schooltool.contact.interfaces import IContactPerson
 from schooltool.contact.interfaces import IEmails, IPhones, ILanguages
 from schooltool import table
+from schooltool.table.column import filterIndexedItems
 
 from schooltool.common import SchoolToolMessage as _
 
@@ -635,24 +636,27 @@ class ContactFilterWidget(table.catalog.IndexedFilterWidget):
                 self.request.form[parameter] = ''
             return items
 
-        catalog = self.catalog
-
         if 'SEARCH_FIRST_NAME' in self.request:
-            # XXX: applying normalized catalog queries would be nicer
-            fn_idx = catalog['first_name']
-            searchstr = self.request['SEARCH_FIRST_NAME'].lower()
-            items = [item for item in items
-                     if searchstr in fn_idx.documents_to_values[item['id']].lower()]
+            items = self.filterSubstring(
+                items, 'first_name', self.request['SEARCH_FIRST_NAME'])
 
         if 'SEARCH_LAST_NAME' in self.request:
-            # XXX: applying normalized catalog queries would be nicer
-            ln_idx = catalog['last_name']
-            searchstr = self.request['SEARCH_LAST_NAME'].lower()
-            items = [item for item in items
-                     if searchstr in ln_idx.documents_to_values[item['id']].lower()]
+            items = self.filterSubstring(
+                items, 'last_name', self.request['SEARCH_LAST_NAME'])
 
         return items
 
+    def filterSubstring(self, items, index_name, searchstr):
+        catalog = self.catalog
+        searchstr = searchstr.lower()
+        substrings = catalog.get(table.catalog.substringIndexName(index_name))
+        if substrings is not None:
+            docids = substrings.apply(searchstr)
+            return filterIndexedItems(items, docids)
+        index = catalog[index_name]
+        return [item for item in items
+                if searchstr in index.documents_to_values[item['id']].lower()]
+
     def active(self):
         for parameter in self.parameters:
             if parameter in self.request:
@@ -685,8 +689,7 @@ class FlourishContactFilterWidget(ContactFilterWidget):
             if query:
                 catalog = self.catalog
                 result = catalog['text'].apply(query)
-                items = [item for item in items
-                         if item['id'] in result]
+                items = filterIndexedItems(items, result)
         return items
 
 
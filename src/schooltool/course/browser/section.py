@@ -74,6 +74,7 @@ from schooltool.group.browser.group import number_getter
 from schooltool.person.interfaces import IPerson
 from schooltool.person.interfaces import IPersonFactory
 from schooltool.report.browser.report import RequestRemoteReportDialog
+from schooltool.report.cache import dataVersions
 from schooltool.relationship.temporal import ACTIVE
 from schooltool.resource.browser.resource import EditLocationRelationships
 from schooltool.resource.browser.resource import EditEquipmentRelationships
@@ -1905,6 +1906,7 @@ class SectionSignInOutPDFView(SectionPDFViewBase, SignInOutPDFView):
 class FlourishRequestSectionRosterView(RequestRemoteReportDialog):
 
     report_builder = 'section_roster.pdf'
+    cache_reports = True
 
 
 class SectionRosterPDFView(SectionPDFViewBase, flourish.report.PlainPDFPage):
@@ -1921,6 +1923,20 @@ class SectionRosterPDFView(SectionPDFViewBase, flourish.report.PlainPDFPage):
         courses = [c.__name__ for c in self.context.courses]
         return 'section_roster_%s' % '_'.join(courses)
 
+    def cacheData(self):
+        """Versions of the objects shown in the roster."""
+        section = removeSecurityProxy(self.context)
+        term = ITerm(section)
+        objects = [section, term, term.__parent__]
+        objects.extend(section.courses)
+        objects.extend(section.instructors)
+        objects.extend(section.resources)
+        today = getUtility(IDateManager).today
+        for person in section.members:
+            objects.append(person)
+            objects.extend(person.levels.on(today).any(ACTIVE))
+        return dataVersions(objects)
+
 
 def level_getter(today):
     def getter(person, formatter):
@@ -856,6 +856,64 @@ def doctest_CoursesViewlet():
     """
 
 
+def doctest_SectionRosterPDFView_cacheData():
+    r"""Tests for SectionRosterPDFView.cacheData.
+
+        >>> import datetime
+        >>> from zope.component import provideAdapter, provideUtility
+        >>> from zope.interface import implements
+        >>> from schooltool.course.browser import section as section_views
+        >>> from schooltool.term.interfaces import ITerm, IDateManager
+
+        >>> class DateManagerStub(object):
+        ...     implements(IDateManager)
+        ...     today = datetime.date(2014, 9, 1)
+        >>> provideUtility(DateManagerStub())
+
+        >>> class Stub(object):
+        ...     def __init__(self, title, **kw):
+        ...         self.title = title
+        ...         self.__dict__.update(kw)
+        ...     def __repr__(self):
+        ...         return self.title
+
+        >>> class LevelsStub(object):
+        ...     def __init__(self, *levels):
+        ...         self.levels = levels
+        ...     def on(self, date):
+        ...         print 'levels on', date
+        ...         return self
+        ...     def any(self, *states):
+        ...         return self.levels
+
+        >>> schoolyear = Stub('2014')
+        >>> term = Stub('Fall', __parent__=schoolyear)
+        >>> provideAdapter(lambda section: term, (Stub, ), ITerm)
+
+        >>> section = Stub('Math 1',
+        ...     courses=[Stub('Math')],
+        ...     instructors=[Stub('Teacher')],
+        ...     resources=[Stub('Room 101')],
+        ...     members=[Stub('John', levels=LevelsStub(Stub('Grade 9'))),
+        ...              Stub('Pete', levels=LevelsStub())])
+
+        >>> real_versions = section_views.dataVersions
+        >>> section_views.dataVersions = lambda objects: objects
+
+    The roster is cached while the section, its courses, instructors,
+    locations, members and their levels do not change.
+
+        >>> view = section_views.SectionRosterPDFView(section, TestRequest())
+        >>> view.cacheData()
+        levels on 2014-09-01
+        levels on 2014-09-01
+        [Math 1, Fall, 2014, Math, Teacher, Room 101, John, Grade 9, Pete]
+
+        >>> section_views.dataVersions = real_versions
+
+    """
+
+
 def test_suite():
     suite = unittest.TestSuite()
     optionflags = (doctest.ELLIPSIS |
@@ -47,6 +47,7 @@ from schooltool.course.interfaces import ISectionContainer
 from schooltool.level.interfaces import ILevelContainer
 from schooltool.report.browser.report import RequestRemoteReportDialog
 from schooltool.report.browser.report import ProgressReportPage
+from schooltool.report.interfaces import IReportStreamRenderer
 from schooltool.report.report import ReportLinkViewlet
 from schooltool.task.progress import TaskProgress
 from schooltool.task.progress import normalized_progress
@@ -293,6 +294,7 @@ class ContactRelationship(object):
 
 
 class MegaExporter(SchoolTimetableExportView):
+    implements(IReportStreamRenderer)
 
     overall_line_id = 'overall'
 
@@ -902,7 +904,12 @@ class MegaExporter(SchoolTimetableExportView):
         self.setUpHeaders(data)
         return data
 
-    def __call__(self):
+    def renderToStream(self, stream, *args, **kw):
+        workbook = self.buildWorkbook()
+        workbook.save(stream)
+        return True
+
+    def buildWorkbook(self):
         self.makeProgress()
         self.task_progress.title = _("Exporting school data")
         self.addImporters(self.task_progress)
@@ -922,6 +929,10 @@ class MegaExporter(SchoolTimetableExportView):
         self.export_groups(wb)
         self.task_progress.title = _("Export complete")
         self.task_progress.force('overall', progress=1.0)
+        return wb
+
+    def __call__(self):
+        wb = self.buildWorkbook()
         data = self.render(wb)
         return data
 
@@ -932,6 +943,9 @@ class XLSReportTask(AbstractReportTask):
     default_mimetype = 'application/vnd.ms-excel'
 
     def renderReport(self, renderer, stream, *args, **kw):
+        if IReportStreamRenderer.providedBy(renderer):
+            return AbstractReportTask.renderReport(
+                self, renderer, stream, *args, **kw)
         workbook = renderer(*args, **kw)
         if workbook is None:
             raise NoReportException()
@@ -945,7 +959,7 @@ class RemoteMegaExporter(MegaExporter):
     makeProgress = ExcelExportView.makeProgress
 
     def render(self, workbook):
-        # Return the workbook itself, should use it to save to blob directly
+        # Return the workbook itself, renderToStream saves it to the blob
         return workbook
 
 
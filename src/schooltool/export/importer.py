@@ -76,6 +76,7 @@ from schooltool.common import parse_time_range
 from schooltool.task.interfaces import IRemoteTask
 from schooltool.level.interfaces import ILevelContainer
 from schooltool.level.level import Level
+from schooltool.relationship import RelationshipBatch
 from schooltool.task.progress import Timer
 from schooltool.task.progress import normalized_progress
 from schooltool.task.tasks import RemoteTask
@@ -165,6 +166,17 @@ no_date = object()
 no_data = object()
 
 
+def unique(objects):
+    """Return objects without repeats, in their original order."""
+    seen = set()
+    result = []
+    for obj in objects:
+        if id(obj) not in seen:
+            seen.add(id(obj))
+            result.append(obj)
+    return result
+
+
 class ImporterBase(object):
 
     title = _("Import")
@@ -424,6 +436,17 @@ class ImporterBase(object):
             section.courses.add(removeSecurityProxy(course))
         return section
 
+    def relateMissing(self, batch, relationship, targets):
+        """Add relationships that updateRelationships would create."""
+        this = removeSecurityProxy(relationship.this)
+        missing = unique(
+            [removeSecurityProxy(target) for target, codes in targets
+             if codes and relationship.state(target) is None])
+        for target in missing:
+            batch.relate(relationship.rel_type,
+                         (this, relationship.my_role),
+                         (target, relationship.other_role))
+
     def updateRelationships(self, relationship, target, app_states, codes):
         target = removeSecurityProxy(target)
         existing = relationship.state(target)
@@ -1698,18 +1721,35 @@ class SectionEnrollmentImporter(ImporterBase, SectionMixin):
             instructor_states = self.instructor_app_states
             all_teacher_members = teachers_group.members.all()
 
+            new_student_members = unique(
+                [removeSecurityProxy(student) for student, codes in students
+                 if student not in all_student_members])
+            new_teacher_members = unique(
+                [removeSecurityProxy(instructor)
+                 for instructor, codes in instructors
+                 if instructor not in all_teacher_members])
+
+            # Establish missing relationships in one batch, the loops
+            # below only update their states.
+            batch = RelationshipBatch()
+            for section in sections:
+                self.relateMissing(batch, section.members, students)
+                self.relateMissing(batch, section.instructors, instructors)
+            batch.apply()
+
             for section in sections:
                 for student, codes in students:
                     self.updateRelationships(
                         section.members, student, student_states, codes)
-                    if student not in all_student_members:
-                        students_group.members.add(removeSecurityProxy(student))
 
                 for instructor, codes in instructors:
                     self.updateRelationships(
                         section.instructors, instructor, instructor_states, codes)
-                    if instructor not in all_teacher_members:
-                        teachers_group.members.add(removeSecurityProxy(instructor))
+
+            for student in new_student_members:
+                students_group.members.add(student)
+            for instructor in new_teacher_members:
+                teachers_group.members.add(instructor)
 
             self.progress(row, nrows)
 
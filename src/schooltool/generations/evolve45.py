@@ -0,0 +1,53 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2016 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 45.
+
+Index shared relationship state keys by link uid.
+"""
+import transaction
+from BTrees.OOBTree import OOBTree, OOTreeSet
+from zope.app.generations.utility import getRootFolder
+from zope.component.hooks import getSite, setSite
+
+from schooltool.generations import linkcatalogs
+from schooltool.relationship.relationship import getLinkCatalog
+
+
+def evolveSharedIndex(index):
+    index.uid_keys = uid_keys = OOBTree()
+    for n, (uid, key) in enumerate(index.data.keys()):
+        keys = uid_keys.get(uid)
+        if keys is None:
+            keys = uid_keys[uid] = OOTreeSet()
+        keys.insert(key)
+        if n % 10000 == 9999:
+            transaction.savepoint(optimistic=True)
+
+
+def evolve(context):
+    linkcatalogs.ensureEvolved(context)
+    root = getRootFolder(context)
+
+    old_site = getSite()
+
+    app = root
+    setSite(app)
+    evolveSharedIndex(getLinkCatalog()['shared'])
+
+    setSite(old_site)
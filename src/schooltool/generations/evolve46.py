@@ -0,0 +1,45 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2016 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 46.
+
+Remember the last link name given out by each link set.
+"""
+import transaction
+
+from schooltool.generations import linkcatalogs
+
+
+def evolveLinkSets(connection, oids):
+    for n, oid in enumerate(oids):
+        try:
+            linkset = connection.get(oid)
+        except KeyError:
+            continue
+        names = [int(name) for name in linkset._links.keys()
+                 if name.isdigit()]
+        linkset._last_name = max(names or [0])
+        if n % 10000 == 9999:
+            transaction.savepoint(optimistic=True)
+
+
+def evolve(context):
+    linkcatalogs.ensureEvolved(context)
+    connection = context.connection
+    link_oids, linkset_oids = linkcatalogs.collectOIDs(connection)
+    evolveLinkSets(connection, linkset_oids)
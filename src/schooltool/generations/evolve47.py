@@ -0,0 +1,51 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2016 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 47.
+
+Index calendar events by time.
+"""
+import transaction
+
+from schooltool.generations.utility import collectClassOIDs
+
+
+CALENDAR_CLASSES = (
+    'cschooltool.calendar.app\nCalendar\n',
+    'cschooltool.timetable.calendar\nScheduleCalendar\n',
+    )
+
+
+def collectCalendarOIDs(connection):
+    return collectClassOIDs(connection, CALENDAR_CLASSES)
+
+
+def evolveCalendars(connection, oids):
+    for n, oid in enumerate(oids):
+        try:
+            calendar = connection.get(oid)
+        except KeyError:
+            continue
+        calendar._buildIndex()
+        if n % 1000 == 999:
+            transaction.savepoint(optimistic=True)
+
+
+def evolve(context):
+    connection = context.connection
+    evolveCalendars(connection, collectCalendarOIDs(connection))
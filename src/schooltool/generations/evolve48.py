@@ -0,0 +1,60 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2016 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 48.
+
+Store term schooldays as a day offset bitmap.
+"""
+import transaction
+
+from schooltool.generations.utility import collectClassOIDs
+from schooltool.term.term import encodeSchooldays
+
+
+TERM_CLASSES = (
+    'cschooltool.term.term\nTerm\n',
+    )
+
+
+def collectTermOIDs(connection):
+    return collectClassOIDs(connection, TERM_CLASSES)
+
+
+def evolveTerm(term):
+    schooldays = term._schooldays
+    if isinstance(schooldays, str):
+        return
+    first = term._first.toordinal()
+    offsets = [date.toordinal() - first for date in schooldays]
+    term._schooldays = encodeSchooldays(term._first, term._last, offsets)
+
+
+def evolveTerms(connection, oids):
+    for n, oid in enumerate(oids):
+        try:
+            term = connection.get(oid)
+        except KeyError:
+            continue
+        evolveTerm(term)
+        if n % 1000 == 999:
+            transaction.savepoint(optimistic=True)
+
+
+def evolve(context):
+    connection = context.connection
+    evolveTerms(connection, collectTermOIDs(connection))
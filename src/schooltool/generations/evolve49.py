@@ -0,0 +1,35 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2016 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 49.
+
+Index school years and terms by their dates.
+"""
+from zope.app.generations.utility import getRootFolder
+
+from schooltool.schoolyear.schoolyear import SCHOOLYEAR_CONTAINER_KEY
+
+
+def evolve(context):
+    app = getRootFolder(context)
+    syc = app.get(SCHOOLYEAR_CONTAINER_KEY)
+    if syc is None:
+        return
+    syc._date_index = syc.buildDateIndex()
+    for schoolyear in syc.values():
+        schoolyear._date_index = schoolyear.buildDateIndex()
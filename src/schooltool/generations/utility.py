@@ -0,0 +1,40 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2016 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Helpers shared by SchoolTool generations.
+"""
+
+
+def collectClassOIDs(connection, class_prefixes):
+    """Collect OIDs of stored records whose pickle starts with a class prefix.
+
+    Records pickled with protocol 2 start with a protocol marker, which
+    is skipped before matching.
+    """
+    storage = connection.db().storage
+    next_oid = None
+    oids = []
+    while True:
+        oid, tid, data, next_oid = storage.record_iternext(next_oid)
+        if data.startswith('\x80'):
+            data = data[2:]
+        if data.startswith(class_prefixes):
+            oids.append(oid)
+        if next_oid is None:
+            break
+    return oids
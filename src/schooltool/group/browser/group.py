@@ -100,6 +100,9 @@ from schooltool.common import SchoolToolMessage as _
 from schooltool.basicperson.browser.person import FlourishPersonIDCardsViewBase
 from schooltool.report.report import OldReportTask
 from schooltool.report.browser.report import RequestRemoteReportDialog
+from schooltool.report.browser.report import RequestReportArchiveDialog
+from schooltool.report.browser.report import ReportArchivePage
+from schooltool.report.browser.report import ReportFileArchiver
 
 
 class GroupContainerAbsoluteURLAdapter(BrowserView):
@@ -994,6 +997,33 @@ class RequestSignInOutReportView(RequestRemoteReportDialog):
     report_builder = 'sign_in_out.pdf'
 
 
+class RequestGroupProfilesArchiveView(RequestReportArchiveDialog):
+
+    report_builder = 'group_profiles.zip'
+
+
+class GroupProfilesArchivePage(ReportArchivePage):
+
+    message_title = _('member profiles')
+    shard_size = 25
+
+    @property
+    def base_filename(self):
+        return '%s_profiles' % self.context.__name__
+
+
+class GroupProfilesArchiver(ReportFileArchiver):
+
+    title = _('Profiles')
+    view_name = 'person_profile.pdf'
+
+    def listItems(self):
+        collator = ICollator(self.request.locale)
+        factory = getUtility(IPersonFactory)
+        sorting_key = lambda x: factory.getSortingKey(x, collator)
+        return sorted(self.context.members, key=sorting_key)
+
+
 def number_getter(person, formatter):
     for i, item in enumerate(formatter.items):
         if sameProxiedObjects(person, item):
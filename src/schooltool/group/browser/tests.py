@@ -740,6 +740,111 @@ def doctest_GroupsViewlet():
     """
 
 
+def doctest_GroupProfilesArchivePage():
+    r"""Tests for GroupProfilesArchivePage.
+
+        >>> from StringIO import StringIO
+        >>> import zipfile
+        >>> from zope.interface import implements, Interface
+        >>> from zope.component import provideUtility
+        >>> from zope.i18n.interfaces.locales import ICollator
+        >>> from zope.i18n.interfaces.locales import ILocale
+        >>> from zope.intid.interfaces import IIntIds
+        >>> from zope.ucol.localeadapter import LocaleCollator
+        >>> from schooltool.group.group import Group, GroupContainer
+        >>> from schooltool.person.interfaces import IPerson, IPersonFactory
+        >>> from schooltool.person.person import Person
+        >>> from schooltool.report.browser.report import ArchiveFileManager
+        >>> from schooltool.skin.flourish.interfaces import IContentProvider
+        >>> from schooltool.skin.flourish.interfaces import IViewlet
+        >>> from schooltool.group.browser.group import GroupProfilesArchivePage
+        >>> from schooltool.group.browser.group import GroupProfilesArchiver
+
+        >>> provideAdapter(LocaleCollator, [ILocale], ICollator)
+
+        >>> class PersonFactoryStub(object):
+        ...     implements(IPersonFactory)
+        ...     def getSortingKey(self, person, collator):
+        ...         return collator.key(person.title)
+        >>> provideUtility(PersonFactoryStub())
+
+        >>> class IntIdsStub(object):
+        ...     implements(IIntIds)
+        ...     def getId(self, person):
+        ...         return int(person.__name__[1:])
+        ...     def getObject(self, key):
+        ...         return app['persons']['p%d' % key]
+
+        >>> class ProfileStub(object):
+        ...     def __init__(self, context, request):
+        ...         self.context = context
+        ...     filename = property(lambda self: '%s.pdf' % self.context.title)
+        ...     def __call__(self):
+        ...         return 'Profile of %s' % self.context.title
+        >>> provideAdapter(ProfileStub, (IPerson, None), Interface,
+        ...                name='person_profile.pdf')
+
+        >>> provideAdapter(ArchiveFileManager,
+        ...                (None, None, GroupProfilesArchivePage),
+        ...                IContentProvider, name='file_manager')
+        >>> provideAdapter(GroupProfilesArchiver,
+        ...                (None, None, GroupProfilesArchivePage,
+        ...                 ArchiveFileManager),
+        ...                IViewlet, name='profiles')
+
+        >>> from zope.security.checker import defineChecker, Checker
+        >>> defineChecker(GroupProfilesArchiver,
+        ...               Checker({'render': 'zope.Public'}))
+
+    The page archives member profiles of a group.
+
+        >>> app['groups'] = GroupContainer()
+        >>> app['groups']['tenth'] = group = Group(title="Tenth Grade")
+        >>> for n, title in enumerate(['Zed', 'Anne', 'Mike']):
+        ...     app['persons']['p%d' % n] = person = Person('p%d' % n, title)
+        ...     group.members.add(person)
+        >>> provideUtility(IntIdsStub())
+
+        >>> page = GroupProfilesArchivePage(group, TestRequest())
+
+    Large groups are split into shards rendered in parallel, ordered
+    by member names.
+
+        >>> page.shard_size
+        25
+        >>> shards = page.listShards(2)
+        >>> shards
+        [(u'profiles', (1, 2)), (u'profiles', (0,))]
+
+    Each shard archives the profiles of its members.
+
+        >>> def printArchive(stream):
+        ...     zip_file = zipfile.ZipFile(StringIO(stream.getvalue()))
+        ...     for name in zip_file.namelist():
+        ...         print name, '-', zip_file.read(name)
+
+        >>> page = GroupProfilesArchivePage(group, TestRequest())
+        >>> stream = StringIO()
+        >>> page.renderShard(stream, shards[0])
+        2
+        >>> printArchive(stream)
+        Anne.pdf - Profile of Anne
+        Mike.pdf - Profile of Mike
+
+    The whole archive includes all members.
+
+        >>> page = GroupProfilesArchivePage(group, TestRequest())
+        >>> stream = StringIO()
+        >>> page.render(stream)
+        3
+        >>> printArchive(stream)
+        Anne.pdf - Profile of Anne
+        Mike.pdf - Profile of Mike
+        Zed.pdf - Profile of Zed
+
+    """
+
+
 def setUp(test):
     placefulSetUp()
     setup.getIntegrationTestZCML()
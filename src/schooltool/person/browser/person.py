@@ -65,6 +65,7 @@ from schooltool.skin import flourish
 from schooltool.securitypolicy.crowds import Crowd
 from schooltool.securitypolicy.interfaces import ICrowd
 from schooltool.table.column import IndexedLocaleAwareGetterColumn
+from schooltool.table.column import filterIndexedItems
 from schooltool.table.table import url_cell_formatter
 
 
@@ -502,8 +503,7 @@ class PersonFilterWidget(table.catalog.IndexedFilterWidget):
                 int_ids = getUtility(IIntIds)
                 keys = set([int_ids.queryId(person)
                             for person in group.members])
-                items = [item for item in items
-                         if item['id'] in keys]
+                items = filterIndexedItems(items, keys)
 
         if self.search_title_id in self.request:
             searchstr = self.request[self.search_title_id]
@@ -511,8 +511,7 @@ class PersonFilterWidget(table.catalog.IndexedFilterWidget):
             if query:
                 catalog = ICatalog(self.source)
                 result = catalog['text'].apply(query)
-                items = [item for item in items
-                         if item['id'] in result]
+                items = filterIndexedItems(items, result)
 
         return items
 
@@ -675,8 +674,7 @@ class FlourishPersonFilterWidget(PersonFilterWidget):
                 int_ids = getUtility(IIntIds)
                 keys = set([int_ids.queryId(person)
                             for person in group.members])
-                items = [item for item in items
-                         if item['id'] in keys]
+                items = filterIndexedItems(items, keys)
 
         if 'SEARCH_TITLE' in self.request:
             search_title = self.request['SEARCH_TITLE']
@@ -684,7 +682,6 @@ class FlourishPersonFilterWidget(PersonFilterWidget):
             if query:
                 catalog = ICatalog(self.source)
                 result = catalog['text'].apply(query)
-                items = [item for item in items
-                         if item['id'] in result]
+                items = filterIndexedItems(items, result)
 
         return items
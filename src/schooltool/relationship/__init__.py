@@ -29,3 +29,4 @@ from schooltool.relationship.relationship import unrelateAll        # reexport
 from schooltool.relationship.relationship import getRelatedObjects  # reexport
 from schooltool.relationship.relationship import RelationshipSchema # reexport
 from schooltool.relationship.relationship import RelationshipProperty # ditto
+from schooltool.relationship.relationship import RelationshipBatch  # ditto
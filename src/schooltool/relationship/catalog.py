@@ -1,19 +1,18 @@
+import bisect
+
 from persistent import Persistent
 from zope.container.contained import Contained
 
 import zope.catalog.interfaces
-from BTrees.OOBTree import OOBTree
+from BTrees import IFBTree
+from BTrees.OOBTree import OOBTree, OOTreeSet
 from zope.interface import implements
 from zope.container.btree import BTreeContainer
-from zope.component import getUtility
-from zope.intid.interfaces import IIntIds
-from zope.intid import addIntIdSubscriber
-from zope.lifecycleevent import ObjectAddedEvent
 from zope.keyreference.interfaces import IKeyReference
-from zope.security.proxy import removeSecurityProxy
 from schooltool.relationship.interfaces import IRelationshipLink
+from schooltool.relationship.relationship import indexRelationshipLinks
 from schooltool.app.interfaces import ISchoolToolApplication
-from schooltool.app.catalog import AttributeCatalog
+from schooltool.app.catalog import AttributeCatalog, reindexImmediately
 from schooltool.app.app import StartUpBase
 from schooltool.table.catalog import ConvertingIndex
 
@@ -43,6 +42,10 @@ def hash_this_rel_type(link):
     return hash(link.rel_type), hash(link_this_keyref(link))
 
 
+def hash_this_role_rel_type(link):
+    return hash(link.role), hash(link.rel_type), hash(link_this_keyref(link))
+
+
 def cache_rel_type(link):
     app = ISchoolToolApplication(None)
     uris = app['schooltool.relationship.uri']
@@ -69,6 +72,7 @@ class SharedIndex(Persistent, Contained):
         Contained.__init__(self)
         self.uids = OOBTree()
         self.data = OOBTree()
+        self.uid_keys = OOBTree()
 
     def get(self, docid, key):
         uid = self.uids.get(docid)
@@ -83,29 +87,155 @@ class SharedIndex(Persistent, Contained):
         return (self.uids[docid], key) in self.data
 
     def index_doc(self, docid, link):
-        self.uids[docid] = get_link_shared_uid(link)
+        uid = self.uids[docid] = get_link_shared_uid(link)
+        keys = self.uid_keys.get(uid)
+        if keys is None:
+            keys = self.uid_keys[uid] = OOTreeSet()
         for key, value in link.shared.items():
-            self.data[self.uids[docid], key] = value
+            self.data[uid, key] = value
+            keys.insert(key)
 
     def unindex_doc(self, docid):
         if docid not in self.uids:
             return
-        unindex_uid = self.uids[docid]
-        tounindex = set()
-        for uid, key in self.data:
-            if uid == unindex_uid:
-                tounindex.add((uid, key))
-        for idx in tounindex:
-            del self.data[idx]
+        uid = self.uids[docid]
+        keys = self.uid_keys.get(uid)
+        if keys is None:
+            return
+        for key in keys:
+            if (uid, key) in self.data:
+                del self.data[uid, key]
+        del self.uid_keys[uid]
 
     def clear(self):
         self.data.clear()
         self.uids.clear()
+        self.uid_keys.clear()
 
     def apply(query):
         raise NotImplemented('querying this index is not supported')
 
 
+class TemporalStateIndex(Persistent, Contained):
+    """Index of temporal relationship states of links.
+
+    The states of a link are stored as a tuple of ascending dates and a
+    tuple of (meaning, code) pairs, shared by both links of a relationship.
+    Links are also posted under every meaning and code they ever had, and
+    under the meaning of their latest state, so that most links can be
+    ruled out with set operations before looking at their states.
+    Links of relationships without temporal state are not indexed.
+    """
+    implements(zope.catalog.interfaces.ICatalogIndex)
+
+    def __init__(self):
+        Persistent.__init__(self)
+        Contained.__init__(self)
+        self.uids = OOBTree()
+        self.uid_docs = OOBTree()
+        self.states = OOBTree()
+        self.stateless = IFBTree.IFTreeSet()
+        self.stateful = IFBTree.IFTreeSet()
+        self.meanings = OOBTree()
+        self.codes = OOBTree()
+        self.latest = OOBTree()
+
+    def _postings(self, docid, uid):
+        dates, states = self.states[uid]
+        if not dates:
+            return [self.stateless]
+        postings = [self.stateful]
+        for meaning, code in set(states):
+            postings.append(self.meanings.setdefault(
+                meaning, IFBTree.IFTreeSet()))
+            postings.append(self.codes.setdefault(
+                code, IFBTree.IFTreeSet()))
+        meaning, code = states[-1]
+        postings.append(self.latest.setdefault(meaning, IFBTree.IFTreeSet()))
+        return postings
+
+    def _post(self, docid, uid):
+        for docids in self._postings(docid, uid):
+            docids.insert(docid)
+
+    def _unpost(self, docid, uid):
+        for docids in self._postings(docid, uid):
+            if docid in docids:
+                docids.remove(docid)
+
+    def index_doc(self, docid, link):
+        states = link.shared.get('tmp')
+        if states is None:
+            self.unindex_doc(docid)
+            return
+        uid = get_link_shared_uid(link)
+        if self.uids.get(docid) != uid:
+            self.unindex_doc(docid)
+        self.uids[docid] = uid
+        docs = self.uid_docs.get(uid)
+        if docs is None:
+            docs = self.uid_docs[uid] = IFBTree.IFTreeSet()
+        states = tuple(reversed(states))
+        indexed = (tuple([date for date, state in states]),
+                   tuple([state for date, state in states]))
+        if self.states.get(uid) != indexed:
+            # The state is shared, so the other link of the relationship
+            # is reposted too.
+            if uid in self.states:
+                for other in docs:
+                    self._unpost(other, uid)
+            self.states[uid] = indexed
+            for other in docs:
+                self._post(other, uid)
+        if docid not in docs:
+            docs.insert(docid)
+            self._post(docid, uid)
+
+    def unindex_doc(self, docid):
+        uid = self.uids.get(docid)
+        if uid is None:
+            return
+        self._unpost(docid, uid)
+        del self.uids[docid]
+        docs = self.uid_docs[uid]
+        docs.remove(docid)
+        if not docs:
+            del self.uid_docs[uid]
+            del self.states[uid]
+
+    def clear(self):
+        self.uids.clear()
+        self.uid_docs.clear()
+        self.states.clear()
+        self.stateless.clear()
+        self.stateful.clear()
+        self.meanings.clear()
+        self.codes.clear()
+        self.latest.clear()
+
+    def get(self, docid, date=None):
+        """Return the (meaning, code) of a link on a date.
+
+        Returns the latest state if date is None, and None if the link
+        has no state on that date or is not indexed.
+        """
+        uid = self.uids.get(docid)
+        if uid is None:
+            return None
+        dates, states = self.states[uid]
+        if not dates:
+            return None
+        if date is None:
+            return states[-1]
+        pos = bisect.bisect_right(dates, date)
+        if not pos:
+            return None
+        return states[pos - 1]
+
+    def apply(self, query):
+        raise NotImplementedError('querying this index is not supported')
+
+
 class URICache(BTreeContainer):
 
     def cache(self, uri):
@@ -126,7 +256,7 @@ class URICacheStartUp(StartUpBase):
 
 class LinkCatalog(AttributeCatalog):
 
-    version = '1.1 - uri cache'
+    version = '1.3 - temporal state index'
     interface = IRelationshipLink
     attributes = ()
 
@@ -135,18 +265,19 @@ class LinkCatalog(AttributeCatalog):
         catalog['my_role_hash'] = ConvertingIndex(converter=hash_this_my_role)
         catalog['role_hash'] = ConvertingIndex(converter=hash_this_role)
         catalog['rel_type_hash'] = ConvertingIndex(converter=hash_this_rel_type)
+        catalog['role_rel_type_hash'] = ConvertingIndex(
+            converter=hash_this_role_rel_type)
         catalog['target'] = ConvertingIndex(converter=hash_this_target)
         catalog['shared'] = SharedIndex()
+        catalog['temporal'] = TemporalStateIndex()
 
 
 getLinkCatalog = LinkCatalog.get
 
+# Link state is read straight from the catalog (see SharedState), so
+# modified links must be reindexed at once.
+reindexImmediately(LinkCatalog)
+
 
 def indexLinks(event):
-    iids = getUtility(IIntIds)
-    for link in event.getLinks():
-        link = removeSecurityProxy(link)
-        addIntIdSubscriber(link, ObjectAddedEvent(link))
-        lid = iids.getId(link)
-        getLinkCatalog().index_doc(lid, link)
-        link.__parent__._lids.add(lid)
+    indexRelationshipLinks(event.getLinks())
@@ -23,13 +23,19 @@ half of a relationship.  The storage of links on an object is determined by
 an IRelationshipLinks adapter.  There is a default adapter registered for
 all IAnnotatable objects that uses Zope 3 annotations.
 """
+import sys
+import threading
+
 from BTrees import IFBTree
 from BTrees.OOBTree import OOBTree
 from persistent import Persistent
+import transaction
+import transaction.interfaces
 from zope.container.contained import Contained
 from zope.component import getUtility
 from zope.event import notify
 from zope.interface import implements
+from zope.intid import addIntIdSubscriber
 from zope.intid.interfaces import IIntIds
 from zope.keyreference.interfaces import IKeyReference
 from zope.lifecycleevent import ObjectModifiedEvent
@@ -70,20 +76,39 @@ class SharedState(object):
         link = getUtility(IIntIds).getObject(self.lid)
         link.shared[key] = value
         notify(ObjectModifiedEvent(link))
+        relationship_cache.invalidate()
 
 
 def relate(rel_type, (a, role_of_a), (b, role_of_b), extra_info=None):
     """Establish a relationship between objects `a` and `b`."""
-    for link in IRelationshipLinks(a):
-        if (link.target is b and link.role_hash == hash(role_of_b)
-            and link.rel_type_hash == hash(rel_type)):
-            raise DuplicateRelationship
+    checkNotRelated(rel_type, a, (b, role_of_b))
     shared = OOBTree()
     shared['X'] = extra_info
     zope.event.notify(BeforeRelationshipEvent(rel_type,
                                               (a, role_of_a),
                                               (b, role_of_b),
                                               shared))
+    addLinks(rel_type, (a, role_of_a), (b, role_of_b), shared)
+    zope.event.notify(RelationshipAddedEvent(rel_type,
+                                             (a, role_of_a),
+                                             (b, role_of_b),
+                                             shared))
+
+
+def checkNotRelated(rel_type, a, (b, role_of_b)):
+    """Raise DuplicateRelationship if `a` is already related to `b`."""
+    try:
+        lids = IRelationshipLinks(a).query(
+            target=b, role=role_of_b, rel_type=rel_type)
+    except zope.keyreference.interfaces.NotYet:
+        # Objects not yet in the database have no links indexed.
+        return
+    if lids:
+        raise DuplicateRelationship
+
+
+def addLinks(rel_type, (a, role_of_a), (b, role_of_b), shared):
+    """Create both links of a relationship sharing `shared` state."""
     uri_cache = getURICache()
     uri_cache.cache(rel_type)
     uri_cache.cache(role_of_a)
@@ -92,10 +117,7 @@ def relate(rel_type, (a, role_of_a), (b, role_of_b), extra_info=None):
     IRelationshipLinks(a).add(link_a)
     link_b = Link(role_of_b, a, role_of_a, rel_type, shared)
     IRelationshipLinks(b).add(link_b)
-    zope.event.notify(RelationshipAddedEvent(rel_type,
-                                             (a, role_of_a),
-                                             (b, role_of_b),
-                                             shared))
+    return link_a, link_b
 
 
 def duplicate(link, obj):
@@ -131,7 +153,6 @@ def duplicate(link, obj):
 def unrelate(rel_type, (a, role_of_a), (b, role_of_b)):
     """Break a relationship between objects `a` and `b`."""
     links_of_a = IRelationshipLinks(a)
-    links_of_b = IRelationshipLinks(b)
     try:
         link_a_to_b = links_of_a.find(role_of_a, b, role_of_b, rel_type)
     except ValueError:
@@ -141,17 +162,23 @@ def unrelate(rel_type, (a, role_of_a), (b, role_of_b)):
                                                       (a, role_of_a),
                                                       (b, role_of_b),
                                                       shared))
-    links_of_a.remove(link_a_to_b)
-    # If links_of_b.find raises a ValueError, our data structures are out of
-    # sync.
-    link_b_to_a = links_of_b.find(role_of_b, a, role_of_a, rel_type)
-    links_of_b.remove(link_b_to_a)
+    removeLinks(rel_type, (a, role_of_a), (b, role_of_b), link_a_to_b)
     zope.event.notify(RelationshipRemovedEvent(rel_type,
                                                (a, role_of_a),
                                                (b, role_of_b),
                                                shared))
 
 
+def removeLinks(rel_type, (a, role_of_a), (b, role_of_b), link_a_to_b):
+    """Remove both links of a relationship, given the link from `a`."""
+    IRelationshipLinks(a).remove(link_a_to_b)
+    # If links_of_b.find raises a ValueError, our data structures are out of
+    # sync.
+    links_of_b = IRelationshipLinks(b)
+    link_b_to_a = links_of_b.find(role_of_b, a, role_of_a, rel_type)
+    links_of_b.remove(link_b_to_a)
+
+
 def unrelateAll(obj):
     """Break all relationships of `obj`.
 
@@ -171,6 +198,298 @@ def unrelateAll(obj):
     return
 
 
+class RelationshipCacheCounters(object):
+    """Hit and miss counters of the relationship cache, for all threads."""
+
+    hits = 0
+    misses = 0
+    invalidations = 0
+
+    def reset(self):
+        self.hits = self.misses = self.invalidations = 0
+
+
+relationship_cache_counters = RelationshipCacheCounters()
+
+
+class RelationshipCacheDataManager(object):
+    """Drops the relationship cache when its transaction is rolled back.
+
+    Joins the transaction when the first result is cached, so that
+    results computed after a savepoint are not used once the savepoint
+    is rolled back.
+    """
+    implements(transaction.interfaces.IDataManager,
+               transaction.interfaces.ISavepointDataManager)
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @property
+    def transaction_manager(self):
+        return transaction.manager
+
+    def abort(self, transaction):
+        self.cache.invalidate()
+
+    # TPC protocol: tpc_begin commit tpc_vote (tpc_finish | tpc_abort)
+
+    def tpc_begin(self, transaction):
+        pass
+
+    def commit(self, transaction):
+        pass
+
+    def tpc_vote(self, transaction):
+        pass
+
+    def tpc_finish(self, transaction):
+        pass
+
+    def tpc_abort(self, transaction):
+        self.cache.invalidate()
+
+    def sortKey(self):
+        return '~schooltool:%s:%s' % (
+            self.__class__.__name__, id(self))
+
+    def savepoint(self):
+        return RelationshipCacheSavepoint(self.cache)
+
+
+class RelationshipCacheSavepoint(object):
+    implements(transaction.interfaces.IDataManagerSavepoint)
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def rollback(self):
+        self.cache.invalidate()
+
+
+class RelationshipCache(threading.local):
+    """Relationship property results cached for the current transaction.
+
+    Results are kept per link set.  They are dropped when links are added
+    to or removed from the link set, when new links are indexed, when the
+    shared state of any link changes, when a new transaction begins and
+    when the transaction or a savepoint is rolled back.  Once more than
+    `size` results are cached, all of them are dropped.
+    """
+
+    size = 10000
+
+    transaction = None
+    entries = None
+    count = 0
+
+    def lookup(self, linkset, key, compute):
+        linkset = removeSecurityProxy(linkset)
+        current = transaction.get()
+        if self.transaction is not current:
+            try:
+                current.join(RelationshipCacheDataManager(self))
+            except ValueError:
+                # The transaction is being committed, do not cache.
+                relationship_cache_counters.misses += 1
+                return compute()
+            self.transaction = current
+            self.entries = {}
+            self.count = 0
+        entry = self.entries.get(id(linkset))
+        if entry is None or entry[0] is not linkset:
+            entry = self.entries[id(linkset)] = (linkset, {})
+        results = entry[1]
+        if key in results:
+            relationship_cache_counters.hits += 1
+            return results[key]
+        relationship_cache_counters.misses += 1
+        result = compute()
+        if self.count >= self.size:
+            self.invalidate()
+            entry = self.entries[id(linkset)] = (linkset, {})
+            results = entry[1]
+        results[key] = result
+        self.count += 1
+        return result
+
+    def invalidate(self, linkset=None):
+        """Drop cached results of a link set, or of all link sets."""
+        if not self.entries:
+            return
+        if linkset is None:
+            self.entries.clear()
+            self.count = 0
+        else:
+            entry = self.entries.pop(id(removeSecurityProxy(linkset)), None)
+            if entry is not None:
+                self.count -= len(entry[1])
+        relationship_cache_counters.invalidations += 1
+
+
+relationship_cache = RelationshipCache()
+
+
+class PreindexedLinks(threading.local):
+    """Links a RelationshipBatch indexed before sending their after-event."""
+
+    ids = frozenset()
+
+
+_preindexed_links = PreindexedLinks()
+
+
+def indexRelationshipLinks(links):
+    """Index new relationship links in the link catalog.
+
+    Links already indexed by a RelationshipBatch are skipped.
+    """
+    links = [removeSecurityProxy(link) for link in links]
+    links = [link for link in links if id(link) not in _preindexed_links.ids]
+    if not links:
+        return
+    int_ids = getUtility(IIntIds)
+    catalog = getLinkCatalog()
+    indexed = []
+    for link in links:
+        lid = int_ids.queryId(link)
+        if lid is None:
+            addIntIdSubscriber(link, ObjectAddedEvent(link))
+            lid = int_ids.getId(link)
+            catalog.index_doc(lid, link)
+        indexed.append((lid, link))
+    indexed.sort(key=lambda (lid, link): lid)
+    lids_by_linkset = {}
+    shared_index = catalog['shared']
+    temporal_index = catalog['temporal']
+    for lid, link in indexed:
+        # Links were indexed when added to their link sets, only the
+        # shared state may have changed since.
+        shared_index.index_doc(lid, link)
+        temporal_index.index_doc(lid, link)
+        lids_by_linkset.setdefault(link.__parent__, []).append(lid)
+    for linkset, lids in lids_by_linkset.items():
+        linkset._lids.update(lids)
+        relationship_cache.invalidate(linkset)
+
+
+class RelationshipBatch(object):
+    """A batch of relationship changes applied in one pass.
+
+    Relationships to establish or break are collected with `relate` and
+    `unrelate` and applied together by `apply`, or on a clean exit when the
+    batch is used as a context manager.  Changes are checked in order, so a
+    relationship broken earlier in the batch may be established again.  All
+    before-events are sent before any links are touched, so a vetoed change
+    leaves the whole batch unapplied, and a change that fails while links
+    are being updated rolls the whole batch back.  Links of each change are
+    indexed before its after-event is sent.
+    """
+
+    def __init__(self):
+        self.changes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.apply()
+        else:
+            self.changes = []
+
+    def relate(self, rel_type, (a, role_of_a), (b, role_of_b),
+               extra_info=None):
+        """Establish a relationship when the batch is applied."""
+        self.changes.append(
+            (relate, rel_type, (a, role_of_a), (b, role_of_b), extra_info))
+
+    def unrelate(self, rel_type, (a, role_of_a), (b, role_of_b)):
+        """Break a relationship when the batch is applied."""
+        self.changes.append(
+            (unrelate, rel_type, (a, role_of_a), (b, role_of_b), None))
+
+    def plan(self, changes):
+        """Check the changes and return them with their shared state.
+
+        Each change is checked against the changes before it in the batch,
+        or against existing links if the batch does not touch the
+        relationship earlier.
+        """
+        planned = {}
+        pending = []
+        for change, rel_type, (a, role_of_a), (b, role_of_b), info in changes:
+            key = (hash(rel_type), ) + tuple(sorted(
+                [(id(a), hash(role_of_a)), (id(b), hash(role_of_b))]))
+            earlier = planned.get(key)
+            link = None
+            if change is relate:
+                if earlier is None:
+                    checkNotRelated(rel_type, a, (b, role_of_b))
+                elif earlier[0] is relate:
+                    raise DuplicateRelationship
+                shared = OOBTree()
+                shared['X'] = info
+            else:
+                if earlier is None:
+                    try:
+                        link = IRelationshipLinks(a).find(
+                            role_of_a, b, role_of_b, rel_type)
+                    except ValueError:
+                        raise NoSuchRelationship
+                    shared = link.shared
+                elif earlier[0] is unrelate:
+                    raise NoSuchRelationship
+                else:
+                    shared = earlier[1]
+            planned[key] = (change, shared)
+            pending.append(
+                (change, rel_type, (a, role_of_a), (b, role_of_b),
+                 shared, link))
+        return pending
+
+    def apply(self):
+        changes, self.changes = self.changes, []
+        pending = self.plan(changes)
+        for change, rel_type, a, b, shared, link in pending:
+            if change is relate:
+                before = BeforeRelationshipEvent
+            else:
+                before = BeforeRemovingRelationshipEvent
+            zope.event.notify(before(rel_type, a, b, shared))
+
+        savepoint = transaction.savepoint(optimistic=True)
+        try:
+            for change, rel_type, a, b, shared, link in pending:
+                if change is relate:
+                    links = addLinks(rel_type, a, b, shared)
+                    indexRelationshipLinks(links)
+                    self.notifyIndexed(
+                        links, RelationshipAddedEvent(rel_type, a, b, shared))
+                else:
+                    if link is None:
+                        # Established earlier in this batch.
+                        (obj_a, role_of_a), (obj_b, role_of_b) = a, b
+                        link = IRelationshipLinks(obj_a).find(
+                            role_of_a, obj_b, role_of_b, rel_type)
+                    removeLinks(rel_type, a, b, link)
+                    zope.event.notify(
+                        RelationshipRemovedEvent(rel_type, a, b, shared))
+        except Exception:
+            exc_info = sys.exc_info()
+            savepoint.rollback()
+            relationship_cache.invalidate()
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+    def notifyIndexed(self, links, event):
+        outer_ids = _preindexed_links.ids
+        _preindexed_links.ids = outer_ids.union([id(link) for link in links])
+        try:
+            zope.event.notify(event)
+        finally:
+            _preindexed_links.ids = outer_ids
+
+
 class RelationshipEvent(object):
     """Base class for relationship events.
 
@@ -580,38 +899,27 @@ class BoundRelationshipProperty(object):
         self.my_role = my_role
         self.other_role = other_role
 
-    def __nonzero__(self):
-        linkset = IRelationshipLinks(self.this)
-        iterator = iter(linkset.iterLinksByRole(self.other_role, self.rel_type))
-        try:
-            iterator.next()
-        except StopIteration:
-            return False
-        else:
-            return True
+    def _cache_key(self):
+        return (hash(self.rel_type), hash(self.my_role),
+                hash(self.other_role))
 
-    def __len__(self):
-        count = 0
-        linkset = IRelationshipLinks(self.this)
-        for i in linkset.iterLinksByRole(self.other_role, self.rel_type):
-            count += 1
-        return count
+    def _cached(self, name, compute):
+        return relationship_cache.lookup(
+            IRelationshipLinks(self.this), (name, ) + self._cache_key(),
+            compute)
 
-    def __iter__(self):
-        return iter(iterRelatedObjects(self.this, self.other_role,
+    def _targets(self):
+        return list(iterRelatedObjects(self.this, self.other_role,
                                        self.rel_type))
 
-    @property
-    def int_ids(self):
+    def _int_ids(self):
         int_ids = getUtility(IIntIds)
         linkset = IRelationshipLinks(self.this)
-        for link in linkset.iterLinksByRole(self.other_role, self.rel_type):
-            yield int_ids.getId(LinkTargetKeyReference(link))
+        return [int_ids.getId(LinkTargetKeyReference(link))
+                for link in linkset.iterLinksByRole(self.other_role,
+                                                    self.rel_type)]
 
-    def __contains__(self, other):
-        if other is None:
-            return False
-        other = removeSecurityProxy(other)
+    def _contains(self, other):
         linkset = IRelationshipLinks(self.this)
         filter = self.rel_type.filter
         for link in linkset.getCachedLinksByTarget(other):
@@ -621,6 +929,29 @@ class BoundRelationshipProperty(object):
                 return True
         return False
 
+    def __nonzero__(self):
+        return bool(self._cached('targets', self._targets))
+
+    def __len__(self):
+        return len(self._cached('targets', self._targets))
+
+    def __iter__(self):
+        return iter(self._cached('targets', self._targets))
+
+    @property
+    def int_ids(self):
+        return iter(self._cached('int_ids', self._int_ids))
+
+    def __contains__(self, other):
+        if other is None:
+            return False
+        other = removeSecurityProxy(other)
+        # The object is cached along with the result so that its id is not
+        # reused by another object during the transaction.
+        cached, result = self._cached(
+            ('contains', id(other)), lambda: (other, self._contains(other)))
+        return result
+
     @property
     def relationships(self):
         links = IRelationshipLinks(self.this).iterLinksByRole(
@@ -918,6 +1249,11 @@ class LinkSet(Persistent, Contained):
         >>> link2.__name__
         '2'
 
+    Names are never reused, new links get names past the last one given out:
+
+        >>> linkset._last_name
+        2
+
     We can access our links through their names:
 
         >>> linkset['1'] is link1
@@ -1000,6 +1336,7 @@ class LinkSet(Persistent, Contained):
     implements(IRelationshipLinks)
 
     _lids = None
+    _last_name = 0
 
     def __init__(self):
         self._lids = IFBTree.TreeSet()
@@ -1026,13 +1363,15 @@ class LinkSet(Persistent, Contained):
         if link.__parent__ == self:
             raise ValueError("You are adding same link twice.")
 
-        i = 1
+        i = self._last_name + 1
         while "%s" % i in self._links:
             i += 1
+        self._last_name = i
         link.__name__ = "%s" % i
         self._links[link.__name__] = link
         link.__parent__ = self
         notify(ObjectAddedEvent(link, self._links, link.__name__))
+        relationship_cache.invalidate(self)
 
     def remove(self, link):
         if link is self._links.get(link.__name__):
@@ -1040,6 +1379,7 @@ class LinkSet(Persistent, Contained):
             self._lids.remove(getUtility(IIntIds).getId(link))
             del self._links[link.__name__]
             notify(ObjectRemovedEvent(link, self._links, link_name))
+            relationship_cache.invalidate(self)
         else:
             raise ValueError("This link does not belong to this container!")
 
@@ -1049,19 +1389,20 @@ class LinkSet(Persistent, Contained):
         self._lids.clear()
         for name, link in deleted:
             notify(ObjectRemovedEvent(link, self._links, name))
+        relationship_cache.invalidate(self)
 
     def __iter__(self):
         return iter(self._links.values())
 
     def find(self, my_role, target, role, rel_type):
-        for link in self._links.values():
-            if (link.role_hash == hash(role) and
-                link.target is target and
-                link.rel_type_hash == hash(rel_type) and
-                link.my_role_hash == hash(my_role)):
-                return link
-        else:
+        try:
+            lids = self.query(my_role=my_role, target=target, role=role,
+                              rel_type=rel_type)
+        except zope.keyreference.interfaces.NotYet:
+            lids = None
+        if not lids:
             raise ValueError(my_role, target, role, rel_type)
+        return getUtility(IIntIds).getObject(lids.minKey())
 
     def __getitem__(self, id):
         return self._links[id]
@@ -1093,6 +1434,14 @@ class LinkSet(Persistent, Contained):
                 result = IFBTree.intersection(result, ids)
             if not result:
                 return result
+        if role is not None and rel_type is not None:
+            ids = catalog['role_rel_type_hash'].values_to_documents.get(
+                (hash(role), hash(rel_type), this_hash), empty)
+            if result is None:
+                result = ids
+            else:
+                result = IFBTree.intersection(result, ids)
+            return result
         if role is not None:
             ids = catalog['role_hash'].values_to_documents.get(
                 (hash(role), this_hash), empty)
@@ -18,6 +18,7 @@
 
 import datetime
 
+from BTrees import IFBTree
 from persistent import Persistent
 from zope.component import queryUtility
 from zope.container.contained import Contained
@@ -28,6 +29,7 @@ from zope.interface import Interface
 from schooltool.term.interfaces import IDateManager
 from schooltool.relationship.interfaces import IRelationshipLinks
 from schooltool.relationship.relationship import BoundRelationshipProperty
+from schooltool.relationship.relationship import CLink
 from schooltool.relationship.relationship import relate, unrelate
 from schooltool.relationship.relationship import RelationshipInfo
 from schooltool.relationship.uri import URIObject
@@ -190,6 +192,66 @@ class BoundTemporalRelationshipProperty(BoundRelationshipProperty):
             date=self.filter_date, states=self.filter_codes,
             meanings=self.filter_meanings)
 
+    def _matches_latest_meaning(self, meaning):
+        for char in meaning:
+            for val in self.filter_meanings:
+                if val in char:
+                    return True
+        return False
+
+    def _matches_meaning(self, meaning):
+        for val in self.filter_meanings:
+            if val in meaning:
+                return True
+        return False
+
+    def _matches_state(self, state):
+        if state is None:
+            return False
+        meaning, code = state
+        if self.filter_codes and code not in self.filter_codes:
+            return False
+        if not self.filter_meanings:
+            return True
+        return self._matches_meaning(meaning)
+
+    def _select_nothing(self, catalog, lids):
+        return lids
+
+    def _select_latest_meanings(self, catalog, lids):
+        index = catalog['temporal']
+        matching = [docids for meaning, docids in index.latest.items()
+                    if self._matches_latest_meaning(meaning)]
+        selected = [IFBTree.intersection(lids, IFBTree.multiunion(matching))]
+        # Links without states are active.
+        if self._matches_latest_meaning(ACTIVE):
+            selected.append(IFBTree.difference(lids, index.stateful))
+        return IFBTree.multiunion(selected)
+
+    def _select_everything(self, catalog, lids):
+        index = catalog['temporal']
+        selected = []
+        # Links without states are active with the active code, but
+        # only match when the active meaning is asked for explicitly.
+        if (ACTIVE in self.filter_meanings and
+            (not self.filter_codes or ACTIVE_CODE in self.filter_codes)):
+            selected.append(IFBTree.difference(lids, index.stateful))
+        candidates = IFBTree.intersection(lids, index.stateful)
+        if self.filter_codes:
+            coded = [index.codes[code] for code in self.filter_codes
+                     if code in index.codes]
+            candidates = IFBTree.intersection(
+                candidates, IFBTree.multiunion(coded))
+        if self.filter_meanings:
+            meant = [docids for meaning, docids in index.meanings.items()
+                     if self._matches_meaning(meaning)]
+            candidates = IFBTree.intersection(
+                candidates, IFBTree.multiunion(meant))
+        selected.append(IFBTree.IFSet([
+            lid for lid in candidates
+            if self._matches_state(index.get(lid, self.filter_date))]))
+        return IFBTree.multiunion(selected)
+
     def init_filter(self):
         on_date = self.filter_date
         any_code = self.filter_codes
@@ -197,49 +259,42 @@ class BoundTemporalRelationshipProperty(BoundRelationshipProperty):
         if not any_code and on_date is None:
             if not is_active:
                 self._filter = self._filter_nothing
+                self._select = self._select_nothing
             else:
                 self._filter = self._filter_latest_meanings
+                self._select = self._select_latest_meanings
         else:
             self._filter = self._filter_everything
+            self._select = self._select_everything
 
     def filter(self, links):
         for link in links:
             if (link.rel_type_hash == hash(self.rel_type) and self._filter(link)):
                 yield link
 
-    def __contains__(self, other):
-        if other is None:
-            return False
+    def _cache_key(self):
+        return BoundRelationshipProperty._cache_key(self) + (
+            self.filter_date, tuple(sorted(self.filter_codes)),
+            tuple(self.filter_meanings))
+
+    def _contains(self, other):
         linkset = IRelationshipLinks(self.this)
-        for link in linkset.getCachedLinksByTarget(other):
-            if (link.rel_type_hash == hash(self.rel_type) and
-                link.my_role_hash == hash(self.my_role) and
-                link.role_hash == hash(self.other_role) and
-                self._filter(link)):
-                return True
-        return False
+        catalog = linkset.catalog
+        lids = linkset.query(my_role=self.my_role, target=other,
+                             role=self.other_role, rel_type=self.rel_type,
+                             catalog=catalog)
+        return bool(lids) and bool(self._select(catalog, lids))
 
     def _iter_filtered_links(self):
-        links = IRelationshipLinks(self.this).getCachedLinksByRole(self.other_role)
-        for link in links:
-            if self._filter(link):
-                yield link
-
-    def __nonzero__(self):
-        for link in self._iter_filtered_links():
-            return True
-        return False
-
-    def __len__(self):
-        n = 0
-        for link in self._iter_filtered_links():
-            n += 1
-        return n
-
-    def __iter__(self):
-        for link in self._iter_filtered_links():
-            if self._filter(link):
-                yield link.target
+        linkset = IRelationshipLinks(self.this)
+        catalog = linkset.catalog
+        lids = linkset.query(role=self.other_role, rel_type=self.rel_type,
+                             catalog=catalog)
+        for lid in self._select(catalog, lids):
+            yield CLink(catalog, lid)
+
+    def _targets(self):
+        return [link.target for link in self._iter_filtered_links()]
 
     @property
     def relationships(self):
@@ -103,6 +103,97 @@ def doctest_LinkSet_getTargetsByRole():
     """
 
 
+def doctest_LinkSet_add():
+    """Tests for LinkSet.add
+
+        >>> from schooltool.relationship import relate, unrelate
+        >>> from schooltool.relationship.interfaces import IRelationshipLinks
+        >>> from schooltool.relationship.tests import SomeContainedPersistent
+        >>> from schooltool.relationship.uri import URIObject as URIStub
+        >>> rel_type = URIStub('example:Friendship')
+        >>> friend = URIStub('example:Friend')
+        >>> a = persons['a'] = SomeContainedPersistent('a')
+        >>> b = persons['b'] = SomeContainedPersistent('b')
+        >>> c = persons['c'] = SomeContainedPersistent('c')
+        >>> d = persons['d'] = SomeContainedPersistent('d')
+
+    Links get named in the order they are added.
+
+        >>> relate(rel_type, (a, friend), (b, friend))
+        >>> relate(rel_type, (a, friend), (c, friend))
+        >>> linkset = IRelationshipLinks(a)
+        >>> sorted([(link.__name__, link.target) for link in linkset])
+        [('1', b), ('2', c)]
+
+    Names of removed links are not reused.
+
+        >>> unrelate(rel_type, (a, friend), (b, friend))
+        >>> relate(rel_type, (a, friend), (d, friend))
+        >>> sorted([(link.__name__, link.target) for link in linkset])
+        [('2', c), ('3', d)]
+
+    Link sets created before the last given name was tracked skip names
+    that are already taken.
+
+        >>> linkset._last_name = 0
+        >>> relate(rel_type, (a, friend), (b, friend))
+        >>> sorted([(link.__name__, link.target) for link in linkset])
+        [('1', b), ('2', c), ('3', d)]
+        >>> e = persons['e'] = SomeContainedPersistent('e')
+        >>> relate(rel_type, (a, friend), (e, friend))
+        >>> sorted([(link.__name__, link.target) for link in linkset])
+        [('1', b), ('2', c), ('3', d), ('4', e)]
+
+    """
+
+
+def doctest_LinkSet_find():
+    """Tests for LinkSet.find
+
+        >>> from schooltool.relationship import relate
+        >>> from schooltool.relationship.interfaces import IRelationshipLinks
+        >>> from schooltool.relationship.tests import SomeContainedPersistent
+        >>> from schooltool.relationship.uri import URIObject as URIStub
+        >>> friendship = URIStub('example:Friendship')
+        >>> rivalry = URIStub('example:Rivalry')
+        >>> friend = URIStub('example:Friend')
+        >>> rival = URIStub('example:Rival')
+        >>> a = persons['a'] = SomeContainedPersistent('a')
+        >>> b = persons['b'] = SomeContainedPersistent('b')
+        >>> c = persons['c'] = SomeContainedPersistent('c')
+
+        >>> relate(friendship, (a, friend), (b, friend))
+        >>> relate(rivalry, (a, rival), (b, rival))
+        >>> relate(friendship, (a, friend), (c, friend))
+
+    Links are looked up in the link catalog.
+
+        >>> linkset = IRelationshipLinks(a)
+        >>> link = linkset.find(friend, b, friend, friendship)
+        >>> link.target, link.rel_type
+        (b, <URIObject example:Friendship>)
+        >>> link.__parent__ is linkset
+        True
+
+        >>> link = linkset.find(rival, b, rival, rivalry)
+        >>> link.target, link.rel_type
+        (b, <URIObject example:Rivalry>)
+
+    If there is no such link, ValueError is raised.
+
+        >>> linkset.find(rival, c, rival, rivalry)
+        Traceback (most recent call last):
+          ...
+        ValueError: ...
+
+        >>> linkset.find(friend, SomeContainedPersistent('d'), friend, friendship)
+        Traceback (most recent call last):
+          ...
+        ValueError: ...
+
+    """
+
+
 def doctest_RelationshipSchema():
     """Tests for RelationshipSchema
 
@@ -259,6 +350,286 @@ def doctest_unrelateAll():
     """
 
 
+def doctest_RelationshipBatch():
+    """Tests for RelationshipBatch.
+
+    Relationships to establish or break are collected and applied together.
+
+        >>> from schooltool.relationship.relationship import RelationshipBatch
+        >>> from schooltool.relationship import getRelatedObjects
+        >>> from schooltool.relationship.tests import SomeContainedPersistent
+        >>> from schooltool.relationship.uri import URIObject as URIStub
+        >>> URIMembership = URIStub('example:Membership')
+        >>> URIMember = URIStub('example:Member')
+        >>> URIGroup = URIStub('example:Group')
+        >>> group = persons['group'] = SomeContainedPersistent('group')
+        >>> a = persons['a'] = SomeContainedPersistent('a')
+        >>> b = persons['b'] = SomeContainedPersistent('b')
+
+        >>> batch = RelationshipBatch()
+        >>> batch.relate(URIMembership, (a, URIMember), (group, URIGroup))
+        >>> batch.relate(URIMembership, (b, URIMember), (group, URIGroup))
+        >>> getRelatedObjects(group, URIMember)
+        []
+
+        >>> batch.apply()
+        >>> sorted(getRelatedObjects(group, URIMember), key=repr)
+        [a, b]
+        >>> getRelatedObjects(a, URIGroup)
+        [group]
+
+    New links are indexed in the link catalog.
+
+        >>> from schooltool.relationship.interfaces import IRelationshipLinks
+        >>> linkset = IRelationshipLinks(group)
+        >>> sorted(linkset._lids) == sorted(linkset.query(role=URIMember))
+        True
+        >>> len(linkset._lids)
+        2
+
+    All before-events are sent before any links are touched, so a vetoed
+    change leaves the whole batch unapplied.
+
+        >>> c = persons['c'] = SomeContainedPersistent('c')
+        >>> batch.relate(URIMembership, (c, URIMember), (group, URIGroup))
+        >>> batch.relate(URIMembership, (a, URIMember), (group, URIGroup))
+        >>> batch.apply()
+        Traceback (most recent call last):
+          ...
+        DuplicateRelationship
+        >>> sorted(getRelatedObjects(group, URIMember), key=repr)
+        [a, b]
+
+    The same relationship cannot be established twice in one batch either.
+
+        >>> batch.relate(URIMembership, (c, URIMember), (group, URIGroup))
+        >>> batch.relate(URIMembership, (group, URIGroup), (c, URIMember))
+        >>> batch.apply()
+        Traceback (most recent call last):
+          ...
+        DuplicateRelationship
+
+    Batches can be used as context managers, they are applied on a clean
+    exit.
+
+        >>> with RelationshipBatch() as batch:
+        ...     batch.unrelate(URIMembership, (a, URIMember), (group, URIGroup))
+        ...     batch.relate(URIMembership, (c, URIMember), (group, URIGroup))
+        >>> sorted(getRelatedObjects(group, URIMember), key=repr)
+        [b, c]
+        >>> getRelatedObjects(a, URIGroup)
+        []
+
+        >>> with RelationshipBatch() as batch:
+        ...     batch.unrelate(URIMembership, (b, URIMember), (group, URIGroup))
+        ...     raise ValueError('oops')
+        Traceback (most recent call last):
+          ...
+        ValueError: oops
+        >>> sorted(getRelatedObjects(group, URIMember), key=repr)
+        [b, c]
+
+    Changes are checked in order, so a relationship can be broken and
+    established again in one batch.
+
+        >>> with RelationshipBatch() as batch:
+        ...     batch.unrelate(URIMembership, (b, URIMember), (group, URIGroup))
+        ...     batch.relate(URIMembership, (group, URIGroup), (b, URIMember),
+        ...                  'again')
+        >>> sorted(getRelatedObjects(group, URIMember), key=repr)
+        [b, c]
+        >>> linkset.find(URIGroup, b, URIMember, URIMembership).shared['X']
+        'again'
+        >>> sorted(linkset._lids) == sorted(linkset.query(role=URIMember))
+        True
+        >>> len(linkset._lids)
+        2
+
+    A relationship established in the batch can be broken later in it too.
+
+        >>> with RelationshipBatch() as batch:
+        ...     batch.relate(URIMembership, (a, URIMember), (group, URIGroup))
+        ...     batch.unrelate(URIMembership, (group, URIGroup), (a, URIMember))
+        >>> sorted(getRelatedObjects(group, URIMember), key=repr)
+        [b, c]
+        >>> getRelatedObjects(a, URIGroup)
+        []
+
+    But a relationship cannot be broken twice.
+
+        >>> batch.unrelate(URIMembership, (b, URIMember), (group, URIGroup))
+        >>> batch.unrelate(URIMembership, (b, URIMember), (group, URIGroup))
+        >>> batch.apply()
+        Traceback (most recent call last):
+          ...
+        NoSuchRelationship
+        >>> sorted(getRelatedObjects(group, URIMember), key=repr)
+        [b, c]
+
+    Links of a change are indexed before its after-event is sent, so
+    subscribers see the relationships established so far.
+
+        >>> import zope.event
+        >>> from schooltool.relationship.interfaces import \\
+        ...     IRelationshipAddedEvent
+        >>> def showMembers(event):
+        ...     if IRelationshipAddedEvent.providedBy(event):
+        ...         print event[URIMember], sorted(
+        ...             linkset.query(role=URIMember)) == sorted(linkset._lids),
+        ...         print sorted(getRelatedObjects(group, URIMember), key=repr)
+        >>> zope.event.subscribers.append(showMembers)
+
+        >>> d = persons['d'] = SomeContainedPersistent('d')
+        >>> with RelationshipBatch() as batch:
+        ...     batch.relate(URIMembership, (a, URIMember), (group, URIGroup))
+        ...     batch.relate(URIMembership, (d, URIMember), (group, URIGroup))
+        a True [a, b, c]
+        d True [a, b, c, d]
+
+        >>> zope.event.subscribers.remove(showMembers)
+
+    If a change fails while links are updated, the whole batch is rolled
+    back.
+
+        >>> def failOnD(event):
+        ...     if IRelationshipAddedEvent.providedBy(event):
+        ...         if event[URIMember] is d:
+        ...             raise ValueError('no d')
+        >>> zope.event.subscribers.append(failOnD)
+
+        >>> with RelationshipBatch() as batch:
+        ...     batch.unrelate(URIMembership, (a, URIMember), (group, URIGroup))
+        ...     batch.unrelate(URIMembership, (d, URIMember), (group, URIGroup))
+        ...     batch.relate(URIMembership, (d, URIMember), (group, URIGroup))
+        Traceback (most recent call last):
+          ...
+        ValueError: no d
+        >>> zope.event.subscribers.remove(failOnD)
+
+        >>> sorted(getRelatedObjects(group, URIMember), key=repr)
+        [a, b, c, d]
+        >>> getRelatedObjects(a, URIGroup)
+        [group]
+        >>> sorted(linkset._lids) == sorted(linkset.query(role=URIMember))
+        True
+        >>> len(linkset._lids)
+        4
+
+    """
+
+
+def doctest_LinkCatalog_role_rel_type_hash():
+    """Tests for the role_rel_type_hash index of the link catalog.
+
+        >>> from zope.component import getUtility
+        >>> from zope.intid.interfaces import IIntIds
+        >>> from zope.keyreference.interfaces import IKeyReference
+        >>> from schooltool.relationship.catalog import getLinkCatalog
+        >>> from schooltool.relationship.catalog import hash_this_role_rel_type
+        >>> from schooltool.relationship.interfaces import IRelationshipLinks
+        >>> from schooltool.relationship.relationship import relate, unrelate
+        >>> from schooltool.relationship.tests import SomeContainedPersistent
+        >>> from schooltool.relationship.uri import URIObject as URIStub
+
+        >>> URIMembership = URIStub('example:Membership')
+        >>> URIFriendship = URIStub('example:Friendship')
+        >>> URIMember = URIStub('example:Member')
+        >>> URIGroup = URIStub('example:Group')
+        >>> URIFriend = URIStub('example:Friend')
+        >>> group = persons['group'] = SomeContainedPersistent('group')
+        >>> a = persons['a'] = SomeContainedPersistent('a')
+        >>> b = persons['b'] = SomeContainedPersistent('b')
+
+    Links with the same role in different relationship types, and with
+    different roles in the same relationship type.
+
+        >>> relate(URIMembership, (a, URIMember), (group, URIGroup))
+        >>> relate(URIMembership, (b, URIMember), (group, URIGroup))
+        >>> relate(URIFriendship, (b, URIMember), (group, URIFriend))
+        >>> relate(URIFriendship, (a, URIFriend), (group, URIFriend))
+        >>> relate(URIFriendship, (a, URIGroup), (b, URIMember))
+
+    Links are indexed by their role, relationship type and the object
+    they belong to.
+
+        >>> int_ids = getUtility(IIntIds)
+        >>> catalog = getLinkCatalog()
+        >>> index = catalog['role_rel_type_hash']
+        >>> linkset = IRelationshipLinks(group)
+        >>> link = linkset.find(URIGroup, a, URIMember, URIMembership)
+        >>> lid = int_ids.getId(link)
+        >>> index.documents_to_values[lid] == (
+        ...     hash(URIMember), hash(URIMembership),
+        ...     hash(IKeyReference(group)))
+        True
+        >>> hash_this_role_rel_type(link) == index.documents_to_values[lid]
+        True
+
+        >>> def members(rel_type):
+        ...     lids = index.values_to_documents.get(
+        ...         (hash(URIMember), hash(rel_type),
+        ...          hash(IKeyReference(group))), ())
+        ...     return sorted([repr(int_ids.getObject(lid).target)
+        ...                    for lid in lids])
+        >>> members(URIMembership)
+        ['a', 'b']
+        >>> members(URIFriendship)
+        ['b']
+
+    Broken relationships are unindexed.
+
+        >>> unrelate(URIMembership, (a, URIMember), (group, URIGroup))
+        >>> lid in index.documents_to_values
+        False
+        >>> members(URIMembership)
+        ['b']
+
+    LinkSet.query uses the index when both role and rel_type are given.
+    Results are the same as intersecting the separate indexes.
+
+        >>> def oldQuery(linkset, my_role=None, target=None, role=None,
+        ...              rel_type=None):
+        ...     this_hash = hash(IKeyReference(linkset.__parent__))
+        ...     results = [
+        ...         catalog['role_hash'].values_to_documents.get(
+        ...             (hash(role), this_hash), ()),
+        ...         catalog['rel_type_hash'].values_to_documents.get(
+        ...             (hash(rel_type), this_hash), ())]
+        ...     if my_role is not None:
+        ...         results.append(catalog['my_role_hash'].values_to_documents.get(
+        ...             (hash(my_role), this_hash), ()))
+        ...     if target is not None:
+        ...         results.append(catalog['target'].values_to_documents.get(
+        ...             (IKeyReference(target), this_hash), ()))
+        ...     lids = set(results[0])
+        ...     for result in results[1:]:
+        ...         lids &= set(result)
+        ...     return sorted(lids)
+
+        >>> queries = []
+        >>> for obj in [group, a, b]:
+        ...     for role in [URIMember, URIGroup, URIFriend]:
+        ...         for rel_type in [URIMembership, URIFriendship]:
+        ...             for my_role in [None, URIMember, URIGroup, URIFriend]:
+        ...                 for target in [None, group, a, b]:
+        ...                     queries.append((IRelationshipLinks(obj),
+        ...                         dict(my_role=my_role, target=target,
+        ...                              role=role, rel_type=rel_type)))
+        >>> mismatches = [
+        ...     (linkset.__parent__, kw) for linkset, kw in queries
+        ...     if sorted(linkset.query(**kw)) != oldQuery(linkset, **kw)]
+        >>> mismatches
+        []
+
+    The queries do find links.
+
+        >>> len([linkset for linkset, kw in queries
+        ...      if linkset.query(**kw)])
+        32
+
+    """
+
+
 def doctest_BoundRelationshipProperty():
     """Tests for BoundRelationshipProperty.
 
@@ -383,6 +754,232 @@ def doctest_BoundRelationshipProperty():
     """
 
 
+def doctest_BoundRelationshipProperty_cache():
+    """Tests for caching of BoundRelationshipProperty results.
+
+        >>> from schooltool.relationship.uri import URIObject
+        >>> from schooltool.relationship.temporal import TemporalURIObject
+        >>> role_member = URIObject('example:Member')
+        >>> role_group = URIObject('example:Group')
+        >>> uri_membership = TemporalURIObject('example:Membership')
+
+        >>> from schooltool.relationship.tests import SomeContainedPersistent
+        >>> group = groups['g'] = SomeContainedPersistent('Group')
+        >>> john = persons['john'] = SomeContainedPersistent('John')
+        >>> pete = persons['pete'] = SomeContainedPersistent('Pete')
+
+        >>> members = uri_membership.bind(
+        ...     group, role_group, uri_membership, role_member)
+        >>> members.add(john)
+
+    Results of relationship properties are cached for the duration of a
+    transaction.
+
+        >>> from schooltool.relationship.relationship import (
+        ...     relationship_cache_counters as counters)
+        >>> counters.reset()
+
+        >>> list(members), john in members, len(members)
+        ([John], True, 1)
+        >>> counters.hits, counters.misses
+        (2, 2)
+
+        >>> list(members), john in members, pete in members
+        ([John], True, False)
+        >>> counters.hits, counters.misses
+        (5, 3)
+
+    Properties with different filters are cached separately.
+
+        >>> import datetime
+        >>> list(members.on(datetime.date(2000, 1, 1)))
+        []
+        >>> counters.hits, counters.misses
+        (6, 4)
+
+    Changing relationships drops the results.
+
+        >>> members.add(pete)
+        >>> list(members), pete in members
+        ([John, Pete], True)
+        >>> members.remove(john)
+        >>> list(members), john in members
+        ([Pete], False)
+
+    So does changing the state of a link.
+
+        >>> members.on(datetime.date(2000, 1, 1)).add(pete)
+        >>> list(members.on(datetime.date(2000, 1, 1)))
+        [Pete]
+
+    The cache is dropped when a new transaction begins.
+
+        >>> counters.reset()
+        >>> list(members)
+        [Pete]
+        >>> import transaction
+        >>> transaction.commit()
+        >>> list(members)
+        [Pete]
+        >>> counters.hits, counters.misses
+        (2, 2)
+
+    Results cached after a savepoint are dropped when it is rolled back.
+
+        >>> savepoint = transaction.savepoint()
+        >>> members.add(john)
+        >>> list(members)
+        [John, Pete]
+        >>> savepoint.rollback()
+        >>> list(members)
+        [Pete]
+
+    So are results cached in an aborted transaction.
+
+        >>> members.add(john)
+        >>> list(members)
+        [John, Pete]
+        >>> transaction.abort()
+        >>> list(members)
+        [Pete]
+
+    The cache holds a limited number of results, it is dropped when full.
+
+        >>> from schooltool.relationship.relationship import relationship_cache
+        >>> relationship_cache.size = 2
+        >>> transaction.abort()
+        >>> counters.reset()
+        >>> list(members.on(datetime.date(2000, 1, 1)))
+        [Pete]
+        >>> list(members.on(datetime.date(2000, 1, 2)))
+        [Pete]
+        >>> list(members.on(datetime.date(2000, 1, 1)))
+        [Pete]
+        >>> counters.misses, relationship_cache.count
+        (2, 2)
+
+        >>> list(members.on(datetime.date(2000, 1, 3)))
+        [Pete]
+        >>> counters.misses, relationship_cache.count
+        (3, 1)
+        >>> list(members.on(datetime.date(2000, 1, 1)))
+        [Pete]
+        >>> counters.misses, relationship_cache.count
+        (4, 2)
+        >>> del relationship_cache.size
+
+    """
+
+
+def doctest_BoundTemporalRelationshipProperty():
+    """Tests for BoundTemporalRelationshipProperty.
+
+        >>> import datetime
+        >>> from schooltool.relationship.uri import URIObject
+        >>> from schooltool.relationship.temporal import TemporalURIObject
+        >>> from schooltool.relationship.temporal import ACTIVE, INACTIVE
+        >>> role_student = URIObject('example:Student')
+        >>> role_section = URIObject('example:Section')
+        >>> uri_enrollment = TemporalURIObject('example:Enrollment')
+
+        >>> from schooltool.relationship.tests import SomeContainedPersistent
+        >>> from schooltool.relationship.relationship import RelationshipProperty
+        >>> class Section(SomeContainedPersistent):
+        ...     students = RelationshipProperty(
+        ...         uri_enrollment, role_section, role_student)
+
+        >>> section = sections['s'] = Section('Section')
+        >>> john = persons['john'] = SomeContainedPersistent('John')
+        >>> pete = persons['pete'] = SomeContainedPersistent('Pete')
+        >>> anna = persons['anna'] = SomeContainedPersistent('Anna')
+        >>> mary = persons['mary'] = SomeContainedPersistent('Mary')
+
+    John and Pete are enrolled in September, Pete is withdrawn and Anna
+    enrolled with a custom code in October.  Mary is related without any
+    states, which means she is always active.
+
+        >>> sep, oct = datetime.date(2013, 9, 1), datetime.date(2013, 10, 1)
+        >>> section.students.on(sep).add(john)
+        >>> section.students.on(sep).add(pete)
+        >>> section.students.on(oct).remove(pete)
+        >>> section.students.on(oct).add(anna, code='c')
+
+        >>> from schooltool.relationship import relate
+        >>> relate(uri_enrollment, (section, role_section),
+        ...        (mary, role_student))
+
+    Filtering is answered by the temporal state index of the link catalog.
+
+        >>> def members(students):
+        ...     return sorted(students, key=repr)
+
+        >>> members(section.students.on(datetime.date(2013, 8, 1)))
+        [Mary]
+        >>> members(section.students.on(datetime.date(2013, 9, 15)))
+        [John, Mary, Pete]
+        >>> members(section.students.on(datetime.date(2013, 10, 15)))
+        [Anna, John, Mary]
+        >>> members(section.students)
+        [Anna, John, Mary]
+        >>> members(section.students.all())
+        [Anna, John, Mary, Pete]
+        >>> members(section.students.all().any(ACTIVE))
+        [Anna, John, Mary]
+        >>> members(section.students.all().any(INACTIVE))
+        [Pete]
+        >>> members(section.students.on(oct).coded('c'))
+        [Anna]
+        >>> members(section.students.on(oct).coded('a'))
+        [John, Mary]
+
+        >>> len(section.students.on(datetime.date(2013, 9, 15)))
+        3
+        >>> bool(section.students.on(datetime.date(2013, 8, 1)).coded('c'))
+        False
+        >>> pete in section.students.on(datetime.date(2013, 9, 15))
+        True
+        >>> pete in section.students
+        False
+
+    The results agree with filtering the links one by one.
+
+        >>> from schooltool.relationship.interfaces import IRelationshipLinks
+        >>> links = list(IRelationshipLinks(section))
+        >>> for students in [section.students.on(datetime.date(2013, 9, 15)),
+        ...                  section.students.on(oct).coded('c'),
+        ...                  section.students.all().any(ACTIVE),
+        ...                  section.students]:
+        ...     filtered = [link.target for link in students.filter(links)]
+        ...     print members(filtered) == members(students)
+        True
+        True
+        True
+        True
+
+    Changing the state of a link updates the index.
+
+        >>> section.students.on(oct).add(pete)
+        >>> members(section.students.on(datetime.date(2013, 10, 15)))
+        [Anna, John, Mary, Pete]
+        >>> members(section.students.all().any(INACTIVE))
+        []
+
+    The state of the same link can be changed several times in one
+    transaction, also through links read from the catalog.
+
+        >>> [link] = IRelationshipLinks(section).getCachedLinksByTarget(mary)
+        >>> link.state.set(sep, meaning=INACTIVE)
+        >>> link.state.set(oct)
+        >>> [(date.isoformat(), meaning) for date, meaning, code in link.state]
+        [('2013-09-01', 'i'), ('2013-10-01', 'a')]
+        >>> members(section.students.on(datetime.date(2013, 9, 15)))
+        [John, Pete]
+        >>> members(section.students.on(datetime.date(2013, 10, 15)))
+        [Anna, John, Mary, Pete]
+
+    """
+
+
 from schooltool.app.tests import setUp, tearDown
 
 
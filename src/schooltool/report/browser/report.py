@@ -28,7 +28,7 @@ import z3c.form
 import zope.contentprovider.interfaces
 import zope.event
 from zope.browserpage.viewpagetemplatefile import ViewPageTemplateFile
-from zope.component import adapts, queryMultiAdapter
+from zope.component import adapts, queryMultiAdapter, getUtility
 from zope.i18n import translate
 from zope.i18n.interfaces.locales import ICollator
 from zope.interface import Interface
@@ -41,21 +41,26 @@ from zope.traversing.browser.absoluteurl import AbsoluteURL
 from zope.traversing.browser.interfaces import IAbsoluteURL
 from zope.traversing.browser.absoluteurl import absoluteURL
 from zope.interface import implements
+from zope.intid.interfaces import IIntIds
 from zope.cachedescriptors.property import Lazy
 from zope.proxy import getProxiedObject
 from z3c.form import button
 
 import schooltool.traverser.traverser
 from schooltool.common import format_message
+from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.person.interfaces import IPerson
 from schooltool.report.interfaces import IReportLinksURL
 from schooltool.report.interfaces import IReportLinkViewlet
 from schooltool.report.interfaces import IReportFile
 from schooltool.report.interfaces import IArchivePage
+from schooltool.report.interfaces import IReportCache
+from schooltool.report.interfaces import IReportStreamRenderer
 from schooltool.report.report import IFlourishReportLinkViewletManager
 from schooltool.report.report import getReportRegistrationUtility
 from schooltool.report.report import ReportTask
 from schooltool.report.report import ArchiveReportTask
+from schooltool.report.report import GeneratedReportMessage
 from schooltool.skin import flourish
 from schooltool.skin.flourish.page import WideContainerPage
 from schooltool.skin.flourish.page import RefineLinksViewlet
@@ -287,6 +292,10 @@ class RequestRemoteReportDialog(RequestReportDownloadDialog):
     report_task = None
     replace_dialog = None
 
+    # Reuse reports generated from unchanged data?
+    cache_reports = False
+    cached_message = None
+
     fields = z3c.form.field.Fields(Interface)
     form_params = None
 
@@ -314,7 +323,9 @@ class RequestRemoteReportDialog(RequestReportDownloadDialog):
         task = self.task_factory(self.report_builder, self.target)
         self.schedule(task)
         self.report_task = task
-        message = query_message(task)
+        message = self.cached_message
+        if message is None:
+            message = query_message(task)
         if message is None:
             self.ajax_settings['dialog'] = 'close'
             return
@@ -344,8 +355,29 @@ class RequestRemoteReportDialog(RequestReportDownloadDialog):
 
     def schedule(self, task):
         self.updateTaskParams(task)
+        if self.cache_reports:
+            task.update(self.request)
+            cache = IReportCache(ISchoolToolApplication(None), None)
+            if cache is not None:
+                renderer = task.getRenderer(self.request)
+                task.cache_key = cache.makeKey(task, renderer)
+            if task.cache_key is not None:
+                report = cache.get(task.cache_key)
+                if report is not None:
+                    self.sendCachedReport(task, report)
+                    return
         task.schedule(self.request)
 
+    def sendCachedReport(self, task, report):
+        # Each message gets its own report file, as messages locate
+        # their reports.
+        message = GeneratedReportMessage(
+            requested_on=task.utcnow,
+            filename=report.__name__,
+            report=report.copy())
+        message.send(sender=task.creator, recipients=[task.creator])
+        self.cached_message = message
+
     def render(self, *args, **kw):
         if self.replace_dialog is not None:
             return self.replace_dialog.render(*args, **kw)
@@ -512,6 +544,8 @@ class ArchiveFileManager(flourish.viewlet.ViewletManagerBase):
     collecting_title = _('Collecting (${name})')
     overall_line_id = 'overall'
 
+    shard = None # (archiver name, item keys) to render only a part
+
     @property
     def title(self):
         return getattr(self.view, 'message_title', _("Archive"))
@@ -528,6 +562,20 @@ class ArchiveFileManager(flourish.viewlet.ViewletManagerBase):
                          title=self.title, progress=0.0)
             self.view.overall_line_id = self.overall_line_id
 
+    def filterViewlets(self, viewlets):
+        viewlets = super(ArchiveFileManager, self).filterViewlets(viewlets)
+        if self.shard is not None:
+            name, keys = self.shard
+            viewlets = [(n, v) for n, v in viewlets if n == name]
+        return viewlets
+
+    def listShards(self, shard_size):
+        shards = []
+        for viewlet in self.viewlets:
+            for keys in viewlet.listShards(shard_size):
+                shards.append((viewlet.__name__, keys))
+        return shards
+
     def update(self):
         self.task_progress.add('collecting',
             title=u'', progress=0.0)
@@ -543,6 +591,8 @@ class ArchiveFileManager(flourish.viewlet.ViewletManagerBase):
                 active=True)
             zope.event.notify(event(viewlet, self.request))
             viewlet.update()
+            if self.shard is not None:
+                viewlet.restrictToShard(self.shard[1])
         title = format_message(self.collecting_title,
                                {'name': _('files')})
         self.task_progress.force('collecting', title=title, progress=None, active=False)
@@ -572,6 +622,10 @@ class FileArchiver(flourish.viewlet.Viewlet):
 
     title = None
 
+    # Archivers that can be split into shards set this to the list
+    # of archived objects in update and archive only these in render.
+    items = None
+
     def addArchivers(self):
         progress = self.view.task_progress
         title = self.title or _('Reports')
@@ -599,6 +653,25 @@ class FileArchiver(flourish.viewlet.Viewlet):
         flourish.viewlet.Viewlet.update(self)
         self.addArchivers()
 
+    def listShards(self, shard_size):
+        """Split archived items into shards of up to shard_size items.
+
+        Returns a list of item key tuples, or [None] if the archiver
+        cannot be split.
+        """
+        if self.items is None:
+            return [None]
+        int_ids = getUtility(IIntIds)
+        keys = [int_ids.getId(item) for item in self.items]
+        return [tuple(keys[n:n+shard_size])
+                for n in range(0, len(keys), shard_size)]
+
+    def restrictToShard(self, keys):
+        if keys is None:
+            return
+        int_ids = getUtility(IIntIds)
+        self.items = [int_ids.getObject(key) for key in keys]
+
     def render(self, archive):
         self.finish()
 
@@ -608,11 +681,49 @@ class FileArchiver(flourish.viewlet.Viewlet):
         return renderer
 
 
+class ReportFileArchiver(FileArchiver):
+    """Archives a report view of each of the listed items."""
+
+    view_name = None
+
+    def listItems(self):
+        return []
+
+    def update(self):
+        super(ReportFileArchiver, self).update()
+        self.items = list(self.listItems())
+
+    def renderItem(self, item, stream):
+        renderer = self.queryView(item, self.request, self.view_name)
+        if renderer is None:
+            return None
+        if IReportStreamRenderer.providedBy(renderer):
+            if not renderer.renderToStream(stream):
+                return None
+        else:
+            stream.write(renderer())
+        return getattr(renderer, 'filename', None) or item.__name__
+
+    def render(self, archive):
+        total = len(self.items)
+        for n, item in enumerate(self.items):
+            stream = StringIO()
+            filename = self.renderItem(item, stream)
+            if filename is not None:
+                archive.writestr(filename, stream.getvalue())
+            self.progress(filename or u"", n+1, total)
+        self.finish()
+
+
 class ReportArchivePage(ProgressReportPage):
     implements(IArchivePage)
 
     compression = zipfile.ZIP_STORED
 
+    # Set to split the archive into shards of this many items
+    # rendered in parallel by ArchiveReportTask.
+    shard_size = None
+
     collecting_title = _("Preparing archive")
     archiving_title = _("Archiving")
     finished_title = _("Archive complete")
@@ -623,10 +734,28 @@ class ReportArchivePage(ProgressReportPage):
         timestamp = datetime.datetime.now().strftime('%y-%m-%d-%H-%M')
         return '%s_%s.zip' % (basename, timestamp)
 
-    def render(self, stream, *args, **kw):
-        """Render a zip to stream, return number of files written."""
+    def queryFileManager(self, shard=None):
         file_manager = flourish.content.queryContentProvider(
             self.context, self.request, self, 'file_manager')
+        if file_manager is not None:
+            file_manager.shard = shard
+        return file_manager
+
+    def listShards(self, shard_size):
+        file_manager = self.queryFileManager()
+        if file_manager is None:
+            return []
+        self.task_progress.title = self.collecting_title
+        file_manager.update()
+        return file_manager.listShards(shard_size)
+
+    def renderShard(self, stream, shard, *args, **kw):
+        """Render a zip of one shard to stream."""
+        return self.render(stream, shard=shard, *args, **kw)
+
+    def render(self, stream, *args, **kw):
+        """Render a zip to stream, return number of files written."""
+        file_manager = self.queryFileManager(shard=kw.pop('shard', None))
         if file_manager is None:
             return 0
 
@@ -0,0 +1,143 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Cache of generated reports.
+"""
+import datetime
+import hashlib
+import time
+
+from persistent import Persistent
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree, OOTreeSet
+from zope.component import adapter, queryUtility
+from zope.container.contained import Contained
+from zope.interface import implementer, implements
+from zope.security.proxy import removeSecurityProxy
+
+from schooltool.app.app import StartUpBase
+from schooltool.app.interfaces import ISchoolToolApplication
+from schooltool.report.interfaces import IReportCache
+from schooltool.term.interfaces import IDateManager
+
+
+def dataVersions(objects):
+    """Return the committed versions of persistent objects.
+
+    Returns None if some of the objects are not stored yet or were
+    changed in the current transaction, as their versions are not
+    known then.
+    """
+    versions = []
+    for obj in objects:
+        obj = removeSecurityProxy(obj)
+        if getattr(obj, '_p_jar', None) is None or obj._p_changed:
+            return None
+        versions.append((obj._p_oid, obj._p_serial))
+    return versions
+
+
+class ReportCache(Persistent, Contained):
+    """Most recently generated reports.
+
+    Cache keys include the versions of the objects the report reads,
+    so reports generated from outdated data are never hit and just
+    fall out of the cache.  Hits do not write to the database, the
+    reports stored the longest ago are evicted first.
+    """
+    implements(IReportCache)
+
+    size = 100
+
+    def __init__(self, size=None):
+        Persistent.__init__(self)
+        Contained.__init__(self)
+        if size is not None:
+            self.size = size
+        self.reports = OOBTree()
+        self.stored = OOBTree()
+        self.by_age = OOTreeSet()
+        self.count = Length()
+
+    @property
+    def now(self):
+        return time.time()
+
+    @property
+    def today(self):
+        dateman = queryUtility(IDateManager)
+        if dateman is not None:
+            return dateman.today
+        return datetime.date.today()
+
+    def makeKey(self, task, renderer):
+        cache_data = getattr(renderer, 'cacheData', None)
+        if cache_data is None:
+            return None
+        data = cache_data()
+        if data is None:
+            return None
+        params = task.request_params
+        parts = (task.signature,
+                 task.factory_name,
+                 task.view_name,
+                 task.context_intid,
+                 task.creator_username,
+                 getattr(params, 'locale_id', None),
+                 sorted(params.items()),
+                 getattr(renderer, 'page_size', None),
+                 data,
+                 self.today)
+        return hashlib.sha1(repr(parts)).hexdigest()
+
+    def get(self, key, default=None):
+        return self.reports.get(key, default)
+
+    def set(self, key, report):
+        if key in self.reports:
+            self.by_age.remove((self.stored[key], key))
+        else:
+            self.count.change(1)
+        self.reports[key] = report
+        stored = self.stored[key] = self.now
+        self.by_age.insert((stored, key))
+        while self.count() > self.size:
+            self.evict(self.by_age.minKey()[1])
+
+    def evict(self, key):
+        stored = self.stored.pop(key)
+        self.by_age.remove((stored, key))
+        del self.reports[key]
+        self.count.change(-1)
+
+    def __len__(self):
+        return self.count()
+
+
+@adapter(ISchoolToolApplication)
+@implementer(IReportCache)
+def getReportCacheForApp(app):
+    return app.get('schooltool.report.cache')
+
+
+class ReportCacheStartUp(StartUpBase):
+
+    def __call__(self):
+        if 'schooltool.report.cache' not in self.app:
+            self.app['schooltool.report.cache'] = ReportCache()
+
@@ -89,7 +89,20 @@ class IReportTask(IRemoteTask):
 
 
 class IReportFile(zope.file.interfaces.IFile):
-   pass
+
+   def copy():
+      """Return a new unlocated report file sharing this one's data."""
+
+
+class IReportStreamRenderer(Interface):
+   """A report renderer that writes its output into a stream."""
+
+   def renderToStream(stream, *args, **kw):
+      """Render the report incrementally into a writable file-like stream.
+
+      Returns True if anything was written, False if there is nothing
+      to report.
+      """
 
 
 class IReportDetails(Interface):
@@ -127,3 +140,26 @@ class IArchivePage(IBrowserPage, ILocation):
 
     def render(stream, *args, **kw):
         """Render the archive to stream."""
+
+
+class IReportCache(ILocation):
+   """Generated reports, reused while their data does not change."""
+
+   size = zope.schema.Int(
+      title=u'Maximum number of cached reports',
+      required=True)
+
+   def makeKey(task, renderer):
+      """Return the cache key of a report task, or None.
+
+      The key is a digest of the report builder, its context, request
+      parameters, the requesting user, the page size and the data
+      returned by renderer.cacheData().  Reports of renderers without
+      cacheData, or whose cacheData returns None, are not cached.
+      """
+
+   def get(key, default=None):
+      """Return the cached report file."""
+
+   def set(key, report):
+      """Cache a report file, evicting the reports cached longest ago."""
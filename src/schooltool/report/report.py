@@ -20,7 +20,10 @@ Base classes for report reference and request adapters
 
 """
 
+import sys
+import time
 import urllib
+import zipfile
 
 try:
     from kombu.utils import symbol_by_name
@@ -41,9 +44,9 @@ from zope.publisher.browser import BrowserView
 from zope.publisher.browser import BrowserRequest
 from zope.publisher.http import HTTPResponse
 from zope.traversing.browser.absoluteurl import absoluteURL
-from z3c.rml import rml2pdf
 
 import schooltool.common
+from schooltool.app import pdf
 from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.course.interfaces import ISectionContainer
 from schooltool.group.interfaces import IGroupContainer
@@ -57,24 +60,45 @@ from schooltool.report.interfaces import IReportMessage
 from schooltool.report.interfaces import IReportProgressMessage
 from schooltool.report.interfaces import IRemoteReportLayer
 from schooltool.report.interfaces import IReportFile
+from schooltool.report.interfaces import IReportCache
+from schooltool.report.interfaces import IReportStreamRenderer
 from schooltool.schoolyear.interfaces import ISchoolYear
 from schooltool.skin import flourish
+from schooltool.task.tasks import DBTask
 from schooltool.task.tasks import RemoteTask
 from schooltool.task.tasks import query_messages
 from schooltool.task.tasks import Message
 from schooltool.task.progress import ProgressMessage
+from schooltool.task.progress import TaskProgress
+from schooltool.task.progress import normalized_progress
+from schooltool.task.interfaces import ITaskContainer
 from schooltool.task.interfaces import ITaskScheduledNotification
+from schooltool.task.state import TaskWriteState
 from schooltool.task.tasks import TaskCompletedNotification
 from schooltool.task.tasks import TaskScheduledNotification
 from schooltool.task.tasks import TaskFailedMessage
 from schooltool.term.interfaces import IDateManager
 
+from schooltool.common import format_message
 from schooltool.common import SchoolToolMessage as _
 
 
 class ReportFile(zope.file.file.File):
     implements(IReportFile)
 
+    def copy(self):
+        """Return a new unlocated report file sharing this one's data.
+
+        Generated reports are not written to again, so the data can be
+        shared by reports attached to different messages.
+        """
+        report = ReportFile.__new__(ReportFile)
+        report.mimeType = self.mimeType
+        report.parameters = dict(self.parameters)
+        report._data = self._data
+        report.__name__ = self.__name__
+        return report
+
 
 class ReportLinkViewletManager(flourish.viewlet.ViewletManager):
     implements(IReportLinkViewletManager)
@@ -378,6 +402,7 @@ class AbstractReportTask(RemoteTask):
     factory_name = None
 
     context_intid = None
+    cache_key = None
 
     def __init__(self, report_builder, context, remote_request=None):
         RemoteTask.__init__(self)
@@ -454,10 +479,18 @@ class AbstractReportTask(RemoteTask):
 
     def complete(self, request, result):
         self.beginRequest()
+        self.cacheReport()
         res = super(AbstractReportTask, self).complete(request, result)
         self.endRequest()
         return res
 
+    def cacheReport(self):
+        if self.cache_key is None or self.report is None:
+            return
+        cache = IReportCache(ISchoolToolApplication(None), None)
+        if cache is not None:
+            cache.set(self.cache_key, self.report.copy())
+
     def fail(self, request, result, traceback):
         self.beginRequest()
         res = super(AbstractReportTask, self).fail(request, result, traceback)
@@ -480,6 +513,11 @@ class AbstractReportTask(RemoteTask):
         return renderer
 
     def renderReport(self, renderer, stream, *args, **kw):
+        if IReportStreamRenderer.providedBy(renderer):
+            written = renderer.renderToStream(stream, *args, **kw)
+            if not written:
+                raise NoReportException()
+            return
         data = renderer()
         stream.write(data)
 
@@ -536,11 +574,13 @@ class ReportTask(AbstractReportTask):
     default_mimetype = 'application/pdf'
 
     def renderReport(self, renderer, stream, *args, **kw):
+        if IReportStreamRenderer.providedBy(renderer):
+            return AbstractReportTask.renderReport(
+                self, renderer, stream, *args, **kw)
         renderer.update()
         rml = renderer.render()
         filename = renderer.filename
-        pdf = rml2pdf.parseString(rml, filename=filename or None)
-        stream.write(pdf.getvalue())
+        pdf.renderRML(rml, stream, filename=filename or None)
 
 
 class OldReportTask(ReportTask):
@@ -562,11 +602,184 @@ class OldReportTask(ReportTask):
         return ReportTask.updateReport(renderer, report)
 
 
+class ArchiveShardFailed(Exception):
+    pass
+
+
+class ArchiveShardTimeout(ArchiveShardFailed):
+    pass
+
+
+class ArchiveDBTask(DBTask):
+    """Celery task that merges the shards of an archive once they render.
+
+    The task does not hold a worker while the shards are rendered, it is
+    retried every shard_poll_seconds until all of them are done.
+    """
+
+    shard_poll_seconds = 2
+    shard_timeout_seconds = 60*60
+
+    def awaitSubtasks(self, result):
+        state = TaskWriteState(self.request.id)
+        if state.committing:
+            state.resume_progress()
+        if self.runTransaction('collectShards', False, self):
+            return
+        max_retries = self.shard_timeout_seconds // self.shard_poll_seconds
+        try:
+            raise self.retry(countdown=self.shard_poll_seconds,
+                             max_retries=max_retries)
+        except self.MaxRetriesExceededError:
+            raise ArchiveShardTimeout(self.request.id,
+                                      self.shard_timeout_seconds)
+
+
 class ArchiveReportTask(AbstractReportTask):
+    """Archive report task.
+
+    If the archive page sets a shard_size, the archive is split into
+    shards that are rendered by separate tasks on any free worker and
+    merged into one zip when all of them finish.  Eager tasks render the
+    archive inline.
+    """
+
+    celery_task = ArchiveDBTask
 
     default_filename = 'report.zip'
     default_mimetype = 'application/zip'
 
+    compression = zipfile.ZIP_STORED
+    shard_task_ids = ()
+    archive_filename = None
+
+    rendering_shards_title = _("Rendering archive parts")
+    merging_shards_title = _("Merging archive parts")
+
+    def execute(self, celery_task, *args, **kwargs):
+        if self.shard_task_ids:
+            return # retried while the shards are rendered
+        self.beginRequest()
+        renderer = self.getRenderer()
+        if renderer is None:
+            return # skip the report
+        shards = []
+        if self.canScheduleShards(celery_task):
+            shards = self.listShards(renderer)
+        if len(shards) > 1:
+            self.scheduleShards(renderer, shards, *args, **kwargs)
+        else:
+            self.report = self.renderToFile(renderer, *args, **kwargs)
+        self.endRequest()
+
+    def canScheduleShards(self, celery_task):
+        """Can the shards be rendered by separate tasks?
+
+        Eager tasks would run the shards in-line when they are scheduled.
+        """
+        if celery_task is None:
+            return False
+        return not getattr(celery_task.request, 'is_eager', False)
+
+    def listShards(self, renderer):
+        shard_size = getattr(renderer, 'shard_size', None)
+        if not shard_size:
+            return []
+        renderer.update()
+        return renderer.listShards(shard_size)
+
+    def scheduleShards(self, renderer, shards, *args, **kwargs):
+        self.archive_filename = renderer.filename
+        self.compression = renderer.compression
+        task_ids = []
+        for shard in shards:
+            task = ArchiveShardTask(self, shard)
+            task.schedule(None, args=args, kwargs=kwargs)
+            task_ids.append(task.task_id)
+        self.shard_task_ids = tuple(task_ids)
+
+    def collectShards(self, celery_task):
+        """Merge the shards once all of them are rendered.
+
+        Returns False while some of the shards are still being rendered.
+        Raises ArchiveShardFailed as soon as any shard fails or is lost.
+        """
+        if not self.shard_task_ids:
+            return True
+        app = ISchoolToolApplication(None)
+        tasks = ITaskContainer(app)
+        shards = []
+        for task_id in self.shard_task_ids:
+            shard = tasks.get(task_id)
+            if shard is None:
+                raise ArchiveShardFailed(task_id, 'lost')
+            if shard.failed:
+                raise ArchiveShardFailed(task_id, shard.permanent_traceback)
+            shards.append(shard)
+        finished = [shard for shard in shards if shard.finished]
+        progress = TaskProgress(self.task_id)
+        progress.title = self.rendering_shards_title
+        progress.force('shards', title=format_message(
+                _('${done} of ${total}'),
+                {'done': len(finished), 'total': len(shards)}),
+            progress=normalized_progress(len(finished), len(shards)))
+        if len(finished) < len(shards):
+            return False
+        progress.title = self.merging_shards_title
+        progress.force('shards', progress=None)
+        self.report = self.mergeShards([shard.report for shard in shards])
+        self.discardShards()
+        return True
+
+    def discardShards(self):
+        """Remove shard tasks, revoking the ones that are not done yet."""
+        app = ISchoolToolApplication(None)
+        tasks = ITaskContainer(app)
+        for task_id in self.shard_task_ids:
+            shard = tasks.get(task_id)
+            if shard is None:
+                continue
+            if not shard.finished:
+                try:
+                    shard.async_result.revoke()
+                except Exception, e:
+                    print >> sys.stderr, 'Failed to revoke task %s with exception %r' % (
+                        task_id, e)
+            del tasks[task_id]
+        self.shard_task_ids = ()
+
+    def fail(self, request, result, traceback):
+        self.discardShards()
+        return super(ArchiveReportTask, self).fail(request, result, traceback)
+
+    def mergeShards(self, archives):
+        report = ReportFile()
+        stream = report.open('w')
+        written = 0
+        try:
+            merged = zipfile.ZipFile(stream, 'w', compression=self.compression)
+            try:
+                for archive in archives:
+                    if archive is None:
+                        continue
+                    shard_stream = archive.open('r')
+                    try:
+                        shard_zip = zipfile.ZipFile(shard_stream)
+                        for info in shard_zip.infolist():
+                            merged.writestr(info, shard_zip.read(info))
+                            written += 1
+                    finally:
+                        shard_stream.close()
+            finally:
+                merged.close()
+        finally:
+            stream.close()
+        if not written:
+            return None
+        report.mimeType = self.default_mimetype
+        report.__name__ = self.archive_filename or self.default_filename
+        return report
+
     def renderReport(self, renderer, stream, *args, **kw):
         renderer.update()
         written = renderer.render(stream, *args, **kw)
@@ -574,6 +787,51 @@ class ArchiveReportTask(AbstractReportTask):
             raise NoReportException()
 
 
+class ArchiveShardTask(ArchiveReportTask):
+    """Renders one shard of a sharded archive.
+
+    Shard tasks send no notifications and stay in the task container
+    until the archive task that scheduled them merges their reports.
+    """
+
+    celery_task = DBTask
+
+    parent_task_id = None
+    shard = None
+
+    def __init__(self, parent, shard):
+        RemoteTask.__init__(self)
+        self.parent_task_id = parent.task_id
+        self.shard = shard
+        self.view_name = parent.view_name
+        self.factory_name = parent.factory_name
+        self.context_intid = parent.context_intid
+        self.request_params = parent.request_params
+        self.creator_username = parent.creator_username
+        self.routing_key = parent.routing_key
+
+    def listShards(self, renderer):
+        return []
+
+    def renderReport(self, renderer, stream, *args, **kw):
+        renderer.update()
+        written = renderer.renderShard(stream, self.shard, *args, **kw)
+        if not written:
+            raise NoReportException()
+
+    def complete(self, request, result):
+        pass
+
+    def notifyScheduled(self, request):
+        pass
+
+    def notifyComplete(self, request, result):
+        pass
+
+    def notifyFailed(self, request, result, traceback):
+        pass
+
+
 class ReportDetails(object):
     implements(IReportDetails)
 
@@ -32,6 +32,558 @@ def doctest_Something(self):
     """
 
 
+def doctest_AbstractReportTask_renderReport():
+    """Tests for AbstractReportTask.renderReport.
+
+    Plain renderers are called and their data is written to the stream.
+
+        >>> from StringIO import StringIO
+        >>> task = report.AbstractReportTask.__new__(report.AbstractReportTask)
+
+        >>> stream = StringIO()
+        >>> task.renderReport(lambda: 'report data', stream)
+        >>> stream.getvalue()
+        'report data'
+
+    Stream renderers write into the stream themselves.
+
+        >>> from zope.interface import implements
+        >>> from schooltool.report.interfaces import IReportStreamRenderer
+
+        >>> class StreamRenderer(object):
+        ...     implements(IReportStreamRenderer)
+        ...     chunks = ('first ', 'second')
+        ...     def __call__(self):
+        ...         raise AssertionError('should not be called')
+        ...     def renderToStream(self, stream, *args, **kw):
+        ...         print 'rendering', args, kw
+        ...         for chunk in self.chunks:
+        ...             stream.write(chunk)
+        ...         return bool(self.chunks)
+
+        >>> stream = StringIO()
+        >>> task.renderReport(StreamRenderer(), stream, 1, option='x')
+        rendering (1,) {'option': 'x'}
+        >>> stream.getvalue()
+        'first second'
+
+    If nothing was written, there is no report.
+
+        >>> renderer = StreamRenderer()
+        >>> renderer.chunks = ()
+        >>> task.renderReport(renderer, StringIO())
+        Traceback (most recent call last):
+        ...
+        NoReportException
+
+    """
+
+
+def doctest_ArchiveReportTask_mergeShards():
+    """Tests for ArchiveReportTask.mergeShards.
+
+    Shards of an archive are rendered into separate zip files.
+
+        >>> import zipfile
+
+        >>> def makeArchive(files):
+        ...     archive = report.ReportFile()
+        ...     stream = archive.open('w')
+        ...     zip_file = zipfile.ZipFile(stream, 'w')
+        ...     for name, data in files:
+        ...         zip_file.writestr(name, data)
+        ...     zip_file.close()
+        ...     stream.close()
+        ...     return archive
+
+        >>> task = report.ArchiveReportTask.__new__(report.ArchiveReportTask)
+        >>> task.archive_filename = 'cards.zip'
+
+    The task merges them into a single archive.
+
+        >>> archive = task.mergeShards([
+        ...     makeArchive([('john.pdf', 'John'), ('pete.pdf', 'Pete')]),
+        ...     None,
+        ...     makeArchive([('zed.pdf', 'Zed')]),
+        ...     ])
+        >>> archive.__name__, archive.mimeType
+        ('cards.zip', 'application/zip')
+
+        >>> stream = archive.open('r')
+        >>> zip_file = zipfile.ZipFile(stream)
+        >>> [(name, zip_file.read(name)) for name in zip_file.namelist()]
+        [('john.pdf', 'John'), ('pete.pdf', 'Pete'), ('zed.pdf', 'Zed')]
+        >>> stream.close()
+
+    If no shard produced any files, there is no report.
+
+        >>> print task.mergeShards([makeArchive([]), None])
+        None
+
+    """
+
+
+class ShardStub(object):
+
+    finished = False
+    failed = False
+    permanent_traceback = None
+    report = None
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+
+    @property
+    def async_result(self):
+        return self
+
+    def revoke(self):
+        print 'revoked', self.task_id
+
+
+def setUpShards():
+    from zope.component import provideAdapter
+    from schooltool.app.interfaces import ISchoolToolApplication
+    from schooltool.task.interfaces import ITaskContainer
+    app = object()
+    tasks = {}
+    provideAdapter(lambda ignored: app, (None, ),
+                   provides=ISchoolToolApplication)
+    provideAdapter(lambda app: tasks, (None, ),
+                   provides=ITaskContainer)
+    for task_id in ('s1', 's2', 's3'):
+        tasks[task_id] = ShardStub(task_id)
+    task = report.ArchiveReportTask.__new__(report.ArchiveReportTask)
+    task.shard_task_ids = ('s1', 's2', 's3')
+    return task, tasks
+
+
+def doctest_ArchiveReportTask_collectShards():
+    """Tests for ArchiveReportTask.collectShards.
+
+        >>> task, tasks = setUpShards()
+
+    The archive task waits while shards are rendering.
+
+        >>> tasks['s1'].finished = True
+        >>> task.collectShards(None)
+        False
+
+    A failed shard fails the archive without waiting for the others.
+
+        >>> tasks['s2'].finished = tasks['s2'].failed = True
+        >>> tasks['s2'].permanent_traceback = 'Traceback: oops'
+        >>> task.collectShards(None)
+        Traceback (most recent call last):
+        ...
+        ArchiveShardFailed: ('s2', 'Traceback: oops')
+
+    So does a shard that is gone from the task container.
+
+        >>> task, tasks = setUpShards()
+        >>> del tasks['s3']
+        >>> task.collectShards(None)
+        Traceback (most recent call last):
+        ...
+        ArchiveShardFailed: ('s3', 'lost')
+
+    When all shards finish, they are merged and removed.
+
+        >>> task, tasks = setUpShards()
+        >>> for shard in tasks.values():
+        ...     shard.finished = True
+        >>> task.collectShards(None)
+        True
+        >>> print task.report
+        None
+        >>> tasks, task.shard_task_ids
+        ({}, ())
+
+    """
+
+
+def doctest_ArchiveReportTask_fail():
+    """Tests for ArchiveReportTask.fail.
+
+        >>> task, tasks = setUpShards()
+        >>> task.beginRequest = task.endRequest = lambda *args: None
+        >>> tasks['s1'].finished = True
+
+    When the archive fails, its shards are discarded.  Shards that are
+    still pending are revoked.
+
+        >>> task.fail(None, None, 'Traceback: timed out')
+        revoked s2
+        revoked s3
+        >>> tasks, task.shard_task_ids
+        ({}, ())
+        >>> task.permanent_traceback
+        'Traceback: timed out'
+
+    """
+
+
+def doctest_ArchiveDBTask_awaitSubtasks():
+    """Tests for ArchiveDBTask.awaitSubtasks.
+
+        >>> class StateStub(object):
+        ...     committing = False
+        ...     def __init__(self, task_id):
+        ...         pass
+        >>> real_state = report.TaskWriteState
+        >>> report.TaskWriteState = StateStub
+
+        >>> class RetryStub(Exception):
+        ...     pass
+        >>> class RequestStub(object):
+        ...     id = 'archive'
+        ...     retries = 0
+        >>> class CeleryTaskStub(report.ArchiveDBTask):
+        ...     request = RequestStub()
+        ...     collected = False
+        ...     def runTransaction(self, attr, set_committing, *args):
+        ...         print attr
+        ...         return self.collected
+        ...     def retry(self, countdown=None, max_retries=None):
+        ...         print 'retry in %s seconds, at most %s times' % (
+        ...             countdown, max_retries)
+        ...         if self.request.retries >= max_retries:
+        ...             raise self.MaxRetriesExceededError()
+        ...         return RetryStub()
+
+    The task does not wait for the shards, it is retried later instead.
+
+        >>> celery_task = CeleryTaskStub()
+        >>> try:
+        ...     celery_task.awaitSubtasks(None)
+        ... except RetryStub:
+        ...     print 'retrying'
+        collectShards
+        retry in 2 seconds, at most 1800 times
+        retrying
+
+    Once the shards are collected, the task completes.
+
+        >>> celery_task.collected = True
+        >>> celery_task.awaitSubtasks(None)
+        collectShards
+
+    If shards do not finish in time, the archive fails.
+
+        >>> celery_task.collected = False
+        >>> celery_task.request.retries = 1800
+        >>> try:
+        ...     celery_task.awaitSubtasks(None)
+        ... except report.ArchiveShardTimeout, e:
+        ...     print repr(e)
+        collectShards
+        retry in 2 seconds, at most 1800 times
+        ArchiveShardTimeout('archive', 3600)
+
+        >>> report.TaskWriteState = real_state
+
+    """
+
+
+def doctest_ArchiveReportTask_execute():
+    """Tests for ArchiveReportTask.execute.
+
+        >>> class RendererStub(object):
+        ...     shard_size = 2
+        ...     filename = 'cards.zip'
+        ...     compression = None
+        ...     def update(self):
+        ...         pass
+        ...     def listShards(self, shard_size):
+        ...         return [('cards', (1, 2)), ('cards', (3, ))]
+
+        >>> class TaskStub(report.ArchiveReportTask):
+        ...     def beginRequest(self):
+        ...         pass
+        ...     def endRequest(self):
+        ...         pass
+        ...     def getRenderer(self):
+        ...         return RendererStub()
+        ...     def scheduleShards(self, renderer, shards, *args, **kw):
+        ...         print 'scheduling', shards
+        ...     def renderToFile(self, renderer, *args, **kw):
+        ...         print 'rendering inline'
+
+        >>> class RequestStub(object):
+        ...     is_eager = False
+        >>> class CeleryTaskStub(object):
+        ...     request = RequestStub()
+
+        >>> task = TaskStub.__new__(TaskStub)
+        >>> celery_task = CeleryTaskStub()
+
+    Shards are rendered by separate tasks.
+
+        >>> task.execute(celery_task)
+        scheduling [('cards', (1, 2)), ('cards', (3,))]
+
+    When the task is retried to collect the shards, it does not render
+    anything.
+
+        >>> task.shard_task_ids = ('shard-1', 'shard-2')
+        >>> task.execute(celery_task)
+        >>> del task.shard_task_ids
+
+    Eager tasks render the archive inline.
+
+        >>> RequestStub.is_eager = True
+        >>> task.execute(celery_task)
+        rendering inline
+
+    """
+
+
+def doctest_FileArchiver_shards():
+    """Tests for FileArchiver.listShards and restrictToShard.
+
+        >>> from zope.component import provideUtility
+        >>> from zope.interface import implements
+        >>> from zope.intid.interfaces import IIntIds
+        >>> from schooltool.report.browser.report import FileArchiver
+
+        >>> class IntIdsStub(object):
+        ...     implements(IIntIds)
+        ...     def getId(self, obj):
+        ...         return int(obj[1:])
+        ...     def getObject(self, key):
+        ...         return 'p%d' % key
+        >>> provideUtility(IntIdsStub())
+
+    Archivers that do not list their items are archived in one shard.
+
+        >>> archiver = FileArchiver(None, None, None, None)
+        >>> archiver.listShards(2)
+        [None]
+
+        >>> archiver.restrictToShard(None)
+        >>> print archiver.items
+        None
+
+    Others are split into shards of item ids.
+
+        >>> archiver.items = ['p1', 'p2', 'p3', 'p4', 'p5']
+        >>> shards = archiver.listShards(2)
+        >>> shards
+        [(1, 2), (3, 4), (5,)]
+
+    When rendering a shard, the archiver only gets the items of that shard.
+
+        >>> archiver.restrictToShard(shards[1])
+        >>> archiver.items
+        ['p3', 'p4']
+
+        >>> archiver.items = []
+        >>> archiver.listShards(2)
+        []
+
+    """
+
+
+def doctest_ReportFile_copy():
+    """Tests for ReportFile.copy.
+
+        >>> original = report.ReportFile('application/pdf')
+        >>> original.__name__ = 'roster.pdf'
+        >>> stream = original.open('w')
+        >>> stream.write('%PDF')
+        >>> stream.close()
+
+        >>> class MessageStub(object):
+        ...     pass
+        >>> original.__parent__ = first = MessageStub()
+
+    Copies share the data, but are not located with the original.
+
+        >>> copy = original.copy()
+        >>> copy.__name__, copy.mimeType, copy.open('r').read()
+        ('roster.pdf', 'application/pdf', '%PDF')
+        >>> print copy.__parent__
+        None
+
+        >>> copy.__parent__ = MessageStub()
+        >>> original.__parent__ is first
+        True
+
+    """
+
+
+def doctest_ReportCache():
+    """Tests for ReportCache.
+
+        >>> from schooltool.report.cache import ReportCache
+        >>> cache = ReportCache(size=2)
+
+        >>> class ClockStub(object):
+        ...     time = 0
+        ...     def __get__(self, cache, cls=None):
+        ...         self.time += 1
+        ...         return self.time
+        >>> real_now = ReportCache.now
+        >>> ReportCache.now = ClockStub()
+
+    Cached reports are returned by key.
+
+        >>> print cache.get('roster')
+        None
+        >>> cache.set('roster', 'roster.pdf')
+        >>> cache.set('cards', 'cards.pdf')
+        >>> cache.get('roster'), len(cache)
+        ('roster.pdf', 2)
+
+    Hits do not change the cache, so they never conflict with each other.
+
+        >>> ages = list(cache.by_age)
+        >>> cache.get('roster')
+        'roster.pdf'
+        >>> list(cache.by_age) == ages
+        True
+
+    When the cache is full, reports cached the longest ago are evicted.
+
+        >>> cache.set('labels', 'labels.pdf')
+        >>> len(cache)
+        2
+        >>> print cache.get('roster')
+        None
+        >>> cache.get('cards'), cache.get('labels')
+        ('cards.pdf', 'labels.pdf')
+
+    Caching a report again makes it the newest one.
+
+        >>> cache.set('cards', 'new-cards.pdf')
+        >>> cache.set('roster', 'roster.pdf')
+        >>> cache.get('cards'), cache.get('roster'), len(cache)
+        ('new-cards.pdf', 'roster.pdf', 2)
+        >>> print cache.get('labels')
+        None
+
+    Keys are digests of the report request and the data the report
+    renderer reads.
+
+        >>> class TaskStub(object):
+        ...     signature = 'schooltool.report.report:ReportTask'
+        ...     factory_name = None
+        ...     view_name = 'section_roster.pdf'
+        ...     context_intid = 5
+        ...     context = None
+        ...     creator_username = 'teacher'
+        ...     def __init__(self, **params):
+        ...         self.request_params = report.RemoteRequestParams(params)
+
+        >>> class RendererStub(object):
+        ...     page_size = (595, 842)
+        ...     data = [('oid1', 'serial1')]
+        ...     def cacheData(self):
+        ...         return self.data
+
+        >>> renderer = RendererStub()
+        >>> key = cache.makeKey(TaskStub(format='short'), renderer)
+        >>> len(key)
+        40
+        >>> cache.makeKey(TaskStub(format='short'), renderer) == key
+        True
+        >>> cache.makeKey(TaskStub(format='long'), renderer) == key
+        False
+
+    Renderers with a different page size make different reports.
+
+        >>> renderer.page_size = (612, 792)
+        >>> cache.makeKey(TaskStub(format='short'), renderer) == key
+        False
+        >>> renderer.page_size = (595, 842)
+
+    When the data changes, old keys are never made again.
+
+        >>> renderer.data = [('oid1', 'serial2')]
+        >>> cache.makeKey(TaskStub(format='short'), renderer) == key
+        False
+
+    Reports are not cached if the renderer cannot tell what data it reads.
+
+        >>> renderer.data = None
+        >>> print cache.makeKey(TaskStub(format='short'), renderer)
+        None
+        >>> print cache.makeKey(TaskStub(format='short'), object())
+        None
+
+        >>> ReportCache.now = real_now
+
+    """
+
+
+def doctest_dataVersions():
+    """Tests for dataVersions.
+
+        >>> import transaction
+        >>> from persistent.mapping import PersistentMapping
+        >>> from ZODB.DB import DB
+        >>> from ZODB.MappingStorage import MappingStorage
+        >>> from schooltool.report.cache import ReportCache, dataVersions
+
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> root = connection.root()
+
+    Objects that are not stored yet have no versions.
+
+        >>> section = PersistentMapping(title='Math')
+        >>> member = PersistentMapping(title='John')
+        >>> print dataVersions([section, member])
+        None
+
+        >>> root['section'] = section
+        >>> root['member'] = member
+        >>> transaction.commit()
+
+    Keys of reports made from stored objects change with every commit
+    that changes them.
+
+        >>> class RendererStub(object):
+        ...     def cacheData(self):
+        ...         return dataVersions([root['section'], root['member']])
+        >>> class TaskStub(object):
+        ...     signature = 'schooltool.report.report:ReportTask'
+        ...     factory_name = None
+        ...     view_name = 'section_roster.pdf'
+        ...     context_intid = 5
+        ...     creator_username = 'teacher'
+        ...     request_params = report.RemoteRequestParams()
+        >>> cache = ReportCache()
+        >>> key = cache.makeKey(TaskStub(), RendererStub())
+        >>> key is not None
+        True
+
+        >>> root['section']['title'] = 'Geometry'
+        >>> transaction.commit()
+        >>> cache.makeKey(TaskStub(), RendererStub()) == key
+        False
+        >>> key = cache.makeKey(TaskStub(), RendererStub())
+
+    Commits that do not touch the objects keep the key.
+
+        >>> root['other'] = PersistentMapping()
+        >>> transaction.commit()
+        >>> cache.makeKey(TaskStub(), RendererStub()) == key
+        True
+
+    While an object has uncommitted changes, its version is unknown.
+
+        >>> root['member']['title'] = 'Johnny'
+        >>> print cache.makeKey(TaskStub(), RendererStub())
+        None
+
+        >>> transaction.abort()
+        >>> connection.close()
+        >>> db.close()
+
+    """
+
+
 def setUp(test=None):
     setup.placefulSetUp()
 
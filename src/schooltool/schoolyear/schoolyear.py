@@ -18,6 +18,7 @@
 """
 School year implementation
 """
+import bisect
 import datetime
 
 from zope.proxy import sameProxiedObjects
@@ -28,6 +29,7 @@ from zope.component import adapts
 from zope.interface import implementer
 from zope.interface import implements
 from zope.container.btree import BTreeContainer
+from zope.security.proxy import removeSecurityProxy
 
 from schooltool.common import DateRange
 from schooltool.common import IDateRange
@@ -62,7 +64,80 @@ class SchoolYearAfterChangeEvent(object):
         self.new_dates = new_dates
 
 
-class SchoolYearContainer(BTreeContainer):
+class DateIndexedContainer(BTreeContainer):
+    """A container of non-overlapping items with first and last dates.
+
+    Keeps a sorted tuple of (first, last, key) entries so that items can
+    be looked up by date without loading all of them.
+    """
+
+    _date_index = None
+
+    @property
+    def date_index(self):
+        if self._date_index is None:
+            # Containers of an older database that has not been evolved yet.
+            return self.buildDateIndex()
+        return self._date_index
+
+    def buildDateIndex(self):
+        return tuple(sorted([(item.first, item.last, key)
+                             for key, item in self.items()]))
+
+    def reindexDates(self, key):
+        index = [entry for entry in self.date_index if entry[2] != key]
+        item = self.get(key)
+        if item is not None:
+            bisect.insort(index, (item.first, item.last, key))
+        self._date_index = tuple(index)
+
+    def __setitem__(self, key, item):
+        BTreeContainer.__setitem__(self, key, item)
+        self.reindexDates(key)
+
+    def __delitem__(self, key):
+        BTreeContainer.__delitem__(self, key)
+        self.reindexDates(key)
+
+    def _locateDate(self, date):
+        """Return index entries of the nearest items before and after `date`.
+
+        The entry before `date` is the one that may contain it.
+        """
+        index = self.date_index
+        pos = bisect.bisect_right(index, (date, datetime.date.max))
+        before = pos > 0 and index[pos - 1] or None
+        after = pos < len(index) and index[pos] or None
+        return before, after
+
+    def getItemForDate(self, date):
+        """Return the item that contains `date`, or None."""
+        before, after = self._locateDate(date)
+        if before is not None and date <= before[1]:
+            return self[before[2]]
+        return None
+
+    def getNearestItemForDate(self, date, later=True):
+        """Return the item that contains `date`, or the nearest one.
+
+        If no item contains `date`, the next item is preferred to the
+        previous one when `later` is True, and the other way round otherwise.
+        """
+        before, after = self._locateDate(date)
+        if before is not None and date <= before[1]:
+            return self[before[2]]
+        candidates = later and (after, before) or (before, after)
+        for entry in candidates:
+            if entry is not None:
+                return self[entry[2]]
+        return None
+
+    def sortedValues(self):
+        """Return items in chronological order."""
+        return [self[key] for first, last, key in self.date_index]
+
+
+class SchoolYearContainer(DateIndexedContainer):
     implements(ISchoolYearContainer)
 
     _active_id = None
@@ -81,7 +156,7 @@ class SchoolYearContainer(BTreeContainer):
                                  " it is the last school year available!")
             else:
                 self._set_active_id(None)
-        BTreeContainer.__delitem__(self, schoolyear_id)
+        DateIndexedContainer.__delitem__(self, schoolyear_id)
 
     def validateForOverlap(self, schoolyear):
         overlapping_schoolyears = []
@@ -94,7 +169,7 @@ class SchoolYearContainer(BTreeContainer):
 
     def __setitem__(self, key, schoolyear):
         self.validateForOverlap(schoolyear)
-        BTreeContainer.__setitem__(self, key, schoolyear)
+        DateIndexedContainer.__setitem__(self, key, schoolyear)
         if self.active_id is None:
             self._set_active_id(key)
 
@@ -105,7 +180,7 @@ class SchoolYearContainer(BTreeContainer):
 
     @property
     def sorted_schoolyears(self):
-        return sorted(self.values(), key=lambda s: s.last)
+        return self.sortedValues()
 
     def activateNextSchoolYear(self, year_id=None):
         if year_id is None:
@@ -115,27 +190,11 @@ class SchoolYearContainer(BTreeContainer):
         self._set_active_id(year_id)
 
     def getLastSchoolYearForDate(self, date):
-        before, after = [], []
-        for year in self.sorted_schoolyears:
-            if date in IDateRange(year):
-                return year
-            if date > year.last:
-                before.append((year.last, year))
-            if date < year.first:
-                after.append((year.first, year))
-        if before:
-            return max(before)[1]
-        if after:
-            return min(after)[1]
-        return None
+        return self.getNearestItemForDate(date, later=False)
 
     def getSchoolYearForToday(self):
         dtm = queryUtility(IDateManager)
-        today = dtm.today
-        for year in self.sorted_schoolyears:
-            if today in IDateRange(year):
-                return year
-        return None
+        return self.getItemForDate(dtm.today)
 
     def getNextSchoolYear(self):
         if self.getActiveSchoolYear() is None:
@@ -150,7 +209,7 @@ class SchoolYearContainer(BTreeContainer):
         return None
 
 
-class SchoolYear(BTreeContainer):
+class SchoolYear(DateIndexedContainer):
     implements(ITermContainer, ISchoolYear)
 
     def __init__(self, title, first, last):
@@ -211,7 +270,18 @@ class SchoolYear(BTreeContainer):
             raise ValueError("Term can't start before the school year starts!")
         if term.last > self.last:
             raise ValueError("Term can't end after the school year ends!")
-        BTreeContainer.__setitem__(self, key, term)
+        DateIndexedContainer.__setitem__(self, key, term)
+
+
+class SchoolYearDatesReindexSubscriber(EventAdapterSubscriber):
+    adapts(SchoolYearAfterChangeEvent)
+    implements(ISubscriber)
+
+    def __call__(self):
+        schoolyear = self.event.schoolyear
+        syc = removeSecurityProxy(schoolyear.__parent__)
+        if syc is not None:
+            syc.reindexDates(schoolyear.__name__)
 
 
 class SchoolYearDateRangeAdapter(DateRange):
@@ -144,6 +144,60 @@ def doctest_SchoolYearContainer_schoolyear_activation():
     """
 
 
+def doctest_SchoolYearContainer_date_lookups():
+    """Test for school year lookups by date
+
+       >>> app = ISchoolToolApplication(None)
+       >>> syc = ISchoolYearContainer(app)
+
+       >>> syc.getLastSchoolYearForDate(date(2005, 1, 1)) is None
+       True
+
+       >>> sy2 = SchoolYear("2006-2007", date(2006, 9, 1), date(2007, 7, 15))
+       >>> syc['2006-2007'] = sy2
+       >>> sy1 = SchoolYear("2005-2006", date(2005, 9, 1), date(2006, 7, 15))
+       >>> syc['2005-2006'] = sy1
+
+    The container keeps the dates of its school years sorted:
+
+       >>> syc.date_index
+       ((datetime.date(2005, 9, 1), datetime.date(2006, 7, 15), '2005-2006'),
+        (datetime.date(2006, 9, 1), datetime.date(2007, 7, 15), '2006-2007'))
+
+       >>> [sy.title for sy in syc.sorted_schoolyears]
+       ['2005-2006', '2006-2007']
+
+    The school year that contains the date is returned, otherwise the last
+    one that ended before it, otherwise the first one:
+
+       >>> syc.getLastSchoolYearForDate(date(2006, 1, 1)) is sy1
+       True
+       >>> syc.getLastSchoolYearForDate(date(2006, 8, 1)) is sy1
+       True
+       >>> syc.getLastSchoolYearForDate(date(2008, 1, 1)) is sy2
+       True
+       >>> syc.getLastSchoolYearForDate(date(2005, 1, 1)) is sy1
+       True
+
+    Date changes are reflected in the index:
+
+       >>> sy1.last = date(2006, 8, 15)
+       >>> syc.getLastSchoolYearForDate(date(2006, 8, 1)) is sy1
+       True
+       >>> syc.date_index[0][:2]
+       (datetime.date(2005, 9, 1), datetime.date(2006, 8, 15))
+
+    And so are removed school years:
+
+       >>> del syc['2005-2006']
+       >>> syc.getLastSchoolYearForDate(date(2006, 1, 1)) is sy2
+       True
+       >>> len(syc.date_index)
+       1
+
+    """
+
+
 def doctest_SchoolYear():
     """Test for SchoolYear
 
@@ -26,6 +26,7 @@ from persistent import Persistent
 from persistent.dict import PersistentDict
 from schooltool.securitypolicy.interfaces import IAccessControlCustomisations
 from schooltool.securitypolicy.interfaces import IAccessControlSetting
+from schooltool.securitypolicy.policy import invalidatePermissionCache
 
 
 class AccessControlCustomisations(Persistent):
@@ -48,6 +49,7 @@ class AccessControlCustomisations(Persistent):
     def set(self, key, value):
         if self.getSetting(key):
             self._settings[key] = value
+            invalidatePermissionCache()
 
     def __iter__(self):
         settings = subscribers([None], IAccessControlSetting)
@@ -19,6 +19,11 @@
 SchoolTool security policy.
 
 """
+import threading
+import time
+from collections import OrderedDict
+
+import transaction
 import zope.keyreference.interfaces
 from zope.security.simplepolicies import ParanoidSecurityPolicy
 from zope.component import queryAdapter
@@ -67,8 +72,89 @@ class SchoolToolSecurityPolicy(ParanoidSecurityPolicy):
         return False
 
 
+class PermissionCache(object):
+    """Process wide LRU cache of permission checks.
+
+    Keys are (principal id, permission, key reference) tuples.  Entries
+    expire after ttl seconds, and the whole cache is invalidated when
+    relationships or access control settings change.  The cache is
+    disabled when size is 0.
+    """
+
+    def __init__(self, size=0, ttl=300):
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.configure(size, ttl)
+
+    def configure(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.invalidate()
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                return None
+            self.entries[key] = entry
+            return value
+
+    def set(self, key, value, generation):
+        """Cache a value computed when the cache was at given generation."""
+        with self.lock:
+            if generation != self.generation or not self.enabled:
+                return
+            self.entries.pop(key, None)
+            self.entries[key] = (value, time.time() + self.ttl)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.generation += 1
+
+
+permission_cache = PermissionCache()
+
+
+def _invalidateAfterCommit(status):
+    permission_cache.invalidate()
+
+
+def invalidatePermissionCache(event=None):
+    """Invalidate the permission cache now and when the transaction commits.
+
+    Invalidating again after commit drops results cached by concurrent
+    requests that did not see the changes yet.
+    """
+    if not permission_cache.enabled:
+        return
+    permission_cache.invalidate()
+    txn = transaction.get()
+    for hook, args, kws in txn.getAfterCommitHooks():
+        if hook is _invalidateAfterCommit:
+            return
+    txn.addAfterCommitHook(_invalidateAfterCommit)
+
+
 class CachingSecurityPolicy(ParanoidSecurityPolicy):
-    """Crowd-based caching security policy."""
+    """Crowd-based caching security policy.
+
+    Permissions are cached for the request, and also in the process wide
+    permission_cache if it is enabled.
+    """
+
+    def __init__(self, *participations):
+        ParanoidSecurityPolicy.__init__(self, *participations)
+        self.cache_generation = permission_cache.generation
 
     def cachingKey(self, permission, obj):
         try:
@@ -79,6 +165,12 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
             return None
         return (permission, ref)
 
+    def principalCachingKey(self, participation, key):
+        principal_id = getattr(participation.principal, 'id', None)
+        if principal_id is None or not permission_cache.enabled:
+            return None
+        return (principal_id, ) + key
+
     @classmethod
     def getCache(cls, participation):
         cache = getattr(participation, '_st_perm_cache', None)
@@ -99,9 +191,19 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
             cache = self.getCache(participation)
             if cache is not None:
                 perm = cache['perm'].get(key, None)
+                if perm is None and cache['enabled']:
+                    perm = self.checkProcessCache(participation, key)
+                    if perm is not None:
+                        self.cache(participation, permission, obj, perm)
                 result = max(result, perm)
         return result
 
+    def checkProcessCache(self, participation, key):
+        principal_key = self.principalCachingKey(participation, key)
+        if principal_key is None:
+            return None
+        return permission_cache.get(principal_key)
+
     def cache(self, participation, permission, obj, value):
         cache = self.getCache(participation)
         if cache is None or not cache['enabled']:
@@ -110,6 +212,9 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
         if key is None:
             return # uncacheable
         cache['perm'][key] = value
+        principal_key = self.principalCachingKey(participation, key)
+        if principal_key is not None:
+            permission_cache.set(principal_key, value, self.cache_generation)
 
     def checkPermission(self, permission, obj):
         """Return True if principal has permission on object."""
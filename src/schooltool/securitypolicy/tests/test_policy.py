@@ -197,6 +197,138 @@ def test_SchoolToolSecurityPolicy_checkCrowds():
     """
 
 
+def test_PermissionCache():
+    """Tests for PermissionCache.
+
+        >>> from schooltool.securitypolicy.policy import PermissionCache
+        >>> cache = PermissionCache()
+        >>> cache.enabled
+        False
+
+    A disabled cache stores nothing:
+
+        >>> cache.set('key', True, cache.generation)
+        >>> print cache.get('key')
+        None
+
+    Least recently used entries are dropped when the cache is full:
+
+        >>> cache.configure(size=2, ttl=300)
+        >>> cache.set('a', True, cache.generation)
+        >>> cache.set('b', False, cache.generation)
+        >>> cache.get('a')
+        True
+        >>> cache.set('c', True, cache.generation)
+        >>> cache.get('a'), cache.get('b'), cache.get('c')
+        (True, None, True)
+
+    Values computed before an invalidation are not cached:
+
+        >>> generation = cache.generation
+        >>> cache.invalidate()
+        >>> print cache.get('a')
+        None
+        >>> cache.set('a', False, generation)
+        >>> print cache.get('a')
+        None
+
+    Entries expire after ttl seconds:
+
+        >>> cache.configure(size=2, ttl=-1)
+        >>> cache.set('a', True, cache.generation)
+        >>> print cache.get('a')
+        None
+
+    """
+
+
+def test_CachingSecurityPolicy_permission_cache():
+    """Tests for CachingSecurityPolicy with the process wide cache.
+
+        >>> from zope.keyreference.interfaces import IKeyReference
+        >>> class KeyReferenceStub(object):
+        ...     adapts(IObj)
+        ...     implements(IKeyReference)
+        ...     def __init__(self, obj):
+        ...         self.obj = obj
+        ...     def __hash__(self):
+        ...         return id(self.obj)
+        ...     def __eq__(self, other):
+        ...         return self.obj is other.obj
+        >>> provideAdapter(KeyReferenceStub)
+
+        >>> from schooltool.securitypolicy.crowds import CrowdsUtility
+        >>> from schooltool.securitypolicy.interfaces import ICrowdsUtility
+        >>> provideUtility(CrowdsUtility(), ICrowdsUtility)
+
+        >>> members = set(['john'])
+        >>> class ObjCrowd(Crowd):
+        ...     adapts(IObj)
+        ...     def contains(self, principal):
+        ...         print 'checking', principal.id
+        ...         return principal.id in members
+        >>> provideAdapter(ObjCrowd, (IObj,), ICrowd, 'perm')
+
+        >>> class PrincipalStub(object):
+        ...     def __init__(self, id):
+        ...         self.id = id
+        >>> class ParticipationStub(object):
+        ...     interaction = None
+        ...     def __init__(self, principal_id):
+        ...         self.principal = PrincipalStub(principal_id)
+
+        >>> from schooltool.securitypolicy import policy
+        >>> def check(principal_id, obj):
+        ...     sp = policy.CachingSecurityPolicy(
+        ...         ParticipationStub(principal_id))
+        ...     return sp.checkPermission('perm', obj)
+
+        >>> obj = Obj()
+
+    By default, permissions are cached only for the request:
+
+        >>> check('john', obj)
+        checking john
+        True
+        >>> check('john', obj)
+        checking john
+        True
+
+    When the permission cache is enabled, they are cached for each
+    principal across requests:
+
+        >>> policy.permission_cache.configure(size=100, ttl=300)
+        >>> check('john', obj)
+        checking john
+        True
+        >>> check('john', obj)
+        True
+        >>> check('pete', obj)
+        checking pete
+        False
+        >>> check('pete', obj)
+        False
+
+    Relationship changes invalidate the cache, now and after the
+    transaction commits:
+
+        >>> import transaction
+        >>> members.add('pete')
+        >>> policy.invalidatePermissionCache(object())
+        >>> policy.invalidatePermissionCache(object())
+        >>> len(list(transaction.get().getAfterCommitHooks()))
+        1
+
+        >>> check('pete', obj)
+        checking pete
+        True
+
+        >>> transaction.abort()
+        >>> policy.permission_cache.configure(size=0, ttl=300)
+
+    """
+
+
 def setUp(test=None):
     setup.placelessSetUp()
 
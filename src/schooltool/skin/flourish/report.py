@@ -21,6 +21,7 @@ SchoolTool report pages.
 import cgi
 import datetime
 import re
+from cStringIO import StringIO
 
 try:
     import Image
@@ -35,7 +36,6 @@ from zope.cachedescriptors.property import Lazy
 from zope.interface import implements, Interface
 from zope.i18n import translate
 from zope.publisher.browser import BrowserView
-from z3c.rml import rml2pdf
 
 from schooltool.app import pdf
 from schooltool.app.interfaces import ISchoolToolApplication
@@ -97,9 +97,28 @@ class PDFPage(page.PageBase):
     # TODO: Should return True when devmode enabled
     render_debug = False
 
+    def writePDF(self, xml, stream, filename=None):
+        if filename is None:
+            filename = self.filename
+        pdf.renderRML(xml, stream, filename=filename or None)
+
+    def renderToStream(self, stream, *args, **kw):
+        if not pdf.isEnabled():
+            text = translate(self.pdf_disabled_text, context=self.request)
+            stream.write(text.encode('UTF-8'))
+            return True
+        self.update()
+        if self.request.response.getStatus() in [300, 301, 302, 303,
+                                                 304, 305, 307]:
+            return False
+        rml = self.render()
+        self.writePDF(rml, stream)
+        return True
+
     def renderPDF(self, xml):
         filename = self.filename
-        stream = rml2pdf.parseString(xml, filename=filename or None)
+        stream = StringIO()
+        self.writePDF(xml, stream, filename=filename)
         data = stream.getvalue()
         response = self.request.response
         response.setHeader('Content-Type', 'application/pdf')
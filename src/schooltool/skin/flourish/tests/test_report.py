@@ -19,8 +19,13 @@
 Report Tests
 """
 import unittest
+from cStringIO import StringIO
 from textwrap import dedent
 
+from zope.publisher.browser import TestRequest
+
+from schooltool.app import pdf
+from schooltool.skin.flourish.report import PDFPage
 from schooltool.skin.flourish.report import buildHTMLParagraphs
 from schooltool.testing.util import NiceDiffsMixin
 
@@ -79,5 +84,52 @@ class TestBuildHTMLParagraphs(NiceDiffsMixin, unittest.TestCase):
                          ['&lt;ul&gt;&lt;li&gt;One&lt;/li&gt;&lt;li&gt;Two&lt;/li&gt;&lt;/ul&gt;'])
 
 
+class PDFPageForTest(PDFPage):
+
+    redirect = False
+
+    def update(self):
+        if self.redirect:
+            self.request.response.redirect('http://127.0.0.1/login')
+
+    def render(self):
+        return '<rml/>'
+
+    def writePDF(self, xml, stream, filename=None):
+        stream.write('PDF of %s' % xml)
+
+
+class TestPDFPageRenderToStream(unittest.TestCase):
+
+    def setUp(self):
+        self.pdf_enabled = pdf.enabled
+        pdf.enabled = True
+
+    def tearDown(self):
+        pdf.enabled = self.pdf_enabled
+
+    def test_render(self):
+        page = PDFPageForTest(None, TestRequest())
+        stream = StringIO()
+        self.assertEqual(page.renderToStream(stream), True)
+        self.assertEqual(stream.getvalue(), 'PDF of <rml/>')
+
+    def test_pdf_disabled(self):
+        pdf.enabled = False
+        page = PDFPageForTest(None, TestRequest())
+        stream = StringIO()
+        self.assertEqual(page.renderToStream(stream), True)
+        self.assertEqual(stream.getvalue(),
+                         'PDF support is disabled.'
+                         '  It can be enabled by your administrator.')
+
+    def test_redirect(self):
+        page = PDFPageForTest(None, TestRequest())
+        page.redirect = True
+        stream = StringIO()
+        self.assertEqual(page.renderToStream(stream), False)
+        self.assertEqual(stream.getvalue(), '')
+
+
 if __name__ == '__main__':
     unittest.main()
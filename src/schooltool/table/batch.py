@@ -24,6 +24,17 @@ from zope.browserpage.viewpagetemplatefile import ViewPageTemplateFile
 from schooltool.table.interfaces import IBatch
 
 
+def asSequence(items):
+    """Return items as a sequence, without copying sequences."""
+    if hasattr(items, '__len__') and hasattr(items, '__getitem__'):
+        return items
+    return list(items)
+
+
+def sliceLength(size, start, stop):
+    return len(xrange(*slice(start, stop).indices(size)))
+
+
 class Batch(object):
     """Batching mechanism for Tables"""
     implements(IBatch)
@@ -41,8 +52,7 @@ class Batch(object):
         self.request = self.formatter.request
         self.context = self.formatter
 
-        item_list = list(self.context._items)
-        self.full_size = len(item_list)
+        self.full_size = len(asSequence(self.context._items))
         self.extra_url = self.context.extra_url()
         self.base_url = self.request.URL
 
@@ -50,7 +60,8 @@ class Batch(object):
         self.size = int(self.request.get('batch_size' + self.name, batch_size))
         if self.start >= self.full_size:
             self.start = max(0, self.full_size-self.size)
-        self.length = len(item_list[self.start:self.start + self.size])
+        self.length = sliceLength(
+            self.full_size, self.start, self.start + self.size)
 
     def render(self):
         if self.size < self.full_size or self.needsBatch:
@@ -151,13 +162,14 @@ class TokenBatch(object):
     """Another batching mechanism for Tables"""
 
     def __init__(self, items, start=0, size=0):
-        self.items = list(items)
+        self.items = asSequence(items)
         self.full_size = len(self.items)
         if start >= self.full_size:
             start = max(0, self.full_size-size)
         self.start = start
         self.size = size
-        self.length = len(self.items[self.start:self.start + self.size])
+        self.length = sliceLength(
+            self.full_size, self.start, self.start + self.size)
 
     @property
     def needsBatch(self):
@@ -18,13 +18,19 @@
 """Catalog indexing extensions for tabling."""
 
 from persistent import Persistent
+from BTrees import IFBTree
+from BTrees.IOBTree import IOBTree
+from BTrees.OOBTree import OOBTree
 
 from zope.interface import implements, implementsOnly
 from zope.cachedescriptors.property import Lazy
 from zope.component import getUtility
+from zope.i18n.interfaces.locales import ICollator
+from zope.i18n.locales import locales
 from zope.container.contained import Contained
 from zope.catalog.interfaces import ICatalogIndex
 from zope.catalog.interfaces import ICatalog
+from zope.catalog.attribute import AttributeIndex
 from zope.intid.interfaces import IIntIds
 
 from zc.catalog.index import SetIndex, ValueIndex
@@ -42,6 +48,7 @@ from schooltool.table.column import IndexedGetterColumn
 from schooltool.table.column import IndexedLocaleAwareGetterColumn
 from schooltool.table.column import makeIndexedColumn
 from schooltool.table.column import RenderUnindexingMixin, unindex
+from schooltool.table.column import IndexedItems, filterIndexedItems
 
 from schooltool.common import SchoolToolMessage as _
 
@@ -92,6 +99,198 @@ class ConvertingSetIndex(ConvertingSetIndexMixin, SetIndex, Contained):
     implements(IConvertingSetIndex)
 
 
+class ISubstringIndex(ICatalogIndex):
+    """Index of texts that finds documents containing a substring.
+
+    apply(text) returns ids of documents with values containing the
+    text, ignoring case.
+    """
+
+
+def substringIndexName(name):
+    """Name of the substring index of an attribute in a catalog."""
+    return '%s_substring' % name
+
+
+class NGramIndex(Persistent):
+    """Index of lowercase n-grams of text values.
+
+    Values are padded at the end, so that every substring shorter than
+    n is a prefix of some n-gram.
+    """
+
+    n = 3
+    padding = u'\x00'
+
+    def __init__(self, *args, **kw):
+        super(NGramIndex, self).__init__(*args, **kw)
+        self.clear()
+
+    def clear(self):
+        self.documents_to_values = IOBTree()
+        self.ngrams = OOBTree()
+
+    def documentCount(self):
+        return len(self.documents_to_values)
+
+    def splitNGrams(self, value):
+        text = value.lower() + self.padding * (self.n - 1)
+        return set([text[i:i+self.n] for i in range(len(value))])
+
+    def index_doc(self, docid, value):
+        if not value:
+            self.unindex_doc(docid)
+            return
+        value = unicode(value)
+        old_value = self.documents_to_values.get(docid)
+        if old_value == value:
+            return
+        if old_value is not None:
+            self.unindex_doc(docid)
+        self.documents_to_values[docid] = value
+        for ngram in self.splitNGrams(value):
+            docids = self.ngrams.get(ngram)
+            if docids is None:
+                docids = self.ngrams[ngram] = IFBTree.IFTreeSet()
+            docids.insert(docid)
+
+    def unindex_doc(self, docid):
+        value = self.documents_to_values.get(docid)
+        if value is None:
+            return
+        del self.documents_to_values[docid]
+        for ngram in self.splitNGrams(value):
+            docids = self.ngrams.get(ngram)
+            if docids is None:
+                continue
+            docids.remove(docid)
+            if not docids:
+                del self.ngrams[ngram]
+
+    def apply(self, query):
+        text = unicode(query).lower()
+        if not text:
+            return IFBTree.IFSet(self.documents_to_values.keys())
+        if len(text) < self.n:
+            docids = self.ngrams.values(min=text, max=text + u'\uffff')
+            return IFBTree.multiunion(list(docids))
+        ngrams = set([text[i:i+self.n]
+                      for i in range(len(text) - self.n + 1)])
+        postings = []
+        for ngram in ngrams:
+            docids = self.ngrams.get(ngram)
+            if docids is None:
+                return IFBTree.IFSet()
+            postings.append(docids)
+        postings.sort(key=len)
+        result = IFBTree.IFSet(postings[0])
+        for docids in postings[1:]:
+            result = IFBTree.intersection(result, docids)
+        if len(text) > self.n:
+            # n-grams may come from different places in the value
+            values = self.documents_to_values
+            result = IFBTree.IFSet([docid for docid in result
+                                    if text in values[docid].lower()])
+        return result
+
+
+class SubstringIndex(AttributeIndex, NGramIndex, Contained):
+    implements(ISubstringIndex)
+
+
+class ICollationIndex(ICatalogIndex):
+    """Index of collation keys of text values in several languages."""
+
+    def getLocaleIndex(locale):
+        """Return the value index of collation keys for a locale.
+
+        Returns None if keys are not indexed for the locale language.
+        """
+
+
+def collationIndexName(name):
+    """Name of the collation key index of an attribute in a catalog."""
+    return '%s_collation' % name
+
+
+_collation_languages = ()
+
+
+def setCollationLanguages(languages):
+    """Set languages (like 'lt' or 'pt-br') to index collation keys in."""
+    global _collation_languages
+    normalized = []
+    for language in languages:
+        parts = language.replace('-', '_').split('_')
+        parts[0] = parts[0].lower()
+        if len(parts) > 1:
+            parts[1] = parts[1].upper()
+        normalized.append('_'.join(parts[:2]))
+    _collation_languages = tuple(normalized)
+
+
+def getCollationLanguages():
+    return _collation_languages
+
+
+class CollationKeys(Persistent):
+    """Value indexes of collation keys, one per language."""
+
+    def __init__(self, languages=(), *args, **kw):
+        super(CollationKeys, self).__init__(*args, **kw)
+        self.languages = tuple(languages)
+        self.clear()
+
+    def clear(self):
+        self.collations = OOBTree()
+        for language in self.languages:
+            self.collations[language] = ValueIndex()
+
+    def documentCount(self):
+        counts = [index.documentCount() for index in self.collations.values()]
+        return max(counts or [0])
+
+    def getCollator(self, language):
+        collators = getattr(self, '_v_collators', None)
+        if collators is None:
+            collators = self._v_collators = {}
+        if language not in collators:
+            parts = language.split('_')
+            territory = len(parts) > 1 and parts[1] or None
+            collators[language] = ICollator(
+                locales.getLocale(parts[0], territory))
+        return collators[language]
+
+    def getLocaleIndex(self, locale):
+        language = locale.id.language
+        if locale.id.territory:
+            index = self.collations.get(
+                '%s_%s' % (language, locale.id.territory))
+            if index is not None:
+                return index
+        return self.collations.get(language)
+
+    def index_doc(self, docid, value):
+        for language, index in self.collations.items():
+            if value:
+                index.index_doc(docid, self.getCollator(language).key(value))
+            else:
+                index.unindex_doc(docid)
+
+    def unindex_doc(self, docid):
+        for index in self.collations.values():
+            index.unindex_doc(docid)
+
+    def apply(self, query):
+        """Apply a (language, value index query) pair."""
+        language, query = query
+        return self.collations[language].apply(query)
+
+
+class CollationIndex(AttributeIndex, CollationKeys, Contained):
+    implements(ICollationIndex)
+
+
 class IndexedFilterWidget(FilterWidget):
 
     search_index = 'title'
@@ -102,8 +301,12 @@ class IndexedFilterWidget(FilterWidget):
 
     def filter(self, items):
         index = self.catalog[self.search_index]
+        substrings = self.catalog.get(substringIndexName(self.search_index))
         if 'SEARCH' in self.request and 'CLEAR_SEARCH' not in self.request:
             searchstr = self.request['SEARCH'].lower()
+            if substrings is not None:
+                docids = substrings.apply(searchstr)
+                return filterIndexedItems(items, docids)
             results = []
             for item in items:
                 title = index.documents_to_values[item['id']]
@@ -131,23 +334,22 @@ class IndexedTableFormatter(SchoolToolTableFormatter):
         return ICatalog(self.source)
 
     def items(self):
-        """Return a list of index dicts for all the items in the context container"""
+        """Return index dicts for all the items in the context container"""
         catalog = self.catalog
         if IExtentCatalog.providedBy(catalog):
-            ids = list(catalog.extent)
+            ids = IFBTree.IFSet(catalog.extent)
         else:
             index = catalog.values()[0]
-            ids = index.documents_to_values.keys()
-
-        items = [{'id': id, 'catalog': catalog}
-                 for id in ids]
-        return items
+            ids = IFBTree.IFSet(index.documents_to_values.keys())
+        return IndexedItems(catalog, ids)
 
     def ommit(self, items, ommited_items):
         if not ommited_items:
             return items
         ommited_items = self.indexItems(ommited_items)
         ommited_ids = set([item['id'] for item in ommited_items])
+        if isinstance(items, IndexedItems):
+            return items.difference(ommited_ids)
         return [item for item in items
                 if item['id'] not in ommited_ids]
 
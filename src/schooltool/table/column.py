@@ -19,6 +19,7 @@
 More columns for tables.
 """
 import datetime
+from BTrees import IFBTree
 
 from zope.app.dependable.interfaces import IDependable
 from zope.interface import implementer, implements, classImplements
@@ -291,16 +292,179 @@ class MultiStateColumn(zc.table.column.Column):
         return cell
 
 
+def asDocidSet(docids):
+    """Convert a collection of document ids to an IFSet."""
+    if isinstance(docids, (IFBTree.IFSet, IFBTree.IFTreeSet)):
+        return docids
+    return IFBTree.IFSet([docid for docid in docids if docid is not None])
+
+
+class IndexedItems(object):
+    """A lazy sequence of index dicts of documents in a catalog.
+
+    Index dicts are built only for the items accessed, so that large
+    catalogs can be filtered, sorted and batched without building
+    a dict for every document.
+    """
+
+    def __init__(self, catalog, docids):
+        self.catalog = catalog
+        self.docids = docids
+
+    def __len__(self):
+        return len(self.docids)
+
+    def __iter__(self):
+        catalog = self.catalog
+        for docid in self.docids:
+            yield {'id': docid, 'catalog': catalog}
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            docids = [self.docids[n]
+                      for n in xrange(*key.indices(len(self.docids)))]
+            return IndexedItems(self.catalog, docids)
+        return {'id': self.docids[key], 'catalog': self.catalog}
+
+    def intersection(self, docids):
+        """Return items of documents in docids, keeping the order."""
+        if isinstance(self.docids, (IFBTree.IFSet, IFBTree.IFTreeSet)):
+            result = IFBTree.intersection(self.docids, asDocidSet(docids))
+        else:
+            result = [docid for docid in self.docids if docid in docids]
+        return IndexedItems(self.catalog, result)
+
+    def difference(self, docids):
+        """Return items of documents not in docids, keeping the order."""
+        if isinstance(self.docids, (IFBTree.IFSet, IFBTree.IFTreeSet)):
+            result = IFBTree.difference(self.docids, asDocidSet(docids))
+        else:
+            result = [docid for docid in self.docids if docid not in docids]
+        return IndexedItems(self.catalog, result)
+
+
+def filterIndexedItems(items, docids):
+    """Select index dicts of documents in docids."""
+    if isinstance(items, IndexedItems):
+        return items.intersection(docids)
+    return [item for item in items if item['id'] in docids]
+
+
+class IndexOrder(object):
+    """Document ids ordered by their values in a value index.
+
+    Walks values_to_documents of the index only as far as the items
+    accessed, documents with no value come last.  Documents that share
+    a value are ordered by subsort, if given.
+    """
+
+    def __init__(self, index, docids, reverse=False, subsort=None):
+        self.index = index
+        self.docids = docids
+        self.reverse = reverse
+        self.subsort = subsort
+        self._ordered = []
+        self._iterator = None
+
+    def __len__(self):
+        return len(self.docids)
+
+    def _iterOrder(self):
+        docids = self.docids
+        values_to_documents = self.index.values_to_documents
+        values = values_to_documents.keys()
+        if self.reverse:
+            values = reversed(values)
+        found = 0
+        for value in values:
+            group = [docid for docid in values_to_documents[value]
+                     if docid in docids]
+            if not group:
+                continue
+            if len(group) > 1 and self.subsort is not None:
+                group = self.subsort(group)
+            for docid in group:
+                yield docid
+            found += len(group)
+            if found == len(docids):
+                return
+        documents_to_values = self.index.documents_to_values
+        for docid in docids:
+            if docid not in documents_to_values:
+                yield docid
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        if self._iterator is None:
+            self._iterator = self._iterOrder()
+        while len(self._ordered) <= n:
+            try:
+                self._ordered.append(next(self._iterator))
+            except StopIteration:
+                raise IndexError(n)
+        return self._ordered[n]
+
+    def __iter__(self):
+        n = 0
+        while True:
+            try:
+                yield self[n]
+            except IndexError:
+                return
+            n += 1
+
+
 class IndexedGetterColumn(zc.table.column.GetterColumn):
     implements(IIndexedColumn, zc.table.interfaces.ISortableColumn)
 
+    # Sort small subsets of the catalog by sort keys rather than
+    # walking the whole index.
+    index_order_ratio = 10
+
     def __init__(self, **kwargs):
         self.index = kwargs.pop('index')
         super(IndexedGetterColumn, self).__init__(**kwargs)
 
+    def getSortIndex(self, catalog, formatter):
+        """Return the value index of sort keys of this column, or None."""
+        getSortKey = getattr(self.getSortKey, 'im_func', None)
+        if getSortKey is not IndexedGetterColumn.getSortKey.im_func:
+            return None
+        return catalog[self.index]
+
+    def getOrderingIndex(self, items, formatter):
+        """Return the index to order items by, or None.
+
+        The index is only used if the items are a big enough part
+        of the catalog.
+        """
+        if not isinstance(items, IndexedItems):
+            return None
+        index = self.getSortIndex(items.catalog, formatter)
+        if getattr(index, 'values_to_documents', None) is None:
+            return None
+        total = len(index.documents_to_values)
+        if len(items) * self.index_order_ratio < total:
+            return None
+        return index
+
     def _sort(self, items, formatter, start, stop, sorters, multiplier):
+        index = self.getOrderingIndex(items, formatter)
+        if index is not None:
+            subsort = None
+            if self.subsort and sorters:
+                def subsort(docids):
+                    group = sorters[0](IndexedItems(items.catalog, docids),
+                                       formatter, 0, None, sorters[1:])
+                    return [item['id'] for item in group]
+            docids = IndexOrder(index, asDocidSet(items.docids),
+                                reverse=multiplier < 0, subsort=subsort)
+            return IndexedItems(items.catalog, docids)
+
         if self.subsort and sorters:
             items = sorters[0](items, formatter, start, stop, sorters[1:])
+            items = list(items)
         else:
             items = list(items) # don't mutate original
         getSortKey = self.getSortKey
@@ -333,6 +497,17 @@ class IndexedLocaleAwareGetterColumn(IndexedGetterColumn):
         s = super(IndexedLocaleAwareGetterColumn, self).getSortKey(item, formatter)
         return s and self._cached_collator.key(s)
 
+    def getSortIndex(self, catalog, formatter):
+        """Return the index of collation keys in request locale, or None."""
+        from schooltool.table.catalog import collationIndexName
+        getSortKey = getattr(self.getSortKey, 'im_func', None)
+        if getSortKey is not IndexedLocaleAwareGetterColumn.getSortKey.im_func:
+            return None
+        collations = catalog.get(collationIndexName(self.index))
+        if collations is None:
+            return None
+        return collations.getLocaleIndex(formatter.request.locale)
+
 
 def makeIndexedColumn(mixins, column, *args, **kw):
     class_ = column.__class__
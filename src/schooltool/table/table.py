@@ -39,7 +39,7 @@ from schooltool.app.interfaces import IApplicationPreferences
 from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.common import stupid_form_key
 from schooltool.skin import flourish
-from schooltool.table.batch import Batch
+from schooltool.table.batch import Batch, asSequence
 from schooltool.table.interfaces import IFilterWidget
 from schooltool.table.interfaces import ITableFormatter
 
@@ -398,7 +398,7 @@ class SchoolToolTableFormatter(object):
         self._items = filter(self.ommit(items, ommit))
 
         if batch_size == 0:
-            batch_size = len(list(self._items))
+            batch_size = len(asSequence(self._items))
 
         self.batch_size = batch_size
         self._sort_on = sort_on or self.sortOn() or ()
@@ -116,6 +116,133 @@ def doctest_IndexedFilterWidget():
     """
 
 
+def doctest_SubstringIndex():
+    """Tests for SubstringIndex.
+
+        >>> from zope.interface.verify import verifyObject
+        >>> from schooltool.table.catalog import SubstringIndex, ISubstringIndex
+
+        >>> index = SubstringIndex('title')
+        >>> verifyObject(ISubstringIndex, index)
+        True
+
+        >>> class Titled(object):
+        ...     def __init__(self, title):
+        ...         self.title = title
+
+        >>> for docid, title in enumerate([u'Lambda', u'Alpha', u'Beta',
+        ...                                u'Alphabet', u'Ab']):
+        ...     index.index_doc(docid, Titled(title))
+
+    Index finds documents containing the text, ignoring case.
+
+        >>> def search(text):
+        ...     return [index.documents_to_values[docid]
+        ...             for docid in index.apply(text)]
+
+        >>> search(u'ALPHA')
+        [u'Alpha', u'Alphabet']
+        >>> search(u'bet')
+        [u'Beta', u'Alphabet']
+        >>> search(u'alphabeta')
+        []
+
+    Texts shorter than n-grams are found anywhere in values too.
+
+        >>> search(u'b')
+        [u'Lambda', u'Beta', u'Alphabet', u'Ab']
+        >>> search(u'ta')
+        [u'Beta']
+        >>> search(u'ab')
+        [u'Alphabet', u'Ab']
+
+    Longer texts match only where all their n-grams are in sequence.
+
+        >>> search(u'lphab')
+        [u'Alphabet']
+        >>> search(u'lambeta')
+        []
+
+    Empty search matches everything.
+
+        >>> len(index.apply(u''))
+        5
+
+    Reindexing replaces old n-grams.
+
+        >>> index.index_doc(2, Titled(u'Gamma'))
+        >>> search(u'bet')
+        [u'Alphabet']
+        >>> search(u'mma')
+        [u'Gamma']
+
+        >>> index.index_doc(2, Titled(None))
+        >>> search(u'mma')
+        []
+        >>> index.documentCount()
+        4
+
+        >>> index.unindex_doc(3)
+        >>> search(u'alpha')
+        [u'Alpha']
+        >>> sorted(index.ngrams.keys())[:5]
+        [u'a\\x00\\x00', u'ab\\x00', u'alp', u'amb', u'b\\x00\\x00']
+
+        >>> index.clear()
+        >>> search(u'a')
+        []
+
+    """
+
+
+def doctest_IndexedFilterWidget_substring_index():
+    """Tests for IndexedFilterWidget with a substring index.
+
+    If the catalog has a substring index for the searched attribute,
+    the filter uses it instead of looking at every value.
+
+        >>> from zope.catalog.interfaces import ICatalog
+        >>> from zope.interface import implements
+        >>> from schooltool.table.catalog import SubstringIndex
+
+        >>> class CatalogStub(dict):
+        ...     implements(ICatalog)
+
+        >>> catalog = CatalogStub()
+        >>> catalog['title'] = None
+        >>> catalog['title_substring'] = SubstringIndex('title')
+        >>> class Titled(object):
+        ...     def __init__(self, title):
+        ...         self.title = title
+        >>> for docid, title in [(5, u'Lambda'), (6, u'Alpha'), (7, u'Beta')]:
+        ...     catalog['title_substring'].index_doc(docid, Titled(title))
+
+        >>> class ContainerStub(object):
+        ...     def __conform__(self, iface):
+        ...         if iface == ICatalog:
+        ...             return catalog
+
+        >>> from zope.publisher.browser import TestRequest
+        >>> from schooltool.table.catalog import IndexedFilterWidget
+        >>> request = TestRequest()
+        >>> widget = IndexedFilterWidget(ContainerStub(), request)
+
+        >>> items = [{'id': 5}, {'id': 6}, {'id': 7}]
+        >>> request.form = {'SEARCH': 'AMB'}
+        >>> widget.filter(items)
+        [{'id': 5}]
+
+        >>> request.form = {'SEARCH': 'a'}
+        >>> widget.filter(items)
+        [{'id': 5}, {'id': 6}, {'id': 7}]
+
+        >>> request.form = {'SEARCH': 'lph'}
+        >>> widget.filter(items[:1])
+        []
+
+    """
+
+
 def doctest_IndexedGetterColumn():
     """Tests for IndexedGetterColumn.
 
@@ -215,6 +342,90 @@ def doctest_IndexedLocaleAwareGetterColumn():
     """
 
 
+def doctest_CollationIndex():
+    """Tests for CollationIndex.
+
+    Register a collation adapter that ignores case:
+
+        >>> from zope.i18n.interfaces.locales import ICollator
+        >>> from zope.i18n.interfaces.locales import ILocale
+        >>> from zope.interface import implements
+        >>> from zope.component import adapts
+        >>> class CollatorStub(object):
+        ...     implements(ICollator)
+        ...     adapts(ILocale)
+        ...     def __init__(self, context):
+        ...         self.language = context.id.language
+        ...     def key(self, string):
+        ...         return '%s:%s' % (self.language, string.lower())
+        >>> provideAdapter(CollatorStub)
+
+    Collation index stores collation keys of attribute values in each
+    of the given languages:
+
+        >>> from schooltool.table.catalog import CollationIndex
+        >>> index = CollationIndex('title', languages=['en', 'pt_BR'])
+        >>> list(index.collations.keys())
+        ['en', 'pt_BR']
+
+        >>> class Titled(object):
+        ...     def __init__(self, title):
+        ...         self.title = title
+        >>> names = ['peter', 'Ann', 'john', None, 'Zed']
+        >>> for docid, name in enumerate(names):
+        ...     index.index_doc(docid, Titled(name))
+
+        >>> sorted(index.collations['en'].documents_to_values.items())
+        [(0, u'en:peter'), (1, u'en:ann'), (2, u'en:john'), (4, u'en:zed')]
+        >>> index.documentCount()
+        4
+
+        >>> index.unindex_doc(2)
+        >>> index.apply(('pt_BR', {'any_of': ['pt:ann', 'pt:john']}))
+        IFSet([1])
+        >>> index.index_doc(2, Titled('john'))
+
+    Locale index is looked up by language and territory:
+
+        >>> from zope.i18n.locales import locales
+        >>> index.getLocaleIndex(locales.getLocale('en', 'US'))
+        <zc.catalog.index.ValueIndex object at ...>
+        >>> index.getLocaleIndex(locales.getLocale('pt', 'BR'))
+        <zc.catalog.index.ValueIndex object at ...>
+        >>> print index.getLocaleIndex(locales.getLocale('pt', 'PT'))
+        None
+
+    Locale aware columns sort in the order of the index when there
+    is one for the request locale:
+
+        >>> from zope.publisher.browser import TestRequest
+        >>> from schooltool.table.column import IndexedItems
+        >>> from schooltool.table.column import IndexedLocaleAwareGetterColumn
+        >>> class FormatterStub(object):
+        ...     request = TestRequest(environ={'HTTP_ACCEPT_LANGUAGE': 'en'})
+        >>> formatter = FormatterStub()
+
+        >>> catalog = {'title_collation': index}
+        >>> column = IndexedLocaleAwareGetterColumn(
+        ...     index='title', getter=lambda i, f: i.title)
+        >>> items = IndexedItems(catalog, range(5))
+        >>> column.getOrderingIndex(items, formatter) is index.collations['en']
+        True
+
+        >>> result = column._sort(items, formatter, None, None, (), 1)
+        >>> [names[item['id']] for item in result]
+        ['Ann', 'john', 'peter', 'Zed', None]
+
+    Catalogs without collation indexes are sorted by collation keys
+    computed on the fly:
+
+        >>> items = IndexedItems({}, range(5))
+        >>> print column.getOrderingIndex(items, formatter)
+        None
+
+    """
+
+
 def doctest_IndexedTableFormatter_columns():
     """Tests for IndexedTableFormatter.columns.
 
@@ -278,11 +489,11 @@ def doctest_IndexedTableFormatter_items():
         >>> catalog = []
         >>> catalog = ExtentCatalogStub([])
         >>> formatter = IndexedTableFormatter(ContainerStub(catalog), None)
-        >>> formatter.items()
+        >>> list(formatter.items())
         []
 
         >>> catalog.extent[:] = [1, 2, 3]
-        >>> formatter.items()
+        >>> list(formatter.items())
         [{'catalog': <ExtentCatalog>,
           'id': 1},
          {'catalog': <ExtentCatalog>,
@@ -296,7 +507,7 @@ def doctest_IndexedTableFormatter_items():
         >>> index = IndexStub()
         >>> formatter = IndexedTableFormatter(
         ...     ContainerStub(CatalogStub(index)), None)
-        >>> formatter.items()
+        >>> list(formatter.items())
         []
 
     Let's index some objects:
@@ -307,7 +518,7 @@ def doctest_IndexedTableFormatter_items():
 
     Now we should get a list of index dicts:
 
-        >>> pprint(formatter.items())
+        >>> pprint(list(formatter.items()))
         [{'catalog': <Catalog>,
           'id': 1},
          {'catalog': <Catalog>,
@@ -315,6 +526,116 @@ def doctest_IndexedTableFormatter_items():
          {'catalog': <Catalog>,
           'id': 3}]
 
+    The dicts are built lazily, only for the items that are accessed:
+
+        >>> items = formatter.items()
+        >>> len(items)
+        3
+        >>> items[1]
+        {'catalog': <Catalog>, 'id': 2}
+        >>> list(items[1:])
+        [{'catalog': <Catalog>, 'id': 2}, {'catalog': <Catalog>, 'id': 3}]
+
+    Filtering and ommiting items are set operations on document ids:
+
+        >>> from schooltool.table.column import filterIndexedItems
+        >>> list(filterIndexedItems(items, set([1, 3, 4])).docids)
+        [1, 3]
+        >>> list(items.difference([2]).docids)
+        [1, 3]
+
+    """
+
+
+def doctest_IndexedGetterColumn_sort_by_index():
+    """Tests for IndexedGetterColumn sorting in index order.
+
+        >>> from zc.catalog.index import ValueIndex
+        >>> from schooltool.table.column import IndexedGetterColumn
+        >>> from schooltool.table.column import IndexedItems
+
+        >>> index = ValueIndex()
+        >>> names = ['Peter', 'John', 'Ann', 'John', 'Zed', 'Ann']
+        >>> for docid, name in enumerate(names):
+        ...     index.index_doc(docid, name)
+        >>> catalog = {'title': index}
+
+        >>> def print_items(items):
+        ...     print [(item['id'], names[item['id']])
+        ...            for item in items]
+
+        >>> column = IndexedGetterColumn(
+        ...     index='title', getter=lambda i, f: i.title)
+
+    When sorting the whole catalog, documents are listed in the order
+    of values in the index.  Documents that share a value stay in the
+    order of their ids:
+
+        >>> items = IndexedItems(catalog, range(6))
+        >>> result = column._sort(items, None, None, None, (), 1)
+        >>> print_items(result)
+        [(2, 'Ann'), (5, 'Ann'), (1, 'John'), (3, 'John'),
+         (0, 'Peter'), (4, 'Zed')]
+
+        >>> result = column._sort(items, None, None, None, (), -1)
+        >>> print_items(result)
+        [(4, 'Zed'), (0, 'Peter'), (1, 'John'), (3, 'John'),
+         (2, 'Ann'), (5, 'Ann')]
+
+    The result is lazy, the index is walked only as far as the items
+    accessed:
+
+        >>> result = column._sort(items, None, None, None, (), 1)
+        >>> print_items(result[:3])
+        [(2, 'Ann'), (5, 'Ann'), (1, 'John')]
+        >>> result.docids._ordered
+        [2, 5, 1]
+
+    Secondary sorters order documents that share a value:
+
+        >>> def by_id_desc(items, formatter, start, stop, sorters):
+        ...     return sorted(items, key=lambda i: -i['id'])
+        >>> column.subsort = True
+        >>> result = column._sort(items, None, None, None, [by_id_desc], 1)
+        >>> print_items(result)
+        [(5, 'Ann'), (2, 'Ann'), (3, 'John'), (1, 'John'),
+         (0, 'Peter'), (4, 'Zed')]
+        >>> column.subsort = False
+
+    Documents without a value come last:
+
+        >>> items = IndexedItems(catalog, range(8))
+        >>> result = column._sort(items, None, None, None, (), 1)
+        >>> [item['id'] for item in result]
+        [2, 5, 1, 3, 0, 4, 6, 7]
+
+    Small subsets of the catalog are sorted by sort keys instead:
+
+        >>> column.index_order_ratio = 4
+        >>> items = IndexedItems(catalog, [0, 1])
+        >>> column.getOrderingIndex(items, None) is None
+        False
+        >>> items = IndexedItems(catalog, [0])
+        >>> column.getOrderingIndex(items, None) is None
+        True
+
+        >>> column.index_order_ratio = 1
+        >>> result = column._sort(IndexedItems(catalog, [4, 0, 2]),
+        ...                       None, None, None, (), 1)
+        >>> result
+        [{'catalog': ..., 'id': 2}, {'catalog': ..., 'id': 0},
+         {'catalog': ..., 'id': 4}]
+
+    Columns with custom sort keys are never sorted in index order:
+
+        >>> class UpperColumn(IndexedGetterColumn):
+        ...     def getSortKey(self, item, formatter):
+        ...         return names[item['id']].upper()
+        >>> column = UpperColumn(index='title', getter=lambda i, f: i.title)
+        >>> items = IndexedItems(catalog, range(6))
+        >>> column.getOrderingIndex(items, None) is None
+        True
+
     """
 
 
@@ -106,6 +106,13 @@ class TaskWriteState(TaskReadState):
         result.backend.store_result(result.task_id, progress, IN_PROGRESS)
         self.reload()
 
+    def resume_progress(self):
+        result = celery.task.Task.AsyncResult(self.task_id)
+        if result.state != COMMITTING:
+            raise NotInProgress(result.state, (COMMITTING, ))
+        result.backend.store_result(result.task_id, self.info, IN_PROGRESS)
+        self.reload()
+
     def set_committing(self):
         result = celery.task.Task.AsyncResult(self.task_id)
         # XXX: only check this if task.track_started
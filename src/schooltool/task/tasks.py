@@ -22,6 +22,7 @@ import datetime
 import pkg_resources
 import pytz
 
+import celery.exceptions
 import celery.task
 import celery.result
 import celery.utils
@@ -140,6 +141,8 @@ class DBTaskMixin(object):
         return tasks.get(self.request.id)
 
     def beginTransaction(self):
+        if self.db_connection is not None:
+            self.closeTransaction()
         db = open_schooltool_db()
         if db is None:
             raise NoDatabaseException()
@@ -205,16 +208,26 @@ class DBTaskMixin(object):
         self.commitTransaction()
         return result
 
+    def awaitSubtasks(self, result):
+        """Wait for tasks scheduled by execute before completing.
+
+        Runs between the execute and complete transactions.  Raise
+        self.retry() to run the task again later instead of completing it.
+        """
+
     def __call__(self, *args, **kwargs):
         result = None
         try:
             result = self.runTransaction('execute', True, self, *args, **kwargs)
+            self.awaitSubtasks(result)
             self.runTransaction('complete', False, self, result)
         except (NoDatabaseException, TPCNotReady), exc:
             n_retry = getattr(self.request, 'retries', 0)
             countdown = TPC_RETRY_SECONDS[min(n_retry, len(TPC_RETRY_SECONDS)-1)]
             raise self.retry(exc=exc, countdown=countdown,
                              max_retries=self.max_tpc_retries)
+        except celery.exceptions.Retry:
+            raise
         except Exception:
             failure = FormattedTraceback()
             try:
@@ -48,6 +48,12 @@ class ITerm(IDateRange, IContained):
         Raises a ValueError if the date is outside of the term covered.
         """
 
+    def countSchooldays(first, last):
+        """Return the number of schooldays from first to last, inclusive.
+
+        Dates outside of the term are not counted.
+        """
+
 
 class ITermWrite(Interface):
     """A term is a set of school days inside a given date range.
@@ -18,6 +18,7 @@
 """
 Term implementation
 """
+import bisect
 import persistent
 import pytz
 from datetime import datetime
@@ -25,6 +26,7 @@ from datetime import datetime
 import zope.interface
 from zope.event import notify
 from zope.proxy import sameProxiedObjects
+from zope.security.proxy import removeSecurityProxy
 from zope.component import adapts
 from zope.component import adapter
 from zope.component import getUtility
@@ -72,6 +74,30 @@ class EmergencyDayEvent(object):
         self.replacement_date = replacement_date
 
 
+def iterSchooldayOffsets(bitmap):
+    """Iterate over the day offsets set in a schoolday bitmap."""
+    for n, byte in enumerate(bytearray(bitmap)):
+        if not byte:
+            continue
+        for bit in range(8):
+            if byte & (1 << bit):
+                yield n * 8 + bit
+
+
+def encodeSchooldays(first, last, offsets):
+    """Build a schoolday bitmap of days from `first` to `last`.
+
+    Bit n is set when the day `first` + n is a schoolday.  Offsets outside
+    the range are dropped.
+    """
+    days = last.toordinal() - first.toordinal() + 1
+    bitmap = bytearray((days + 7) // 8)
+    for offset in offsets:
+        if 0 <= offset < days:
+            bitmap[offset >> 3] |= 1 << (offset & 7)
+    return str(bitmap)
+
+
 class Term(DateRange, contained.Contained, persistent.Persistent):
     zope.interface.implements(interfaces.ITerm, interfaces.ITermWrite)
 
@@ -79,10 +105,10 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
         self.title = title
         self._first = first
         self._last = last
-        self._schooldays = set()
         if last < first:
             raise ValueError("Last date %r less than first date %r" %
                              (last, first))
+        self._schooldays = encodeSchooldays(first, last, ())
 
     @property
     def first(self):
@@ -98,6 +124,7 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
                              (self._last, new_first_date))
 
         notify(TermBeforeChangeEvent(self, old_dates, new_dates))
+        self._rebaseSchooldays(new_first_date, self._last)
         self._first = new_first_date
         notify(TermAfterChangeEvent(self, old_dates, new_dates))
 
@@ -115,6 +142,7 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
                              (new_last_date, self._first))
 
         notify(TermBeforeChangeEvent(self, old_dates, new_dates))
+        self._rebaseSchooldays(self._first, new_last_date)
         self._last = new_last_date
         notify(TermAfterChangeEvent(self, old_dates, new_dates))
 
@@ -123,39 +151,75 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
             raise ValueError("Date %r not in term [%r, %r]" %
                              (date, self.first, self.last))
 
+    def _offset(self, date):
+        return date.toordinal() - self._first.toordinal()
+
+    def _setSchooldays(self, bitmap):
+        self._schooldays = str(bitmap)
+        self._v_schoolday_ordinals = None
+
+    def _rebaseSchooldays(self, first, last):
+        shift = self._first.toordinal() - first.toordinal()
+        offsets = [offset + shift
+                   for offset in iterSchooldayOffsets(self._schooldays)]
+        self._setSchooldays(encodeSchooldays(first, last, offsets))
+
     def isSchoolday(self, date):
         self._validate(date)
-        if date in self._schooldays:
-            return True
-        return False
+        offset = self._offset(date)
+        return bool(ord(self._schooldays[offset >> 3]) & (1 << (offset & 7)))
+
+    def _getSchooldayOrdinals(self):
+        # Volatile, so ZODB drops it whenever the term is changed elsewhere.
+        ordinals = getattr(self, '_v_schoolday_ordinals', None)
+        if ordinals is None:
+            first = self._first.toordinal()
+            ordinals = [first + offset
+                        for offset in iterSchooldayOffsets(self._schooldays)]
+            self._v_schoolday_ordinals = ordinals
+        return ordinals
+
+    def countSchooldays(self, first, last):
+        first = max(first, self.first)
+        last = min(last, self.last)
+        if last < first:
+            return 0
+        ordinals = self._getSchooldayOrdinals()
+        return (bisect.bisect_right(ordinals, last.toordinal()) -
+                bisect.bisect_left(ordinals, first.toordinal()))
 
     def add(self, date):
         self._validate(date)
-        self._schooldays.add(date)
-        self._schooldays = self._schooldays  # persistence
+        offset = self._offset(date)
+        bitmap = bytearray(self._schooldays)
+        bitmap[offset >> 3] |= 1 << (offset & 7)
+        self._setSchooldays(bitmap)
 
     def remove(self, date):
-        self._validate(date)
-        self._schooldays.remove(date)
-        self._schooldays = self._schooldays  # persistence
+        if not self.isSchoolday(date):
+            raise KeyError(date)
+        offset = self._offset(date)
+        bitmap = bytearray(self._schooldays)
+        bitmap[offset >> 3] &= ~(1 << (offset & 7))
+        self._setSchooldays(bitmap)
+
+    def _updateWeekdays(self, weekdays, update):
+        # Rewrite the whole bitmap once instead of once per date.
+        bitmap = bytearray(self._schooldays)
+        for offset, date in enumerate(self):
+            if date.weekday() in weekdays:
+                bit = 1 << (offset & 7)
+                bitmap[offset >> 3] = update(bitmap[offset >> 3], bit)
+        self._setSchooldays(bitmap)
 
     def addWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays:
-                self.add(date)
+        self._updateWeekdays(weekdays, lambda byte, bit: byte | bit)
 
     def removeWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays and self.isSchoolday(date):
-                self.remove(date)
+        self._updateWeekdays(weekdays, lambda byte, bit: byte & ~bit)
 
     def toggleWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays:
-                if self.isSchoolday(date):
-                    self.remove(date)
-                else:
-                    self.add(date)
+        self._updateWeekdays(weekdays, lambda byte, bit: byte ^ bit)
 
     def reset(self, first, last):
         if last < first:
@@ -164,7 +228,7 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
                              (last, first))
         self.first = first
         self.last = last
-        self._schooldays.clear()
+        self._setSchooldays(encodeSchooldays(first, last, ()))
 
 
 class TermContainer(btree.BTreeContainer):
@@ -176,12 +240,10 @@ def getTermForDate(date):
 
     Returns None if `date` falls outside all terms.
     """
-    terms = interfaces.ITermContainer(date, {})
-    for term in terms.values():
-        if date in term:
-            return term
-    else:
+    terms = interfaces.ITermContainer(date, None)
+    if terms is None:
         return None
+    return terms.getItemForDate(date)
 
 
 def getNextTermForDate(date):
@@ -193,26 +255,18 @@ def getNextTermForDate(date):
 
     Returns None if there are no terms.
     """
-    terms = interfaces.ITermContainer(date, {})
-    before, after = [], []
-    for term in terms.values():
-        if date in term:
-            return term
-        if date > term.last:
-            before.append((term.last, term))
-        if date < term.first:
-            after.append((term.first, term))
-    if after:
-        return min(after)[1]
-    if before:
-        return max(before)[1]
-    return None
+    terms = interfaces.ITermContainer(date, None)
+    if terms is None:
+        return None
+    return terms.getNearestItemForDate(date, later=True)
 
 
 def listTerms(context):
     """List terms of a schoolyear in a chronological order."""
-    terms = interfaces.ITermContainer(context, {})
-    return sorted(terms.values(), key=lambda t: t.first)
+    terms = interfaces.ITermContainer(context, None)
+    if terms is None:
+        return []
+    return terms.sortedValues()
 
 
 def getPreviousTerm(term):
@@ -326,6 +380,17 @@ class TermOverlapValidationSubscriber(EventAdapterSubscriber):
             validateTermsForOverlap(sy, dr, self.event.term)
 
 
+class TermDatesReindexSubscriber(EventAdapterSubscriber):
+    adapts(TermAfterChangeEvent)
+    implements(ISubscriber)
+
+    def __call__(self):
+        term = self.event.term
+        sy = removeSecurityProxy(term.__parent__)
+        if sy is not None:
+            sy.reindexDates(term.__name__)
+
+
 class TermOverflowValidationSubscriber(EventAdapterSubscriber):
     adapts(TermBeforeChangeEvent)
     implements(ISubscriber)
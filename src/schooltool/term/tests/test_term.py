@@ -24,7 +24,7 @@ import doctest
 from pytz import timezone
 from datetime import date, datetime
 
-from zope.component import provideAdapter
+from zope.component import provideAdapter, provideHandler
 from zope.interface import Interface
 from zope.interface import implements
 from zope.interface.verify import verifyObject
@@ -36,6 +36,7 @@ from zope.app.testing.setup import placelessSetUp, placelessTearDown
 from schooltool.schoolyear.interfaces import ISchoolYearContainer
 from schooltool.schoolyear.schoolyear import SchoolYear
 from schooltool.schoolyear.schoolyear import getSchoolYearContainer
+from schooltool.schoolyear.subscriber import subscriberAdapterDispatcher
 from schooltool.term.term import getTermContainer
 from schooltool.term.interfaces import ITermContainer
 from schooltool.term import interfaces, term
@@ -141,6 +142,52 @@ class TestTerm(unittest.TestCase):
             self.assert_(not cal.isSchoolday(date(2003, 9, day+1)))
             self.assert_(cal.isSchoolday(date(2003, 9, day+2)))
 
+    def test_countSchooldays(self):
+        cal = term.Term('Sample', date(2003, 9, 1), date(2003, 9, 17))
+        self.assertEqual(cal.countSchooldays(cal.first, cal.last), 0)
+
+        cal.addWeekdays(calendar.MONDAY, calendar.TUESDAY)
+        self.assertEqual(cal.countSchooldays(cal.first, cal.last), 6)
+        self.assertEqual(
+            cal.countSchooldays(date(2003, 9, 2), date(2003, 9, 8)), 2)
+        self.assertEqual(
+            cal.countSchooldays(date(2003, 9, 3), date(2003, 9, 7)), 0)
+        self.assertEqual(
+            cal.countSchooldays(date(2003, 9, 9), date(2003, 9, 2)), 0)
+
+        # Dates outside the term are not counted
+        self.assertEqual(
+            cal.countSchooldays(date(2003, 8, 1), date(2003, 10, 1)), 6)
+
+        # The count follows schoolday changes
+        cal.remove(date(2003, 9, 8))
+        self.assertEqual(cal.countSchooldays(cal.first, cal.last), 5)
+        cal.add(date(2003, 9, 10))
+        self.assertEqual(cal.countSchooldays(cal.first, cal.last), 6)
+        cal.reset(cal.first, cal.last)
+        self.assertEqual(cal.countSchooldays(cal.first, cal.last), 0)
+
+    def test_schooldays_follow_dates(self):
+        cal = term.Term('Sample', date(2003, 9, 1), date(2003, 9, 17))
+        cal.addWeekdays(calendar.MONDAY)
+        self.assertEqual(len(cal._schooldays), 3)
+
+        # Moving the first date keeps the schooldays still in the term
+        cal.first = date(2003, 8, 25)
+        self.assert_(cal.isSchoolday(date(2003, 9, 1)))
+        self.assert_(not cal.isSchoolday(date(2003, 8, 25)))
+        cal.first = date(2003, 9, 5)
+        self.assert_(cal.isSchoolday(date(2003, 9, 8)))
+        self.assert_(cal.isSchoolday(date(2003, 9, 15)))
+        self.assertEqual(cal.countSchooldays(cal.first, cal.last), 2)
+
+        # Days cut off by the last date are dropped
+        cal.last = date(2003, 9, 10)
+        cal.last = date(2003, 9, 30)
+        self.assert_(cal.isSchoolday(date(2003, 9, 8)))
+        self.assert_(not cal.isSchoolday(date(2003, 9, 15)))
+        self.assertEqual(len(cal._schooldays), 4)
+
     def test_contains(self):
         cal = term.Term('Sample', date(2003, 9, 1), date(2003, 9, 16))
         self.assert_(date(2003, 8, 31) not in cal)
@@ -199,6 +246,17 @@ class TestGetTermForDate(unittest.TestCase):
         del terms['2005-fall']
         self.assert_(term.getNextTermForDate(date(2004, 8, 31)) is None)
 
+    def test_term_date_changes(self):
+        provideHandler(subscriberAdapterDispatcher)
+        provideAdapter(term.TermDatesReindexSubscriber,
+                       name='term_dates_reindex')
+        self.term1.last = date(2004, 12, 31)
+        self.assert_(term.getTermForDate(date(2004, 12, 25)) is self.term1)
+        self.term2.first = date(2005, 2, 1)
+        self.assert_(term.getTermForDate(date(2005, 1, 15)) is None)
+        self.assert_(term.getNextTermForDate(date(2005, 1, 15)) is self.term2)
+        self.assertEqual(term.listTerms(self.app), [self.term1, self.term2])
+
 
 def doctest_DateManagerUtility_today():
     """Test for today.
@@ -41,6 +41,7 @@ from schooltool.securitypolicy.crowds import Crowd, ConfigurableCrowd
 from schooltool.securitypolicy.crowds import AggregateCrowd
 from schooltool.timetable import interfaces
 from schooltool.timetable.schedule import ScheduleContainer
+from schooltool.timetable.schedule import MeetingsModified
 from schooltool.timetable.timetable import TimetableContainer
 
 SCHEDULES_KEY = 'schooltool.timetable.schedules'
@@ -142,6 +143,11 @@ class UpdateSelectedPeriodsSchedules(ObjectEventAdapterSubscriber):
 
     def __call__(self):
         app = ISchoolToolApplication(None)
+        timezone = self.object.timezone
+        descriptions = self.event.descriptions
+        if [d for d in descriptions if not isinstance(d, MeetingsModified)]:
+            # Not only meetings changed, update whole schedules.
+            descriptions = ()
         # XXX: extremely nasty loop through all schedules.
         schedule_containers = app[SCHEDULES_KEY]
         for container in schedule_containers.values():
@@ -151,7 +157,9 @@ class UpdateSelectedPeriodsSchedules(ObjectEventAdapterSubscriber):
                     sameProxiedObjects(schedule.timetable, self.object)):
                     notify_container = True
             if notify_container:
-                zope.lifecycleevent.modified(container)
+                zope.lifecycleevent.modified(container, *[
+                    d.inTimezone(timezone, container.timezone)
+                    for d in descriptions])
 
 
 class RemoveRelatedSelectedPeriodsSchedules(ObjectEventAdapterSubscriber):
@@ -197,6 +205,16 @@ class SchooldaysForSchedule(object):
             if date in self:
                 yield date
 
+    def countDates(self, first, last):
+        return sum([term.countSchooldays(first, last)
+                    for term in self.schoolyear.values()])
+
+    @property
+    def version(self):
+        # Schoolday bitmaps of terms are small enough to compare directly.
+        return tuple([(term.__name__, term.first, term.last, term._schooldays)
+                      for term in self.schoolyear.values()])
+
 
 class SchooldaysForTimetable(SchooldaysForSchedule):
     adapts(interfaces.ITimetable)
@@ -50,6 +50,7 @@ from schooltool.timetable.interfaces import ISelectedPeriodsSchedule
 from schooltool.timetable.interfaces import IHaveSchedule, IScheduleContainer
 from schooltool.timetable.browser.app import getActivityVocabulary
 from schooltool.timetable.browser.schedule import FlourishConfirmDeleteView
+from schooltool.timetable.schedule import MeetingsModified
 from schooltool.timetable.timetable import SelectedPeriodsSchedule
 from schooltool.term.interfaces import ITerm
 
@@ -688,28 +689,33 @@ class SelectedPeriodsScheduleEditView(form.EditForm):
         if errors:
             self.status = self.formErrorsMessage
             return
-        changes = self.applyChanges(data)
+        # Changed attributes are announced by applyChanges.
+        self.applyChanges(data)
+        periods = self.applyPeriods(self.context)
 
-        schedule_changed = bool(changes)
+        self.status = self.successMessage
 
-        timetable = self.context.timetable
+        if periods:
+            zope.lifecycleevent.modified(
+                self.context, MeetingsModified(periods=periods))
+        self.redirectToParent()
+
+    def applyPeriods(self, schedule):
+        """Apply selected periods to the schedule, return toggled periods."""
+        toggled = []
+        timetable = schedule.timetable
         for day in timetable.periods.templates.values():
             for period in day.values():
                 key = self.getPeriodKey(day, period)
                 selected = bool(self.request.get(key))
-                scheduled = self.context.hasPeriod(period)
+                scheduled = schedule.hasPeriod(period)
                 if selected and not scheduled:
-                    self.context.addPeriod(period)
-                    schedule_changed = True
+                    schedule.addPeriod(period)
+                    toggled.append(period)
                 elif not selected and scheduled:
-                    self.context.removePeriod(period)
-                    schedule_changed = True
-
-        self.status = self.successMessage
-
-        if schedule_changed:
-            zope.lifecycleevent.modified(self.context)
-        self.redirectToParent()
+                    schedule.removePeriod(period)
+                    toggled.append(period)
+        return toggled
 
     @button.buttonAndHandler(_("Cancel"), name='cancel')
     def handle_cancel_action(self, action):
@@ -758,21 +764,7 @@ class FlourishSelectedPeriodsMultiScheduleEditView(flourish.page.WideContainerPa
             # Send out a detailed object-modified event
             zope.event.notify(
                 zope.lifecycleevent.ObjectModifiedEvent(schedule, *descriptions))
-
-        schedule_changed = bool(changes)
-        timetable = schedule.timetable
-        for day in timetable.periods.templates.values():
-            for period in day.values():
-                key = self.getPeriodKey(day, period)
-                selected = bool(self.request.get(key))
-                scheduled = schedule.hasPeriod(period)
-                if selected and not scheduled:
-                    schedule.addPeriod(period)
-                    schedule_changed = True
-                elif not selected and scheduled:
-                    schedule.removePeriod(period)
-                    schedule_changed = True
-        return schedule_changed
+        return self.applyPeriods(schedule)
 
     @property
     def other_params(self):
@@ -826,14 +818,11 @@ class FlourishSelectedPeriodsMultiScheduleEditView(flourish.page.WideContainerPa
         if errors:
             self.status = self.formErrorsMessage
             return
-        changed = self.applyChangesToSchedule(self.getContent(), data)
-        if changed:
-            zope.lifecycleevent.modified(self.getContent())
-
-        for schedule in self.other_schedules:
-            changed = self.applyChangesToSchedule(schedule, data)
-            if changed:
-                zope.lifecycleevent.modified(schedule)
+        for schedule in [self.getContent()] + self.other_schedules:
+            periods = self.applyChangesToSchedule(schedule, data)
+            if periods:
+                zope.lifecycleevent.modified(
+                    schedule, MeetingsModified(periods=periods))
 
         self.status = self.successMessage
 
@@ -19,6 +19,7 @@
 Synchronisation between timetables and calendars.
 """
 import pytz
+import datetime
 
 import zope.lifecycleevent.interfaces
 from zope.annotation.interfaces import IAnnotations
@@ -30,6 +31,7 @@ from zope.security.proxy import removeSecurityProxy
 from schooltool.timetable import interfaces
 from schooltool.app.cal import CalendarEvent, Calendar
 from schooltool.calendar.simple import ImmutableCalendar
+from schooltool.timetable.schedule import MeetingsModified, date_timespan
 from schooltool.schoolyear.subscriber import ObjectEventAdapterSubscriber
 
 SCHEDULE_CALENDAR_KEY = 'schooltool.timetable.app.ScheduleCalendar'
@@ -75,9 +77,9 @@ class ImmutableScheduleCalendar(ImmutableCalendar):
 
     schedule = None
 
-    def __init__(self, schedule):
+    def __init__(self, schedule, first=None, last=None, periods=None):
         self.schedule = schedule
-        events = tuple(self.createEvents())
+        events = tuple(self.createEvents(first, last, periods))
         super(ImmutableScheduleCalendar, self).__init__(events=events)
 
     def makeGUID(self, date, period, int_ids=None):
@@ -89,7 +91,7 @@ class ImmutableScheduleCalendar(ImmutableCalendar):
             int_ids.getId(period),
             )
 
-    def createEvents(self):
+    def createEvents(self, first=None, last=None, periods=None):
         int_ids = getUtility(IIntIds)
         owner = interfaces.IHaveSchedule(self.schedule)
         title = getattr(owner, 'title', u'')
@@ -99,9 +101,18 @@ class ImmutableScheduleCalendar(ImmutableCalendar):
             schedule.last is None):
             return # Empty schedule
 
-        meetings = schedule.iterMeetings(schedule.first, schedule.last)
+        if first is None or first < schedule.first:
+            first = schedule.first
+        if last is None or last > schedule.last:
+            last = schedule.last
+        if first > last:
+            return
+
+        meetings = schedule.iterMeetings(first, last)
 
         for meeting in meetings:
+            if periods is not None and meeting.period not in periods:
+                continue
             # We need to convert dtstart to UTC, because calendar
             # events insist on storing UTC time.
             dtstart = meeting.dtstart.astimezone(pytz.UTC)
@@ -136,15 +147,33 @@ class ScheduleCalendar(Calendar):
                 changed = True
         return changed
 
-    def updateSchedule(self, schedule):
+    def updateSchedule(self, schedule, first=None, last=None, periods=None):
+        """Update calendar with events from this schedule.
+
+        If `first`, `last` or `periods` are given, only events of meetings
+        between these dates (in schedule's timezone) and of these periods
+        are compared, other events are not touched.
+        """
         schedule = removeSecurityProxy(schedule)
-        schedule_cal = interfaces.IImmutableScheduleCalendar(schedule)
-        if schedule_cal is None:
-            self.removeSchedule(schedule)
-            return
+        if (first is None and last is None and periods is None or
+            schedule.first is None or schedule.last is None):
+            schedule_cal = interfaces.IImmutableScheduleCalendar(schedule)
+            if schedule_cal is None:
+                self.removeSchedule(schedule)
+                return
+            old_events = removeSecurityProxy(self)
+        else:
+            if periods is not None:
+                periods = [removeSecurityProxy(p) for p in periods]
+            schedule_cal = ImmutableScheduleCalendar(
+                schedule, first=first, last=last, periods=periods)
+            old_events = self._iterScheduledEvents(
+                schedule, first or schedule.first, last or schedule.last)
+            if periods is not None:
+                old_events = [e for e in old_events if e.period in periods]
 
         old_events = dict(
-            [(e.unique_id, e) for e in removeSecurityProxy(self)
+            [(e.unique_id, e) for e in old_events
               if e.schedule is schedule])
 
         new_events = dict([(e.unique_id, e) for e in schedule_cal])
@@ -161,6 +190,16 @@ class ScheduleCalendar(Calendar):
         for uid in sorted(new_set & old_set):
             self.updateEvent(old_events[uid], new_events[uid])
 
+    def _iterScheduledEvents(self, schedule, first, last):
+        """Return events starting from first to last date of schedule."""
+        tz = pytz.timezone(schedule.timezone)
+        start = date_timespan(first, tzinfo=tz)[0]
+        end = date_timespan(last + datetime.timedelta(1), tzinfo=tz)[0]
+        if self._starts is None:
+            return [e for e in self if start <= e.dtstart < end]
+        # (end, ) sorts before any (end, unique_id) key
+        return list(self._starts.values(min=(start, ), max=(end, )))
+
     def removeSchedule(self, schedule):
         schedule = removeSecurityProxy(schedule)
         old_events = sorted([e for e in removeSecurityProxy(self)])
@@ -192,7 +231,30 @@ class UpdateScheduleCalendar(ObjectEventAdapterSubscriber):
         if container is None:
             return
 
-        calendar.updateSchedule(container)
+        changes = self.getMeetingChanges(container)
+        if changes is None:
+            calendar.updateSchedule(container)
+            return
+        for change in changes:
+            calendar.updateSchedule(container, first=change.first,
+                                    last=change.last, periods=change.periods)
+
+    def getMeetingChanges(self, container):
+        """Return descriptions of changed meetings, or None if unknown."""
+        descriptions = getattr(self.event, 'descriptions', ())
+        if not descriptions:
+            return None
+        for description in descriptions:
+            if not isinstance(description, MeetingsModified):
+                return None
+        schedule = self.object
+        if (interfaces.ISelectedPeriodsSchedule.providedBy(schedule) and
+            schedule.consecutive_periods_as_one):
+            # Meeting ids of neighbouring periods depend on each other.
+            descriptions = [MeetingsModified(d.first, d.last)
+                            for d in descriptions]
+        return [d.inTimezone(schedule.timezone, container.timezone)
+                for d in descriptions]
 
 
 class RemoveScheduleCalendar(ObjectEventAdapterSubscriber):
@@ -70,11 +70,35 @@ class DayTemplateSchedule(Persistent, Contained):
 
     templates = None
 
+    # Whether iterDates depends on the schooldays of the schedule.
+    uses_schooldays = False
+
     def initTemplates(self):
         self.templates, event = containedEvent(
             DayTemplateContainer(), self, 'templates')
         notify(event)
 
+    @property
+    def version(self):
+        if not self.templates:
+            return None
+        days = []
+        for day_key, day in self.templates.items():
+            items = tuple([(key, item.activity_type,
+                            getattr(item, 'title', None),
+                            getattr(item, 'tstart', None),
+                            getattr(item, 'duration', None))
+                           for key, item in day.items()])
+            days.append((day_key, items))
+        schooldays = None
+        if self.uses_schooldays:
+            schedule = interfaces.ISchedule(self)
+            schooldays = interfaces.ISchooldays(schedule).version
+        return (self.__class__,
+                getattr(self, 'starting_index', None),
+                getattr(self.templates, 'starting_index', None),
+                tuple(days), schooldays)
+
     def iterDates(self, dates):
         for date in dates:
             yield None
@@ -110,6 +134,8 @@ class CalendarDayTemplates(DayTemplateSchedule):
 class WeekDayTemplates(DayTemplateSchedule):
     implements(interfaces.IWeekDayTemplates)
 
+    uses_schooldays = True
+
     def getWeekDayKey(self, weekday):
         return unicode(weekday)
 
@@ -136,6 +162,8 @@ class WeekDayTemplates(DayTemplateSchedule):
 class SchoolDayTemplates(DayTemplateSchedule):
     implements(interfaces.ISchoolDayTemplates)
 
+    uses_schooldays = True
+
     starting_index = 0
 
     def getDayIndex(self, schedule, schooldays, date):
@@ -145,12 +173,11 @@ class SchoolDayTemplates(DayTemplateSchedule):
             return day_index
 
         if date > schedule.first:
-            skip_dates = DateRange(schedule.first, date - date.resolution)
+            skipped_schooldays = schooldays.countDates(
+                schedule.first, date - date.resolution)
         else:
-            skip_dates = DateRange(date + date.resolution, schedule.first)
-        skipped_schooldays = len(list(schooldays.iterDates(skip_dates)))
-        if date < schedule.first:
-            skipped_schooldays = -skipped_schooldays
+            skipped_schooldays = -schooldays.countDates(
+                date + date.resolution, schedule.first)
 
         day_index = (day_index + skipped_schooldays) % len(self.templates)
         return day_index
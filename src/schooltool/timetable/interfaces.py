@@ -114,7 +114,7 @@ class ISchedule(Interface):
         required=True)
 
     def iterMeetings(date, until_date=None):
-        """Yields meetings for the given date range."""
+        """Yields meetings for the given date range in chronological order."""
 
 
 class IMeetingException(IMeeting):
@@ -203,6 +203,9 @@ class IDayTemplateSchedule(IContained):
         schema=IDayTemplateContainer,
         required=True)
 
+    version = Attribute(
+        """A value that changes whenever the scheduled templates change.""")
+
     def iterDates(dates):
         """Yield day templates for given dates."""
 
@@ -235,6 +238,12 @@ class ISchooldays(Interface):
     def iterDates(dates):
         """Iterate dates that are schooldays."""
 
+    def countDates(first, last):
+        """Return the number of schooldays from first to last, inclusive."""
+
+    version = Attribute(
+        """A value that changes whenever any of the schooldays change.""")
+
     def __iter__():
         """Yield all schoolday dates."""
 
@@ -18,6 +18,8 @@
 """
 Scheduling of meetings.
 """
+import heapq
+import itertools
 import pytz
 import datetime
 from persistent import Persistent
@@ -30,7 +32,6 @@ from zope.intid.interfaces import IIntIds
 from zope.interface import implements
 from zope.proxy import sameProxiedObjects
 
-from schooltool.common import DateRange
 from schooltool.timetable import interfaces
 
 
@@ -114,6 +115,31 @@ class Schedule(Contained):
         return iter([])
 
 
+class MeetingsModified(object):
+    """Description of an object modified event that changed some meetings.
+
+    Pass it to zope.lifecycleevent.modified() when only the meetings
+    from `first` to `last` (dates in schedule's timezone) or only the
+    meetings of given `periods` changed.  None means no restriction.
+    """
+
+    def __init__(self, first=None, last=None, periods=None):
+        self.first = first
+        self.last = last
+        self.periods = periods
+
+    def inTimezone(self, timezone, other_timezone):
+        """Return description of the same meetings in other timezone."""
+        if timezone == other_timezone:
+            return self
+        first, last = self.first, self.last
+        if first is not None:
+            first -= datetime.timedelta(1)
+        if last is not None:
+            last += datetime.timedelta(1)
+        return MeetingsModified(first, last, periods=self.periods)
+
+
 def date_timespan(date, tzinfo=pytz.UTC):
     starts = datetime.datetime.combine(date, datetime.time.min)
     starts = tzinfo.localize(starts)
@@ -145,29 +171,48 @@ def iterMeetingsInTimezone(schedule, other_timezone, date, until_date=None):
 
 def iterMeetingsWithExceptions(meetings, exceptions, timezone,
                                date, until_date=None):
+    """Replace meetings on exception dates with the exception meetings.
+
+    `meetings` must be in chronological order.  They are streamed
+    one date at a time, so callers can stop early.
+    """
     if until_date is None:
         until_date = date
 
-    by_date = {}
-    for d in DateRange(date, until_date):
-        if d in exceptions:
-            by_date[d] = list(exceptions[d])
+    exception_dates = sorted([d for d in exceptions
+                              if date <= d <= until_date], reverse=True)
 
     tz = pytz.timezone(timezone)
+    meeting_date = lambda meeting: meeting.dtstart.astimezone(tz).date()
+
+    for day, day_meetings in itertools.groupby(meetings, meeting_date):
+        while exception_dates and exception_dates[-1] < day:
+            d = exception_dates.pop()
+            for meeting in sorted(exceptions[d], key=lambda m: m.dtstart):
+                yield meeting
+        if day in exceptions:
+            continue
+        for meeting in sorted(day_meetings, key=lambda m: m.dtstart):
+            yield meeting
 
-    for original_meeting in meetings:
-        meeting_date = original_meeting.dtstart.astimezone(tz).date()
+    while exception_dates:
+        d = exception_dates.pop()
+        for meeting in sorted(exceptions[d], key=lambda m: m.dtstart):
+            yield meeting
 
-        if meeting_date in exceptions:
-            continue
 
-        if meeting_date not in by_date:
-            by_date[meeting_date] = list()
-        by_date[meeting_date].append(original_meeting)
+def mergeMeetings(*iterables):
+    """Merge chronologically ordered meeting iterables lazily.
 
-    for d in sorted(by_date):
-        for meeting in sorted(by_date[d], key=lambda m: m.dtstart):
-            yield meeting
+    Meetings that start at the same time keep the order of `iterables`.
+    """
+    def decorate(n, meetings):
+        for seq, meeting in enumerate(meetings):
+            yield meeting.dtstart, n, seq, meeting
+    decorated = [decorate(n, meetings)
+                 for n, meetings in enumerate(iterables)]
+    for dtstart, n, seq, meeting in heapq.merge(*decorated):
+        yield meeting
 
 
 class ScheduleContainer(BTreeContainer):
@@ -196,16 +241,15 @@ class ScheduleContainer(BTreeContainer):
     def iterOriginalMeetings(self, date, until_date=None):
         if until_date is None:
             until_date = date
-        meetings = []
+        schedule_meetings = []
         for schedule in self.values():
             if not sameProxiedObjects(schedule.__parent__, self):
                 # We are likely in the process of deleting/moving
                 # this schedule.  Ignore.
                 continue
-            tt_meetings = iterMeetingsInTimezone(
-                schedule, self.timezone, date, until_date=until_date)
-            meetings.extend(list(tt_meetings))
-        return sorted(meetings, key=lambda m: m.dtstart)
+            schedule_meetings.append(iterMeetingsInTimezone(
+                schedule, self.timezone, date, until_date=until_date))
+        return mergeMeetings(*schedule_meetings)
 
     def iterMeetings(self, date, until_date=None):
         meetings = self.iterOriginalMeetings(date, until_date=until_date)
@@ -54,3 +54,11 @@ class ScheduleStub(object):
                     duration = timedelta(0, 900)
                     yield Meeting(starts, duration)
             cursor += cursor.resolution
+
+
+def print_utc_times(meetings):
+    for meeting in meetings:
+        start_time_s = meeting.dtstart.strftime('%Y-%m-%d %H:%M %Z')
+        utc_time = meeting.dtstart.astimezone(pytz.UTC)
+        utc_time_s = utc_time.strftime('%Y-%m-%d %H:%M %Z')
+        print start_time_s, '->', utc_time_s
@@ -30,7 +30,9 @@ from zope.component import provideUtility, provideAdapter
 from test_schedule import ScheduleStub
 
 from schooltool.timetable.calendar import ImmutableScheduleCalendar
+from schooltool.timetable.calendar import ScheduleCalendar
 from schooltool.timetable.interfaces import IHaveSchedule
+from schooltool.timetable.interfaces import IImmutableScheduleCalendar
 
 
 class ImmutableScheduleCalendarForTest(ImmutableScheduleCalendar):
@@ -91,6 +93,132 @@ def test_ImmutableScheduleCalendar():
     """
 
 
+class PeriodStub(object):
+
+    def __init__(self, title):
+        self.title = title
+
+    def __repr__(self):
+        return '<Period %s>' % self.title
+
+
+class PeriodScheduleStub(ScheduleStub):
+
+    periods = (PeriodStub('morning'), PeriodStub('noon'), PeriodStub('night'))
+
+    def __init__(self, *args, **kw):
+        ScheduleStub.__init__(self, *args, **kw)
+        self.selected = list(self.periods)
+
+    def iterMeetings(self, start_date, until_date=None):
+        meetings = ScheduleStub.iterMeetings(self, start_date, until_date)
+        for n, meeting in enumerate(meetings):
+            period = self.periods[n % len(self.periods)]
+            if period in self.selected:
+                yield meeting.clone(period=period)
+
+
+class IntIdsStub(object):
+
+    def getId(self, obj):
+        return getattr(obj, 'title', 'schedule')
+
+
+def print_schedule_events(cal):
+    for event in sorted(cal, key=lambda e: e.dtstart):
+        print event.period.title, 'on', event.dtstart.strftime('%Y-%m-%d %H:%M')
+
+
+def test_ScheduleCalendar_updateSchedule():
+    """Tests for ScheduleCalendar.updateSchedule.
+
+        >>> provideUtility(IntIdsStub(), IIntIds)
+        >>> class Math(object):
+        ...     title = 'Math'
+        >>> provideAdapter(lambda s: Math, (PeriodScheduleStub, ), IHaveSchedule)
+        >>> provideAdapter(ImmutableScheduleCalendar, (PeriodScheduleStub, ),
+        ...                IImmutableScheduleCalendar)
+
+    Schedule calendar is filled with events of all schedule meetings.
+
+        >>> schedule = PeriodScheduleStub()
+        >>> morning, noon, night = schedule.periods
+
+        >>> cal = ScheduleCalendar(None)
+        >>> cal.updateSchedule(schedule)
+        >>> print_schedule_events(cal)
+        morning on 2011-10-29 00:05
+        noon on 2011-10-29 05:00
+        night on 2011-10-29 23:55
+        morning on 2011-10-30 00:05
+        noon on 2011-10-30 05:00
+        night on 2011-10-30 23:55
+        morning on 2011-10-31 00:05
+        noon on 2011-10-31 05:00
+        night on 2011-10-31 23:55
+
+    When only some meetings change, only the events in the given date
+    range are compared.  Let's move the morning meetings.
+
+        >>> schedule.meeting_times = (time(0, 10), time(5, 0), time(23, 55))
+
+        >>> cal.updateSchedule(schedule, first=date(2011, 10, 30),
+        ...                    last=date(2011, 10, 30))
+        >>> print_schedule_events(cal)
+        morning on 2011-10-29 00:05
+        noon on 2011-10-29 05:00
+        night on 2011-10-29 23:55
+        morning on 2011-10-30 00:10
+        noon on 2011-10-30 05:00
+        night on 2011-10-30 23:55
+        morning on 2011-10-31 00:05
+        noon on 2011-10-31 05:00
+        night on 2011-10-31 23:55
+
+    Events can also be limited to some periods.  Let's unschedule the
+    noon period.
+
+        >>> schedule.selected.remove(noon)
+        >>> cal.updateSchedule(schedule, periods=[noon])
+        >>> print_schedule_events(cal)
+        morning on 2011-10-29 00:05
+        night on 2011-10-29 23:55
+        morning on 2011-10-30 00:10
+        night on 2011-10-30 23:55
+        morning on 2011-10-31 00:05
+        night on 2011-10-31 23:55
+
+    And add it back for the last day only.
+
+        >>> schedule.selected.append(noon)
+        >>> cal.updateSchedule(schedule, first=date(2011, 10, 31),
+        ...                    periods=[noon])
+        >>> print_schedule_events(cal)
+        morning on 2011-10-29 00:05
+        night on 2011-10-29 23:55
+        morning on 2011-10-30 00:10
+        night on 2011-10-30 23:55
+        morning on 2011-10-31 00:05
+        noon on 2011-10-31 05:00
+        night on 2011-10-31 23:55
+
+    Full update brings everything up to date.
+
+        >>> cal.updateSchedule(schedule)
+        >>> print_schedule_events(cal)
+        morning on 2011-10-29 00:10
+        noon on 2011-10-29 05:00
+        night on 2011-10-29 23:55
+        morning on 2011-10-30 00:10
+        noon on 2011-10-30 05:00
+        night on 2011-10-30 23:55
+        morning on 2011-10-31 00:10
+        noon on 2011-10-31 05:00
+        night on 2011-10-31 23:55
+
+    """
+
+
 def setUp(test=None):
     setup.placelessSetUp()
     provideUtility(object(), IIntIds)
@@ -22,11 +22,13 @@ import doctest
 import pytz
 import unittest
 from pprint import pprint
-from datetime import date, time
+from datetime import date, time, datetime, timedelta
 
+from schooltool.timetable.schedule import Meeting, ScheduleContainer
 from schooltool.timetable.schedule import date_timespan
 from schooltool.timetable.schedule import iterMeetingsInTimezone
 from schooltool.timetable.tests import ScheduleStub
+from schooltool.timetable.tests import print_utc_times
 
 
 def test_date_timespan():
@@ -294,6 +296,51 @@ def test_iterMeetingsInTimezone_localized_schedule():
     """
 
 
+def test_ScheduleContainer_iterMeetings():
+    """Tests for ScheduleContainer.iterMeetings.
+
+    Meetings of all schedules are merged in chronological order.
+
+       >>> container = ScheduleContainer(timezone='UTC')
+       >>> container['a'] = ScheduleStub()
+       >>> container['b'] = ScheduleStub(timezone='Europe/Vilnius')
+
+       >>> print_utc_times(container.iterMeetings(date(2011, 10, 30)))
+       2011-10-30 00:05 UTC -> 2011-10-30 00:05 UTC
+       2011-10-30 05:00 EET -> 2011-10-30 03:00 UTC
+       2011-10-30 05:00 UTC -> 2011-10-30 05:00 UTC
+       2011-10-30 23:55 EET -> 2011-10-30 21:55 UTC
+       2011-10-31 00:05 EET -> 2011-10-30 22:05 UTC
+       2011-10-30 23:55 UTC -> 2011-10-30 23:55 UTC
+
+    Meetings on exception dates are replaced with the exception meetings.
+
+       >>> exception = Meeting(
+       ...     pytz.UTC.localize(datetime(2011, 10, 30, 12, 0)),
+       ...     timedelta(0, 900))
+       >>> container.exceptions[date(2011, 10, 30)] = [exception]
+       >>> container.exceptions[date(2011, 10, 31)] = []
+
+       >>> print_utc_times(container.iterMeetings(date(2011, 10, 29),
+       ...                                        date(2011, 10, 31)))
+       2011-10-29 00:05 UTC -> 2011-10-29 00:05 UTC
+       2011-10-29 05:00 EEST -> 2011-10-29 02:00 UTC
+       2011-10-29 05:00 UTC -> 2011-10-29 05:00 UTC
+       2011-10-29 23:55 EEST -> 2011-10-29 20:55 UTC
+       2011-10-30 00:05 EEST -> 2011-10-29 21:05 UTC
+       2011-10-29 23:55 UTC -> 2011-10-29 23:55 UTC
+       2011-10-30 12:00 UTC -> 2011-10-30 12:00 UTC
+
+    Meetings are streamed, so the callers can stop early.
+
+       >>> meetings = container.iterMeetings(date(2011, 10, 29),
+       ...                                   date(2011, 10, 31))
+       >>> meetings.next()
+       <Meeting on 2011-10-29 00:05 UTC>
+
+    """
+
+
 def setUp(test=None):
     pass
 
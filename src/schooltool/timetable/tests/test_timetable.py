@@ -37,6 +37,7 @@ from schooltool.timetable.daytemplates import TimeSlot
 from schooltool.timetable.schedule import Meeting
 from schooltool.timetable.schedule import Period
 from schooltool.timetable.tests import ScheduleStub
+from schooltool.timetable.tests import print_utc_times
 from schooltool.timetable.timetable import Timetable
 
 from schooltool.timetable.schedule import iterMeetingsInTimezone
@@ -80,14 +81,6 @@ class TimetableForTests(Timetable):
             self.time_slots.default['%d' % (n+1)] = TimeSlot(tstart, duration)
 
 
-def print_utc_times(meetings):
-    for meeting in meetings:
-        start_time_s = meeting.dtstart.strftime('%Y-%m-%d %H:%M %Z')
-        utc_time = meeting.dtstart.astimezone(pytz.UTC)
-        utc_time_s = utc_time.strftime('%Y-%m-%d %H:%M %Z')
-        print start_time_s, '->', utc_time_s
-
-
 def test_Timetable_timezones():
     """Tests for Timetable.
 
@@ -219,6 +212,52 @@ def test_Timetable_duplicate_time_slot():
     """
 
 
+def test_Timetable_meetings_cache():
+    """Tests for cached timetable meetings.
+
+        >>> tt = TimetableForTests(
+        ...     date(2011, 10, 3), date(2011, 10, 9), timezone='UTC')
+        >>> tt.setUp(periods=['A', 'B'], time_slots=[time(9, 0), time(10, 0)])
+
+        >>> pprint(list(tt.iterOriginalMeetings(date(2011, 10, 4))))
+        [<Meeting A on 2011-10-04 09:00 UTC>,
+         <Meeting B on 2011-10-04 10:00 UTC>]
+
+    Meetings of the whole timetable are built once and then sliced
+    by date.
+
+        >>> key, ordinals, meetings = tt._v_meetings
+        >>> len(meetings)
+        14
+
+        >>> len(list(tt.iterOriginalMeetings(date(2011, 9, 1),
+        ...                                  date(2011, 10, 5))))
+        6
+        >>> tt._v_meetings[2] is meetings
+        True
+
+    Changes to periods and time slots are picked up.
+
+        >>> tt.periods.default['1'].title = 'Z'
+        >>> tt.time_slots.default['2'].tstart = time(11, 0)
+        >>> pprint(list(tt.iterOriginalMeetings(date(2011, 10, 4))))
+        [<Meeting Z on 2011-10-04 09:00 UTC>,
+         <Meeting B on 2011-10-04 11:00 UTC>]
+
+        >>> del tt.periods.default['2']
+        >>> del tt.time_slots.default['2']
+        >>> pprint(list(tt.iterOriginalMeetings(date(2011, 10, 4))))
+        [<Meeting Z on 2011-10-04 09:00 UTC>]
+
+    So are the timetable dates.
+
+        >>> tt.last = date(2011, 10, 5)
+        >>> len(list(tt.iterOriginalMeetings(tt.first, date(2011, 10, 9))))
+        3
+
+    """
+
+
 def setUp(test=None):
     setup.placelessSetUp()
     provideUtility(object(), IIntIds)
@@ -18,6 +18,7 @@
 """
 Timetables are meeting schedules created from scheduled day templates.
 """
+import bisect
 import pytz
 import datetime
 import urllib
@@ -58,9 +59,39 @@ class Timetable(Persistent, Schedule):
         uid = '%s.%s' % (date_id, title)
         return uid
 
+    def _getMeetingsCacheKey(self):
+        return (self.first, self.last, self.timezone,
+                self.periods.version, self.time_slots.version)
+
+    def _getMeetings(self):
+        """Return cached meetings of the whole timetable.
+
+        Returns a sorted list of date ordinals, one for each meeting, and
+        a list of (dtstart, duration, period, meeting_id) in the same order.
+        """
+        key = self._getMeetingsCacheKey()
+        cache = getattr(self, '_v_meetings', None)
+        if cache is None or cache[0] != key:
+            ordinals = []
+            meetings = []
+            for meeting in self._buildMeetings(self.first, self.last):
+                ordinals.append(meeting.dtstart.date().toordinal())
+                meetings.append((meeting.dtstart, meeting.duration,
+                                 meeting.period, meeting.meeting_id))
+            cache = self._v_meetings = (key, ordinals, meetings)
+        return cache[1], cache[2]
+
     def iterOriginalMeetings(self, from_date, until_date=None):
         if until_date is None:
             until_date = from_date
+        ordinals, meetings = self._getMeetings()
+        start = bisect.bisect_left(ordinals, from_date.toordinal())
+        stop = bisect.bisect_right(ordinals, until_date.toordinal())
+        for dtstart, duration, period, meeting_id in meetings[start:stop]:
+            yield Meeting(dtstart, duration,
+                          period=period, meeting_id=meeting_id)
+
+    def _buildMeetings(self, from_date, until_date):
         timezone = pytz.timezone(self.timezone)
 
         dates = DateRange(from_date, until_date)